@@ -3,21 +3,41 @@ Flask application factory and initialization.
 """
 from flask import Flask, request
 from flask_cors import CORS
-from flask_session import Session
 import os
 import logging
 import time
 
+# Fork the password KDF processes before the DB tunnel, log listener or janitor start any thread
+from app_core.credentials import verifier
+verifier.start()
+
 from app_core.config import Config
-from app_core.services import UserService
+from app_core.db import query_stats
+from app_core.metrics import registry, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+from app_core.services import UserService, SearchService, TranscriptService, PlanAuditService, RankingService
 from app_core.api import auth_bp, student_bp, teacher_bp, admin_bp
-from app_core.middleware import deduplicate_request, log_operation
+from app_core.middleware import deduplicate_request, init_dedup, log_operation
+from app_core.conditional import init_conditional
+from app_core.profiling import init_profiling
+from app_core.responses import init_compression, init_json
+from app_core.sessions import init_sessions
 from app_core.logger import setup_logging, log_request, log_response, log_auth, log_database, log_error
 
 # 设置日志系统（日志目录移动到 app_core/logs）
 BASE_DIR = os.path.dirname(__file__)
 LOG_DIR = os.path.join(BASE_DIR, 'app_core', 'logs')
-setup_logging(log_dir=LOG_DIR, console_level=logging.DEBUG, file_level=logging.INFO)
+setup_logging(
+    log_dir=LOG_DIR,
+    console_level=logging.DEBUG,
+    file_level=logging.INFO,
+    async_mode=Config.LOG_ASYNC,
+    log_format=Config.LOG_FORMAT,
+    rotation=Config.LOG_ROTATION,
+    max_bytes=Config.LOG_MAX_BYTES,
+    backup_count=Config.LOG_BACKUP_COUNT,
+    when=Config.LOG_ROTATE_WHEN,
+    sample_rates={logging.INFO: Config.LOG_REQUEST_SAMPLE_RATE},
+)
 logger = logging.getLogger(__name__)
 
 
@@ -40,12 +60,17 @@ def create_app(config_class=Config):
          supports_credentials=config_class.CORS_SUPPORTS_CREDENTIALS,
          allow_headers=config_class.CORS_ALLOW_HEADERS,
          methods=config_class.CORS_METHODS)
-    Session(app)
+    init_sessions(app)
+    init_json(app)
+    # Registered first so it runs after every other after_request hook
+    init_compression(app)
     
     # 请求前处理 - 记录日志和计时
     @app.before_request
     def before_request():
         request.start_time = time.time()
+        request.metrics_start = time.perf_counter()
+        request.start_queries = query_stats.thread_statements()
         log_request(request.method, request.path)
     
     # 请求后处理 - 记录响应和耗时
@@ -53,14 +78,41 @@ def create_app(config_class=Config):
     def after_request(response):
         elapsed = (time.time() - request.start_time) * 1000 if hasattr(request, 'start_time') else 0
         log_response(response.status_code, request.method, request.path, elapsed)
+        if app.config.get('QUERY_COUNT_HEADER') and hasattr(request, 'start_queries'):
+            response.headers['X-DB-Queries'] = str(query_stats.thread_statements() - request.start_queries)
+        if hasattr(request, 'metrics_start'):
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - request.metrics_start,
+                                         endpoint=endpoint, method=request.method)
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            registry.maybe_flush()
         return response
     
+    # 按需 cProfile（管理员 ?__profile=1）与请求栈采样
+    init_profiling(app)
+    
+    # 已登录用户的 POST/PUT/DELETE 去重与幂等重放（在其余 before_request 之后登记）
+    init_dedup(app)
+    
     # 全局错误处理
     @app.errorhandler(Exception)
     def handle_error(error):
         log_error("Unhandled Exception", error, path=request.path, method=request.method)
         return {"error": "Internal Server Error", "message": str(error)}, 500
     
+    # Prometheus 指标（文本格式）
+    @app.route('/metrics')
+    def metrics():
+        return registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    
+    # 就绪探针：仅在连接池预热完成后返回 200（见 serve.py）
+    @app.route('/ready')
+    def ready():
+        from app_core.db import db
+        if db.ready:
+            return {'ready': True}
+        return {'ready': False}, 503
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(student_bp)
@@ -70,6 +122,14 @@ def create_app(config_class=Config):
     # Initialize default user accounts
     with app.app_context():
         UserService.initialize_default_accounts()
+        SearchService.init_search_schema()
+        TranscriptService.init_transcript_schema()
+        PlanAuditService.init_audit_schema()
+        RankingService.init_ranking_schema()
+        init_conditional(app)
+        # Local import keeps NumPy out of module import; the snapshot loads on first use
+        from app_core.analytics import init_analytics
+        init_analytics(app)
         logger.info("✅ Application initialized successfully")
     
     return app
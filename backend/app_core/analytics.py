@@ -0,0 +1,588 @@
+"""
+In-memory columnar snapshot of enrollments for dashboards.
+
+Enrollments are held as NumPy columns (ids as int32, scores as float32 with
+NaN for NULL) next to small course / student lookup arrays, and course,
+major and teacher aggregates, histograms and percentiles are answered with
+vectorised kernels instead of GROUP BY queries on the OLTP tables. Each row
+also carries its enrolment term (half-year of ``enrolled_at``) so
+distributions can be split by term and compared with the term before;
+``distribution`` results are cached until the snapshot changes.
+
+Refresh is incremental. ``enrollments.updated_at`` is maintained by a row
+trigger and deleted ids are logged in ``enrollment_deletions``, so a refresh
+reads only rows with ``id`` or ``updated_at`` past the last watermark (minus
+Config.ANALYTICS_WATERMARK_LAG seconds for transactions that committed late)
+and drops logged deletions. The table version counters from conditional.py
+are the change notification: when they have not moved, a refresh issues no
+enrollment query at all. Changes are checked at most every
+Config.ANALYTICS_REFRESH_SECONDS (-1 = off, callers fall back to SQL), right
+away after a write handled by this process, and a full reload runs every
+Config.ANALYTICS_FULL_RELOAD_SECONDS as a safety net.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from flask import request
+
+from app_core.config import Config
+from app_core.grading import final_grade_array
+from app_core.terms import term_index, term_label
+from app_core.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Deleted-id log entries older than this are pruned
+DELETION_RETENTION = timedelta(days=1)
+
+GROUPS = ('course', 'major', 'teacher')
+SCORE_COLUMNS = ('final_grade', 'ordinary_score', 'final_score')
+DECILES = (10, 20, 30, 40, 50, 60, 70, 80, 90)
+MAX_BINS = 100
+
+_distributions = TTLCache('analytics_distribution', ttl=300, max_entries=1024)
+
+
+def describe(values: np.ndarray, bins: int = 10, qs: Sequence[int] = DECILES) -> Dict[str, Any]:
+    """Count, mean, 0-100 histogram (last bin includes 100) and percentiles of the non-NaN ``values``."""
+    values = values[~np.isnan(values)].astype(np.float64)
+    counts, edges = np.histogram(values, bins=bins, range=(0, 100))
+    return {
+        'count': int(len(values)),
+        'mean': round(float(values.mean()), 2) if len(values) else None,
+        'histogram': {'edges': [round(float(e), 2) for e in edges], 'counts': counts.tolist()},
+        'percentiles': ({f'p{q}': round(float(v), 2) for q, v in zip(qs, np.percentile(values, list(qs)))}
+                        if len(values) else {f'p{q}': None for q in qs}),
+    }
+
+
+def summarize(scores: Dict[str, np.ndarray], terms: np.ndarray, bins: int = 10,
+              term: Optional[int] = None, compare: bool = False) -> Dict[str, Any]:
+    """Distributions of each score column, optionally for one term and against the term before it.
+
+    With ``compare`` and no ``term`` the latest term present is used.
+    """
+    if not 1 <= bins <= MAX_BINS:
+        raise ValueError(f'bins必须在1-{MAX_BINS}之间')
+    if compare and term is None:
+        known = terms[terms >= 0]
+        term = int(known.max()) if len(known) else None
+
+    def _for(mask):
+        return {name: describe(values if mask is None else values[mask], bins) for name, values in scores.items()}
+
+    result = {'term': term_label(term) if term is not None else None,
+              'columns': _for(None if term is None else terms == term),
+              'previous': None}
+    if compare and term is not None:
+        result['previous'] = {'term': term_label(term - 1), 'columns': _for(terms == term - 1)}
+    return result
+
+
+def _float_column(values: List[Any]) -> np.ndarray:
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float32)
+
+
+# Rows converted per batch by a full load; matches the stream's fetch size
+LOAD_BATCH = 2000
+
+CENT = Decimal('0.01')
+
+
+def _rate(value: float) -> Optional[Decimal]:
+    """Two-decimal Decimal, as ``ROUND(x::numeric, 2)`` returns it (half away from zero)."""
+    if value is None or np.isnan(value):
+        return None
+    return Decimal(float(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _percent(part: int, total: int) -> Optional[Decimal]:
+    """``ROUND(part::numeric / total * 100, 2)`` computed exactly from the integer counts."""
+    if not total:
+        return None
+    return (Decimal(int(part)) * 100 / Decimal(int(total))).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class _Columns:
+    """One immutable generation of the snapshot; readers keep a reference while refreshes swap it."""
+
+    def __init__(self, ids, student_ids, course_ids, ordinary, final, grade, terms):
+        self.ids = ids
+        self.student_ids = student_ids
+        self.course_ids = course_ids
+        self.ordinary = ordinary
+        self.final = final
+        self.grade = grade
+        self.terms = terms
+        self.final_grade = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> '_Columns':
+        rows = list(rows)
+        return cls(
+            np.fromiter((r['id'] for r in rows), dtype=np.int32, count=len(rows)),
+            np.fromiter((r['student_id'] for r in rows), dtype=np.int32, count=len(rows)),
+            np.fromiter((r['course_id'] for r in rows), dtype=np.int32, count=len(rows)),
+            _float_column([r['ordinary_score'] for r in rows]),
+            _float_column([r['final_score'] for r in rows]),
+            _float_column([r['grade'] for r in rows]),
+            np.fromiter((term_index(r['enrolled_at']) for r in rows), dtype=np.int32, count=len(rows)),
+        )
+
+    @classmethod
+    def concat(cls, parts: List['_Columns']) -> '_Columns':
+        """One generation from id-ordered batches."""
+        if not parts:
+            return cls.from_rows([])
+        fields = ('ids', 'student_ids', 'course_ids', 'ordinary', 'final', 'grade', 'terms')
+        return cls(*(np.concatenate([getattr(p, f) for p in parts]) for f in fields))
+
+    def merge(self, delta: '_Columns', deleted: np.ndarray) -> '_Columns':
+        """New generation with ``delta`` rows upserted by id and ``deleted`` ids removed."""
+        fields = ('ids', 'student_ids', 'course_ids', 'ordinary', 'final', 'grade', 'terms')
+        keep = ~np.isin(self.ids, delta.ids)
+        merged = [np.concatenate([getattr(self, f)[keep], getattr(delta, f)]) for f in fields]
+        if len(deleted):
+            live = ~np.isin(merged[0], deleted)
+            merged = [column[live] for column in merged]
+        # Late commits can carry ids below the watermark; keep the columns id-ordered
+        if len(merged[0]) > 1 and np.any(merged[0][1:] < merged[0][:-1]):
+            order = np.argsort(merged[0], kind='stable')
+            merged = [column[order] for column in merged]
+        return _Columns(*merged)
+
+
+class _Dimensions:
+    """Course and student attributes as arrays indexed by id."""
+
+    def __init__(self, courses: List[Dict[str, Any]], teachers: List[Dict[str, Any]],
+                 students: List[Dict[str, Any]]):
+        size = max((c['id'] for c in courses), default=0) + 1
+        self.course_rows = {c['id']: c for c in courses}
+        self.course_teacher = np.full(size, -1, dtype=np.int32)
+        self.ordinary_weight = np.full(size, np.nan, dtype=np.float32)
+        self.final_weight = np.full(size, np.nan, dtype=np.float32)
+        for c in courses:
+            if c['teacher_id'] is not None:
+                self.course_teacher[c['id']] = c['teacher_id']
+            if c['ordinary_weight'] is not None:
+                self.ordinary_weight[c['id']] = float(c['ordinary_weight'])
+            if c['final_weight'] is not None:
+                self.final_weight[c['id']] = float(c['final_weight'])
+        self.teacher_names = {t['id']: t['name'] for t in teachers}
+
+        self.majors: List[str] = sorted({s['major'] or '' for s in students})
+        codes = {major: code for code, major in enumerate(self.majors)}
+        self.student_major = np.full(max((s['id'] for s in students), default=0) + 1, -1, dtype=np.int16)
+        for s in students:
+            self.student_major[s['id']] = codes[s['major'] or '']
+
+    def lookup(self, table: np.ndarray, ids: np.ndarray, missing) -> np.ndarray:
+        """``table[ids]`` with ``missing`` for ids beyond the table (rows newer than the dimensions)."""
+        out = np.full(len(ids), missing, dtype=table.dtype)
+        inside = ids < len(table)
+        out[inside] = table[ids[inside]]
+        return out
+
+
+class EnrollmentAnalytics:
+    """Process-local snapshot with lazy, incremental refresh."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns: Optional[_Columns] = None
+        self._dims: Optional[_Dimensions] = None
+        self._versions: Dict[str, int] = {}
+        self._max_id = 0
+        self._updated_watermark = None
+        self._deleted_watermark = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._stale = True
+        self._incremental = True
+        # Bumped whenever the data changes; keys the distribution cache
+        self.generation = 0
+
+    # ----- lifecycle ----- #
+
+    @property
+    def enabled(self) -> bool:
+        return Config.ANALYTICS_REFRESH_SECONDS >= 0
+
+    def mark_stale(self):
+        """Check for changes on the next read (called after local writes)."""
+        self._stale = True
+
+    def reset(self):
+        with self._lock:
+            self._columns = None
+            self._dims = None
+            self._versions = {}
+            self._stale = True
+
+    def _table_versions(self) -> Dict[str, int]:
+        from app_core.conditional import current_versions
+        try:
+            versions = current_versions(('enrollments', 'courses', 'teachers', 'students'))
+            return {name: version for name, (version, _) in versions.items()}
+        except Exception:
+            return {}
+
+    def _load_dimensions(self, db) -> _Dimensions:
+        courses = db.fetch_all(
+            'SELECT id, name, course_code, teacher_id, ordinary_weight, final_weight FROM courses')
+        teachers = db.fetch_all('SELECT id, name FROM teachers')
+        students = db.fetch_all('SELECT id, major FROM students')
+        return _Dimensions(courses, teachers, students)
+
+    def _full_load(self, db):
+        stream = db.stream(
+            'SELECT id, student_id, course_id, ordinary_score, final_score, grade, enrolled_at, updated_at '
+            'FROM enrollments ORDER BY id' if self._incremental else
+            'SELECT id, student_id, course_id, ordinary_score, final_score, grade, enrolled_at '
+            'FROM enrollments ORDER BY id',
+            batch_size=LOAD_BATCH,
+        )
+        # Convert batch by batch so only one batch of row dicts is alive at a time
+        parts: List[_Columns] = []
+        watermark = None
+        while True:
+            batch = list(islice(stream, LOAD_BATCH))
+            if not batch:
+                break
+            parts.append(_Columns.from_rows(batch))
+            newest = max((r['updated_at'] for r in batch if r.get('updated_at')), default=None)
+            if newest is not None and (watermark is None or newest > watermark):
+                watermark = newest
+        self._columns = _Columns.concat(parts)
+        self._max_id = int(self._columns.ids[-1]) if len(self._columns) else 0
+        self._updated_watermark = watermark
+        self._deleted_watermark = None
+        if self._incremental:
+            db.execute('DELETE FROM enrollment_deletions WHERE deleted_at < NOW() - %s', [DELETION_RETENTION])
+            marker = db.fetch_one('SELECT MAX(deleted_at) AS at FROM enrollment_deletions')
+            self._deleted_watermark = marker['at'] if marker else None
+        self._loaded_at = time.monotonic()
+
+    def _apply_changes(self, db):
+        lag = timedelta(seconds=Config.ANALYTICS_WATERMARK_LAG)
+        params: List[Any] = [self._max_id]
+        where = 'id > %s'
+        if self._updated_watermark is not None:
+            where += ' OR updated_at >= %s'
+            params.append(self._updated_watermark - lag)
+        rows = db.fetch_all(
+            'SELECT id, student_id, course_id, ordinary_score, final_score, grade, enrolled_at, updated_at '
+            f'FROM enrollments WHERE {where} ORDER BY id',
+            params
+        )
+        if self._deleted_watermark is not None:
+            deleted_rows = db.fetch_all('SELECT id, deleted_at FROM enrollment_deletions WHERE deleted_at >= %s',
+                                        [self._deleted_watermark - lag])
+        else:
+            deleted_rows = db.fetch_all('SELECT id, deleted_at FROM enrollment_deletions')
+        if not rows and not deleted_rows:
+            return
+        delta = _Columns.from_rows(rows)
+        deleted = np.fromiter((r['id'] for r in deleted_rows), dtype=np.int32, count=len(deleted_rows))
+        self._columns = self._columns.merge(delta, deleted)
+        if len(delta):
+            self._max_id = max(self._max_id, int(delta.ids.max()))
+            newest = max((r['updated_at'] for r in rows if r.get('updated_at')), default=None)
+            if newest is not None and (self._updated_watermark is None or newest > self._updated_watermark):
+                self._updated_watermark = newest
+        if deleted_rows:
+            newest = max(r['deleted_at'] for r in deleted_rows)
+            if self._deleted_watermark is None or newest > self._deleted_watermark:
+                self._deleted_watermark = newest
+
+    def refresh(self, force: bool = False):
+        """Bring the snapshot up to date; ``force`` reloads everything."""
+        from app_core.db import db
+        with self._lock:
+            versions = self._table_versions()
+            changed = {name for name, version in versions.items() if self._versions.get(name) != version}
+            full = (force or self._columns is None or not self._incremental
+                    or time.monotonic() - self._loaded_at >= Config.ANALYTICS_FULL_RELOAD_SECONDS)
+            started = time.perf_counter()
+            # Without version counters every check has to look at the tables
+            if self._dims is None or not versions or changed & {'courses', 'teachers', 'students'}:
+                self._dims = self._load_dimensions(db)
+            if full:
+                self._full_load(db)
+            elif not versions or 'enrollments' in changed:
+                self._apply_changes(db)
+            elif not changed:
+                self._versions = versions
+                return
+            columns = self._columns
+            dims = self._dims
+            columns.final_grade = final_grade_array(
+                columns.ordinary, columns.final,
+                dims.lookup(dims.ordinary_weight, columns.course_ids, np.nan),
+                dims.lookup(dims.final_weight, columns.course_ids, np.nan),
+                columns.grade,
+            ).astype(np.float32)
+            self._versions = versions
+            self.generation += 1
+            logger.debug(f"Analytics snapshot {'reloaded' if full else 'refreshed'}: "
+                         f"{len(columns)} enrollments in {time.perf_counter() - started:.3f}s")
+
+    def snapshot(self):
+        """``(columns, dimensions)`` refreshed per the configured interval, or None when unavailable."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if self._stale or self._columns is None or now - self._checked_at >= Config.ANALYTICS_REFRESH_SECONDS:
+            self._stale = False
+            self._checked_at = now
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.warning(f"⚠️ Analytics snapshot unavailable, falling back to SQL: {exc}")
+                self.reset()
+                return None
+        if self._columns is None or self._columns.final_grade is None:
+            return None
+        return self._columns, self._dims
+
+    # ----- kernels ----- #
+
+    @staticmethod
+    def _keys(columns: _Columns, dims: _Dimensions, by: str) -> np.ndarray:
+        if by == 'course':
+            return columns.course_ids
+        if by == 'teacher':
+            return dims.lookup(dims.course_teacher, columns.course_ids, -1)
+        if by == 'major':
+            return dims.lookup(dims.student_major, columns.student_ids, -1).astype(np.int32)
+        raise ValueError(f'by必须是 {", ".join(GROUPS)} 之一')
+
+    @staticmethod
+    def _aggregate(keys: np.ndarray, grades: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+        valid = keys >= 0
+        keys, grades = keys[valid], grades[valid]
+        graded = ~np.isnan(grades)
+        counts = np.bincount(keys, minlength=size)
+        totals = np.bincount(keys[graded], weights=grades[graded].astype(np.float64), minlength=size)
+        n_graded = np.bincount(keys[graded], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {
+                'enrolled_count': counts,
+                'avg_grade': np.where(n_graded > 0, totals / np.maximum(n_graded, 1), np.nan),
+                # Counts, not ratios: rates are rounded exactly by _percent
+                'passed': np.bincount(keys[graded & (grades >= 60)], minlength=size),
+                'excellent': np.bincount(keys[graded & (grades >= 90)], minlength=size),
+            }
+
+    def course_stats(self, course_ids: Optional[Sequence[int]] = None,
+                     teacher_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Rows shaped like ``AdminService._fetch_course_stats`` (every matching course, id order)."""
+        loaded = self.snapshot()
+        if loaded is None:
+            return None
+        columns, dims = loaded
+        size = max(len(dims.course_teacher), int(columns.course_ids.max()) + 1 if len(columns) else 0)
+        stats = self._aggregate(columns.course_ids, columns.final_grade, size)
+        wanted = sorted(dims.course_rows) if course_ids is None else sorted(set(course_ids) & set(dims.course_rows))
+        out = []
+        for cid in wanted:
+            course = dims.course_rows[cid]
+            if teacher_id is not None and course['teacher_id'] != teacher_id:
+                continue
+            out.append({
+                'id': cid,
+                'name': course['name'],
+                'course_code': course['course_code'],
+                'enrolled_count': int(stats['enrolled_count'][cid]),
+                'avg_grade': _rate(stats['avg_grade'][cid]),
+                'pass_rate': _percent(stats['passed'][cid], stats['enrolled_count'][cid]),
+                'excellent_rate': _percent(stats['excellent'][cid], stats['enrolled_count'][cid]),
+            })
+        return out
+
+    def group_stats(self, by: str) -> Optional[List[Dict[str, Any]]]:
+        """Enrolment count, average and pass/excellent rates per course, major or teacher."""
+        if by == 'course':
+            return self.course_stats()
+        loaded = self.snapshot()
+        if loaded is None:
+            return None
+        columns, dims = loaded
+        keys = self._keys(columns, dims, by)
+        size = int(keys.max()) + 1 if len(keys) else 0
+        stats = self._aggregate(keys, columns.final_grade, size)
+        out = []
+        for key in np.flatnonzero(stats['enrolled_count']):
+            key = int(key)
+            out.append({
+                'key': key if by == 'teacher' else dims.majors[key],
+                'name': dims.teacher_names.get(key) if by == 'teacher' else dims.majors[key],
+                'enrolled_count': int(stats['enrolled_count'][key]),
+                'avg_grade': _rate(stats['avg_grade'][key]),
+                'pass_rate': _percent(stats['passed'][key], stats['enrolled_count'][key]),
+                'excellent_rate': _percent(stats['excellent'][key], stats['enrolled_count'][key]),
+            })
+        return out
+
+    def _mask(self, columns: _Columns, dims: _Dimensions, by: Optional[str], key: Any) -> Optional[np.ndarray]:
+        """Rows of one course / major / teacher (None = every row)."""
+        if by is None:
+            return None
+        if by == 'major':
+            if key not in dims.majors:
+                return np.zeros(len(columns), dtype=bool)
+            key = dims.majors.index(key)
+        try:
+            key = int(key)
+        except (TypeError, ValueError):
+            raise ValueError('key必须是整数')
+        return self._keys(columns, dims, by) == key
+
+    def scores(self, by: Optional[str] = None, key: Any = None,
+               column: str = 'final_grade') -> Optional[np.ndarray]:
+        """Non-null ``column`` values, optionally limited to one course / major / teacher."""
+        if column not in SCORE_COLUMNS:
+            raise ValueError(f'column必须是 {", ".join(SCORE_COLUMNS)} 之一')
+        loaded = self.snapshot()
+        if loaded is None:
+            return None
+        columns, dims = loaded
+        values = {'final_grade': columns.final_grade, 'ordinary_score': columns.ordinary,
+                  'final_score': columns.final}[column]
+        mask = self._mask(columns, dims, by, key)
+        if mask is not None:
+            values = values[mask]
+        return values[~np.isnan(values)]
+
+    def histogram(self, by: Optional[str] = None, key: Any = None, column: str = 'final_grade',
+                  bins: int = 10) -> Optional[Dict[str, List]]:
+        """Counts per equal-width bin over 0-100 (the last bin includes 100)."""
+        values = self.scores(by, key, column)
+        return None if values is None else describe(values, bins)['histogram']
+
+    def percentiles(self, by: Optional[str] = None, key: Any = None, column: str = 'final_grade',
+                    qs: Sequence[int] = DECILES) -> Optional[Dict[str, Optional[float]]]:
+        """``{"p50": ...}`` by linear interpolation; None values when nothing is graded."""
+        values = self.scores(by, key, column)
+        return None if values is None else describe(values, qs=qs)['percentiles']
+
+    def distribution(self, by: Optional[str] = None, key: Any = None, bins: int = 10,
+                     term: Optional[int] = None, compare: bool = False) -> Optional[Dict[str, Any]]:
+        """``summarize`` over one group's rows, cached until the snapshot changes."""
+        if by is not None and by not in GROUPS:
+            raise ValueError(f'by必须是 {", ".join(GROUPS)} 之一')
+        loaded = self.snapshot()
+        if loaded is None:
+            return None
+        cache_key = (self.generation, by, str(key), bins, term, compare)
+        cached = _distributions.get(cache_key)
+        if cached is not None:
+            return cached
+        columns, dims = loaded
+        mask = self._mask(columns, dims, by, key)
+        pick = (lambda a: a) if mask is None else (lambda a: a[mask])
+        result = summarize(
+            {'final_grade': pick(columns.final_grade), 'ordinary_score': pick(columns.ordinary),
+             'final_score': pick(columns.final)},
+            pick(columns.terms), bins, term, compare,
+        )
+        _distributions.set(cache_key, result)
+        return result
+
+
+def distribution_from_rows(rows: Iterable[Dict[str, Any]], bins: int = 10, term: Optional[int] = None,
+                           compare: bool = False) -> Dict[str, Any]:
+    """``summarize`` over query rows carrying the score columns and ``enrolled_at`` (SQL fallback)."""
+    rows = list(rows)
+    scores = {name: _float_column([r[name] for r in rows]) for name in SCORE_COLUMNS}
+    terms = np.fromiter((term_index(r['enrolled_at']) for r in rows), dtype=np.int32, count=len(rows))
+    return summarize(scores, terms, bins, term, compare)
+
+
+analytics = EnrollmentAnalytics()
+
+
+def init_analytics(app) -> bool:
+    """Install the change-tracking schema and re-check the snapshot after local writes."""
+
+    @app.after_request
+    def _analytics_after_write(response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            analytics.mark_stale()
+        return response
+
+    return init_analytics_schema()
+
+
+def init_analytics_schema() -> bool:
+    """Add ``enrollments.updated_at`` and the deletion log with their triggers (idempotent)."""
+    from app_core.db import db
+    try:
+        with db.get_cursor(autocommit=True) as cur:
+            cur.execute(
+                '''
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='enrollments' AND column_name='updated_at') THEN
+                        ALTER TABLE enrollments ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT NOW();
+                    END IF;
+                END $$;
+                '''
+            )
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_updated_at ON enrollments(updated_at)')
+            cur.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS enrollment_deletions (
+                    id INT NOT NULL,
+                    deleted_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                '''
+            )
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_enrollment_deletions_at ON enrollment_deletions(deleted_at)')
+            cur.execute(
+                '''
+                CREATE OR REPLACE FUNCTION touch_enrollment() RETURNS trigger AS $$
+                BEGIN
+                    NEW.updated_at := NOW();
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql
+                '''
+            )
+            cur.execute(
+                '''
+                CREATE OR REPLACE FUNCTION log_enrollment_deletion() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO enrollment_deletions (id) VALUES (OLD.id);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+                '''
+            )
+            cur.execute('DROP TRIGGER IF EXISTS trg_enrollments_touch ON enrollments')
+            cur.execute(
+                'CREATE TRIGGER trg_enrollments_touch BEFORE UPDATE ON enrollments '
+                'FOR EACH ROW EXECUTE PROCEDURE touch_enrollment()'
+            )
+            cur.execute('DROP TRIGGER IF EXISTS trg_enrollments_deleted ON enrollments')
+            cur.execute(
+                'CREATE TRIGGER trg_enrollments_deleted AFTER DELETE ON enrollments '
+                'FOR EACH ROW EXECUTE PROCEDURE log_enrollment_deletion()'
+            )
+        analytics._incremental = True
+        logger.info("✅ Analytics change tracking installed")
+    except Exception as exc:
+        # Without the watermark columns every detected change is a full reload
+        analytics._incremental = False
+        logger.warning(f"⚠️ Analytics change tracking unavailable, using full reloads: {exc}")
+    return analytics._incremental
@@ -1,10 +1,13 @@
 """
 Admin routes blueprint.
 """
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file
 
-from app_core.services import AdminService, MajorPlanService
-from app_core.utils import json_response, error_response, validate_fields, require_auth
+from app_core.conditional import conditional_get
+from app_core.responses import list_response, wants_ndjson
+from app_core.services import (AdminService, MajorPlanService, PlanAuditService, RankingService, SearchService,
+                               TranscriptService, VersionConflict)
+from app_core.utils import json_response, error_response, conflict_response, validate_fields, require_auth
 from app_core.utils.validators import validate_major_plan, validate_plan_course, validate_semester
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api')
@@ -19,8 +22,8 @@ def students():
     if request.method == 'GET':
         major = request.args.get('major')
         keyword = request.args.get('q')
-        students = AdminService.get_students(major, keyword)
-        return jsonify(students)
+        students = AdminService.get_students(major, keyword, stream=wants_ndjson())
+        return list_response(students)
     
     # POST - Create student
     payload = request.get_json(force=True)
@@ -39,6 +42,16 @@ def students():
     return json_response({'id': student_id}, message='Student created successfully')
 
 
+@admin_bp.route('/students/search', methods=['GET'])
+@require_auth(['admin'])
+def search_students():
+    """Ranked type-ahead search over student number and name."""
+    keyword = request.args.get('q', '')
+    limit = request.args.get('limit', 20, type=int)
+    major = request.args.get('major')
+    return jsonify(SearchService.search_students(keyword, limit, major))
+
+
 @admin_bp.route('/students/<int:student_id>', methods=['PUT', 'DELETE'])
 @require_auth(['admin'])
 def update_student(student_id: int):
@@ -70,7 +83,7 @@ def teachers():
     """Get all teachers or create a new teacher."""
     if request.method == 'GET':
         teachers = AdminService.get_teachers()
-        return jsonify(teachers)
+        return list_response(teachers)
     
     # POST - Create teacher
     payload = request.get_json(force=True)
@@ -111,11 +124,12 @@ def update_teacher(teacher_id: int):
 
 @admin_bp.route('/courses', methods=['GET', 'POST'])
 @require_auth(['admin'])
+@conditional_get('courses', 'teachers')
 def courses():
     """Get all courses or create a new course."""
     if request.method == 'GET':
         courses = AdminService.get_courses()
-        return jsonify(courses)
+        return list_response(courses)
     
     # POST - Create course
     payload = request.get_json(force=True)
@@ -146,6 +160,15 @@ def courses():
     return json_response({'id': course_id}, message='Course created successfully')
 
 
+@admin_bp.route('/courses/search', methods=['GET'])
+@require_auth(['admin'])
+def search_courses():
+    """Ranked type-ahead search over course code and name."""
+    keyword = request.args.get('q', '')
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(SearchService.search_courses(keyword, limit))
+
+
 @admin_bp.route('/courses/<int:course_id>', methods=['PUT', 'DELETE'])
 @require_auth(['admin'])
 def update_course(course_id: int):
@@ -175,8 +198,12 @@ def update_course_weights(course_id: int):
         ordinary_weight = float(payload['ordinary_weight'])
         final_weight = float(payload['final_weight'])
         
-        AdminService.update_course_weights(course_id, ordinary_weight, final_weight)
+        expected_version = AdminService.parse_version(payload)
+        if not AdminService.update_course_weights(course_id, ordinary_weight, final_weight, expected_version):
+            return error_response('课程不存在', status=404)
         return json_response(message='课程成绩占比更新成功')
+    except VersionConflict as e:
+        return conflict_response(str(e), e.current)
     except ValueError as e:
         return error_response(str(e))
 
@@ -190,8 +217,8 @@ def enrollments():
     if request.method == 'GET':
         student_id = request.args.get('student_id')
         course_id = request.args.get('course_id')
-        enrollments = AdminService.get_enrollments(student_id, course_id)
-        return jsonify(enrollments)
+        enrollments = AdminService.get_enrollments(student_id, course_id, stream=wants_ndjson())
+        return list_response(enrollments)
     
     # POST - Create enrollment
     payload = request.get_json(force=True)
@@ -242,13 +269,15 @@ def update_student_grades(enrollment_id: int):
         "ordinary_score": 80,    # 平时成绩 (0-100)
         "final_score": 85,       # 期末成绩 (0-100)
         "ordinary_weight": 0.4,  # 平时成绩占比 (0-1)
-        "final_weight": 0.6      # 期末成绩占比 (0-1)
+        "final_weight": 0.6,     # 期末成绩占比 (0-1)
+        "version": 3             # 读到的记录版本（可选）
     }
     
     Notes:
     - ordinary_weight and final_weight must sum to 1
     - If only one weight is provided, the other is calculated automatically
-    - final_grade is automatically calculated as: ordinary_score * ordinary_weight + final_score * final_weight
+    - final_grade is derived on read as: ordinary_score * ordinary_weight + final_score * final_weight
+    - A stale version gets 409 with the current row
     """
     payload = request.get_json(force=True)
     
@@ -257,6 +286,8 @@ def update_student_grades(enrollment_id: int):
         if not success:
             return error_response('No fields to update')
         return json_response(message='Student grades updated successfully')
+    except VersionConflict as e:
+        return conflict_response(str(e), e.current)
     except ValueError as e:
         return error_response(str(e))
     except Exception as e:
@@ -272,6 +303,92 @@ def drop_course(enrollment_id: int):
     return json_response(message='Enrollment deleted successfully')
 
 
+# ========== Transcripts ========== #
+
+@admin_bp.route('/students/<int:student_id>/transcript', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('enrollments', 'courses', 'students')
+def student_transcript(student_id: int):
+    """Get a student's transcript: GPA, earned credits, per-term and per-course rows."""
+    transcript = TranscriptService.get_transcript(student_id)
+    if not transcript:
+        return error_response('Student not found', status=404)
+    return jsonify(transcript)
+
+
+@admin_bp.route('/transcripts', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('enrollments', 'courses', 'students')
+def major_transcripts():
+    """Get the transcripts of every student in a major (?major=...)."""
+    major = request.args.get('major')
+    if not major:
+        return error_response('major为必填')
+    return list_response(TranscriptService.get_major_transcripts(major))
+
+
+# ========== Plan Audit ========== #
+
+@admin_bp.route('/students/<int:student_id>/plan-audit', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('enrollments', 'courses', 'students', 'major_plans', 'major_plan_courses')
+def student_plan_audit(student_id: int):
+    """Get a student's completed, in-progress and missing required plan courses."""
+    audit = PlanAuditService.get_student_audit(student_id)
+    if not audit:
+        return error_response('Student not found', status=404)
+    return jsonify(audit)
+
+
+@admin_bp.route('/plan-audit', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('enrollments', 'courses', 'students', 'major_plans', 'major_plan_courses')
+def major_plan_audit():
+    """Get the plan audit of every student in a major (?major=..., details=0 for counts only)."""
+    major = request.args.get('major')
+    if not major:
+        return error_response('major为必填')
+    details = request.args.get('details', '1').lower() not in ('0', 'false')
+    return list_response(PlanAuditService.get_major_audit(major, details=details))
+
+
+@admin_bp.route('/plan-audit/overview', methods=['GET', 'POST'])
+@require_auth(['admin'])
+def plan_audit_overview():
+    """GET plan completion per major; POST re-audits the whole university first."""
+    if request.method == 'POST':
+        result = PlanAuditService.refresh_all()
+        return json_response({'refresh': result, 'majors': PlanAuditService.get_overview()}, message='审核完成')
+    return jsonify(PlanAuditService.get_overview())
+
+
+# ========== Rankings ========== #
+
+@admin_bp.route('/students/<int:student_id>/rank', methods=['GET'])
+@require_auth(['admin'])
+def student_rank(student_id: int):
+    """Get a student's rank and percentile within their major and semester."""
+    rank = RankingService.get_student_rank(student_id)
+    if not rank:
+        return error_response('该学生暂无排名', status=404)
+    return jsonify(rank)
+
+
+@admin_bp.route('/rankings', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('cohort_ranks', 'students')
+def cohort_rankings():
+    """Get the top students of a cohort (?major=...&semester=...&limit=10)."""
+    try:
+        return jsonify(RankingService.get_top(
+            request.args.get('major'),
+            request.args.get('semester'),
+            request.args.get('limit', 10),
+        ))
+    except ValueError as e:
+        return error_response(str(e))
+
+
 # ========== Statistics ========== #
 
 @admin_bp.route('/statistics/overview', methods=['GET'])
@@ -284,6 +401,36 @@ def statistics_overview():
     return jsonify(stats)
 
 
+@admin_bp.route('/statistics/groups', methods=['GET'])
+@require_auth(['admin'])
+def statistics_groups():
+    """Grade aggregates per course, major or teacher (?by=course|major|teacher)."""
+    try:
+        return jsonify(AdminService.get_group_stats(request.args.get('by', 'course')))
+    except ValueError as e:
+        return error_response(str(e))
+
+
+@admin_bp.route('/statistics/distribution', methods=['GET'])
+@require_auth(['admin'])
+@conditional_get('enrollments', 'courses', 'students', extra=AdminService.distribution_generation)
+def statistics_distribution():
+    """Score histograms and deciles for one course, major or teacher.
+
+    Query: by=course|major|teacher, key=<id or major>, bins=10, term=2025秋, compare=1
+    """
+    try:
+        return jsonify(AdminService.get_distribution(
+            request.args.get('by', 'course'),
+            request.args.get('key'),
+            bins=int(request.args.get('bins', 10)),
+            term=request.args.get('term'),
+            compare=request.args.get('compare', '').lower() in ('1', 'true'),
+        ))
+    except ValueError as e:
+        return error_response(str(e))
+
+
 # ========== Excel Import / Export ========== #
 
 @admin_bp.route('/import/courses', methods=['POST'])
@@ -330,10 +477,59 @@ def health_check():
         return jsonify({'db': False}), 503
 
 
+# ========== Profiling ========== #
+
+@admin_bp.route('/profiling/reports', methods=['GET'])
+@require_auth(['admin'])
+def profiling_reports():
+    """List stored per-request profiles (?__profile=1)."""
+    from app_core.profiling import profile_store
+    return jsonify(profile_store.list())
+
+
+@admin_bp.route('/profiling/reports/<int:report_id>', methods=['GET'])
+@require_auth(['admin'])
+def profiling_report(report_id: int):
+    """Get a stored profile as plain text."""
+    from app_core.profiling import profile_store
+    report = profile_store.get(report_id)
+    if not report:
+        return error_response('Profile not found', status=404)
+    header = f"{report['method']} {report['path']} ({report['elapsed_ms']} ms, {report['created_at']})\n\n"
+    return Response(header + report['report'], mimetype='text/plain')
+
+
+@admin_bp.route('/profiling/sampler', methods=['GET', 'POST', 'DELETE'])
+@require_auth(['admin'])
+def profiling_sampler():
+    """Sampled request stacks: GET folded stacks, POST start/stop, DELETE reset."""
+    from app_core.profiling import sampler
+    if request.method == 'GET':
+        return Response(sampler.folded(), mimetype='text/plain',
+                        headers={'X-Samples': str(sampler.samples)})
+    if request.method == 'DELETE':
+        sampler.reset()
+        return json_response(message='Sampler reset')
+
+    payload = request.get_json(silent=True) or {}
+    if payload.get('action', 'start') == 'stop':
+        sampler.stop()
+        return json_response({'running': False})
+    try:
+        interval = float(payload.get('interval', 0.01))
+    except (TypeError, ValueError):
+        return error_response('interval must be a number')
+    if interval <= 0:
+        return error_response('interval must be positive')
+    sampler.start(interval)
+    return json_response({'running': True, 'interval': interval})
+
+
 # ========== Major Plans ========== #
 
 @admin_bp.route('/major-plans', methods=['GET', 'POST'])
 @require_auth(['admin'])
+@conditional_get('major_plans')
 def major_plans():
     """Get all major plans or create a new one."""
     if request.method == 'GET':
@@ -1,9 +1,11 @@
 """
 Authentication routes blueprint.
 """
-from flask import Blueprint, request, session
+from flask import Blueprint, current_app, request, session
 
+from app_core.credentials import CredentialsBusy
 from app_core.services import UserService
+from app_core.sessions import revoke_current_session, revoke_user_sessions
 from app_core.utils import json_response, error_response, validate_fields, require_auth
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -19,7 +21,10 @@ def login():
     except ValueError as e:
         return error_response(str(e))
     
-    user = UserService.authenticate(payload['username'], payload['password'])
+    try:
+        user = UserService.authenticate(payload['username'], payload['password'])
+    except CredentialsBusy as e:
+        return error_response(str(e), status=503)
     
     if not user:
         return error_response('Invalid username or password', status=401)
@@ -30,6 +35,7 @@ def login():
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     """User logout endpoint."""
+    revoke_current_session(current_app)
     session.clear()
     return json_response()
 
@@ -55,13 +61,19 @@ def change_password():
     except ValueError as e:
         return error_response(str(e))
     
-    success = UserService.change_password(
-        session['user_id'],
-        payload['old_password'],
-        payload['new_password']
-    )
+    try:
+        success = UserService.change_password(
+            session['user_id'],
+            payload['old_password'],
+            payload['new_password']
+        )
+    except CredentialsBusy as e:
+        return error_response(str(e), status=503)
     
     if not success:
         return error_response('Incorrect old password', status=400)
     
+    # 修改密码后使该用户的其他会话失效
+    revoke_user_sessions(current_app, session['user_id'])
+    
     return json_response(message='Password changed successfully')
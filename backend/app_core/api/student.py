@@ -3,7 +3,9 @@ Student routes blueprint.
 """
 from flask import Blueprint, request, session, jsonify
 
-from app_core.services import StudentService
+from app_core.conditional import conditional_get
+from app_core.responses import list_response
+from app_core.services import PlanAuditService, RankingService, StudentService, TranscriptService
 from app_core.utils import json_response, error_response, validate_fields, require_auth
 from app_core.utils.validators import validate_semester
 
@@ -25,6 +27,7 @@ def get_student_info():
 
 @student_bp.route('/semesters', methods=['GET'])
 @require_auth(['student'])
+@conditional_get('students', 'major_plans', 'major_plan_courses')
 def get_semesters():
     """Get all available semesters for student's major plan."""
     student_id = session['ref_id']
@@ -34,6 +37,7 @@ def get_semesters():
 
 @student_bp.route('/courses/available', methods=['GET'])
 @require_auth(['student'])
+@conditional_get('students', 'major_plans', 'major_plan_courses', 'courses', 'teachers', 'enrollments')
 def get_available_courses():
     """
     Get all courses available for enrollment based on major plan.
@@ -62,7 +66,7 @@ def enrollments():
     if request.method == 'GET':
         enrollments = StudentService.get_enrollments(student_id)
         # Frontend expects a plain array, not a wrapped payload
-        return jsonify(enrollments)
+        return list_response(enrollments)
     
     # POST - Enroll in course
     payload = request.get_json(force=True)
@@ -89,3 +93,35 @@ def drop_course(enrollment_id: int):
         return error_response('Enrollment not found or access denied', status=404)
     
     return json_response(message='Course dropped successfully')
+
+
+@student_bp.route('/transcript', methods=['GET'])
+@require_auth(['student'])
+@conditional_get('enrollments', 'courses', 'students')
+def get_transcript():
+    """Get current student's transcript: GPA, earned credits, per-term and per-course rows."""
+    transcript = TranscriptService.get_transcript(session['ref_id'])
+    if not transcript:
+        return error_response('Student not found', status=404)
+    return jsonify(transcript)
+
+
+@student_bp.route('/plan-audit', methods=['GET'])
+@require_auth(['student'])
+@conditional_get('enrollments', 'courses', 'students', 'major_plans', 'major_plan_courses')
+def get_plan_audit():
+    """Get current student's progress against their major plan."""
+    audit = PlanAuditService.get_student_audit(session['ref_id'])
+    if not audit:
+        return error_response('Student not found', status=404)
+    return jsonify(audit)
+
+
+@student_bp.route('/rank', methods=['GET'])
+@require_auth(['student'])
+def get_rank():
+    """Get current student's rank and percentile within their major and semester."""
+    rank = RankingService.get_student_rank(session['ref_id'])
+    if not rank:
+        return error_response('暂无排名（尚无已出总评的课程）', status=404)
+    return jsonify(rank)
@@ -3,14 +3,16 @@ Teacher routes blueprint.
 """
 from flask import Blueprint, request, session, jsonify, send_file
 
-from app_core.services import TeacherService
-from app_core.utils import json_response, error_response, require_auth
+from app_core.conditional import conditional_get
+from app_core.services import AdminService, TeacherService, VersionConflict
+from app_core.utils import json_response, error_response, conflict_response, require_auth
 
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/api/teacher')
 
 
 @teacher_bp.route('/courses', methods=['GET'])
 @require_auth(['teacher'])
+@conditional_get('courses', 'enrollments')
 def get_courses():
     """Get courses taught by current teacher."""
     courses = TeacherService.get_courses(session['ref_id'])
@@ -39,6 +41,25 @@ def get_course_stats():
     return jsonify(stats)
 
 
+@teacher_bp.route('/courses/<int:course_id>/distribution', methods=['GET'])
+@require_auth(['teacher'])
+@conditional_get('enrollments', 'courses', extra=AdminService.distribution_generation)
+def get_course_distribution(course_id: int):
+    """Score histograms and deciles for one of the teacher's courses (?bins=10&term=2025秋&compare=1)."""
+    try:
+        result = TeacherService.get_course_distribution(
+            session['ref_id'], course_id,
+            bins=int(request.args.get('bins', 10)),
+            term=request.args.get('term'),
+            compare=request.args.get('compare', '').lower() in ('1', 'true'),
+        )
+    except ValueError as e:
+        return error_response(str(e))
+    if result is None:
+        return error_response('课程不存在或无权限', status=404)
+    return jsonify(result)
+
+
 @teacher_bp.route('/enrollments/<int:enrollment_id>/grade', methods=['PUT'])
 @require_auth(['teacher'])
 def set_grade(enrollment_id: int):
@@ -72,11 +93,13 @@ def update_student_grades(enrollment_id: int):
     Expected payload:
     {
         "ordinary_score": 80,    # 平时成绩 (0-100)
-        "final_score": 85        # 期末成绩 (0-100)
+        "final_score": 85,       # 期末成绩 (0-100)
+        "version": 3             # 读到的记录版本（可选）
     }
     
     Notes:
-    - final_grade is automatically calculated using course-level weights
+    - final_grade is derived on read from the scores and the course-level weights
+    - A stale version gets 409 with the current row
     """
     payload = request.get_json(force=True)
     
@@ -85,12 +108,61 @@ def update_student_grades(enrollment_id: int):
         if not success:
             return error_response('权限检查失败或选课记录不存在', status=404)
         return json_response(message='Student grades updated successfully')
+    except VersionConflict as e:
+        return conflict_response(str(e), e.current)
     except ValueError as e:
         return error_response(str(e))
     except Exception as e:
         return error_response(f'Update failed: {str(e)}', status=500)
 
 
+@teacher_bp.route('/courses/<int:course_id>/grades', methods=['PUT'])
+@require_auth(['teacher'])
+def bulk_update_grades(course_id: int):
+    """Enter grades for many students of a course in one request.
+
+    Expected payload:
+    {
+        "grades": [
+            {"enrollment_id": 12, "ordinary_score": 80, "final_score": 85},
+            {"student_no": "S1002", "final_score": 90}
+        ],
+        "atomic": false          # true: any invalid row cancels the whole batch
+    }
+
+    Notes:
+    - A missing score field keeps the stored value; null clears it
+    - Returns {"updated", "unchanged", "errors": [{"row", "error", ...}]}
+    """
+    payload = request.get_json(force=True) or {}
+    rows = payload.get('grades')
+    if not isinstance(rows, list):
+        return error_response('grades必须是数组')
+
+    summary = TeacherService.bulk_update_grades(
+        session['ref_id'], course_id, rows, atomic=bool(payload.get('atomic')))
+    if summary is None:
+        return error_response('课程不存在或无权限', status=404)
+    return jsonify({'success': not summary['errors'], 'summary': summary})
+
+
+@teacher_bp.route('/courses/<int:course_id>/grades/import', methods=['POST'])
+@require_auth(['teacher'])
+def import_course_grades(course_id: int):
+    """Bulk grade entry from an uploaded Excel file (学号 / 平时成绩 / 期末成绩)."""
+    file = request.files.get('file')
+    if not file:
+        return error_response('缺少文件', status=400)
+    atomic = request.form.get('atomic', '').lower() in ('1', 'true')
+    try:
+        summary = TeacherService.import_course_grades(session['ref_id'], course_id, file, atomic=atomic)
+    except ValueError as exc:
+        return error_response(str(exc), status=400)
+    if summary is None:
+        return error_response('课程不存在或无权限', status=404)
+    return jsonify({'success': not summary['errors'], 'summary': summary})
+
+
 @teacher_bp.route('/courses/<int:course_id>/weights', methods=['PUT'])
 @require_auth(['teacher'])
 def update_course_weights(course_id: int):
@@ -99,13 +171,15 @@ def update_course_weights(course_id: int):
     Expected payload:
     {
         "ordinary_weight": 0.4,  # 平时成绩占比 (0-1)
-        "final_weight": 0.6      # 期末成绩占比 (0-1)
+        "final_weight": 0.6,     # 期末成绩占比 (0-1)
+        "version": 5             # 读到的课程版本（可选）
     }
     
     Notes:
     - ordinary_weight and final_weight must sum to 1
+    - A stale version gets 409 with the current course
     - This updates the course-level default weights for all students
-    - All existing final_grade values in this course will be recalculated
+    - final_grade is derived from the current weights on read, so no enrollment is rewritten
     """
     payload = request.get_json(force=True)
     
@@ -116,11 +190,15 @@ def update_course_weights(course_id: int):
         ordinary_weight = float(payload['ordinary_weight'])
         final_weight = float(payload['final_weight'])
         
-        success = TeacherService.update_course_weights(session['ref_id'], course_id, ordinary_weight, final_weight)
+        expected_version = AdminService.parse_version(payload)
+        success = TeacherService.update_course_weights(
+            session['ref_id'], course_id, ordinary_weight, final_weight, expected_version)
         if not success:
             return error_response('权限检查失败或课程不存在', status=404)
         
         return json_response(message='课程成绩占比更新成功')
+    except VersionConflict as e:
+        return conflict_response(str(e), e.current)
     except ValueError as e:
         return error_response(str(e))
     except Exception as e:
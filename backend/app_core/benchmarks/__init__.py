@@ -0,0 +1,6 @@
+"""
+Benchmark suites (HTTP load scenarios and service-layer micro-benchmarks).
+
+Both run against a real database seeded with app_core/scripts/generate_dataset.py
+and write JSON results that can be compared across commits.
+"""
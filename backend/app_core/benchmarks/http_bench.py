@@ -0,0 +1,396 @@
+"""Repeatable end-to-end HTTP benchmark covering every blueprint.
+
+Usage:
+    cd backend
+    python -m app_core.benchmarks.http_bench --duration 20 --concurrency 10
+    python -m app_core.benchmarks.http_bench --reseed small --scenarios login_storm,poll_available
+    python -m app_core.benchmarks.http_bench --compare app_core/benchmarks/results/<previous>.json
+
+The app is built with create_app() and served in-process by a threaded
+werkzeug server; virtual users talk to it over real HTTP with their own
+session cookies. ``--reseed`` TRUNCATEs and reloads the configured database
+with generate_dataset, so only point it at a scratch database.
+
+Scenarios mutate data in a repeatable way: the enrollment rush enrolls and
+then drops again, and grade entry writes scores derived from the enrollment
+id.
+
+Every scenario reports throughput, p50/p95/p99 latency, SQL statements per
+request (from the X-DB-Queries header) and the process peak RSS. Results are
+saved as JSON under app_core/benchmarks/results/.
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+
+# ========== Recording ========== #
+
+class Recorder:
+    """Thread-safe collection of per-request samples for one scenario."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.queries: List[int] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def add(self, latency_ms: float, status: int, queries: Optional[int]):
+        with self._lock:
+            self.latencies.append(latency_ms)
+            self.statuses[status] += 1
+            if queries is not None:
+                self.queries.append(queries)
+            if status == 0 or status >= 500:
+                self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+                "mean": round(sum(latencies) / count, 2) if count else None,
+                "max": round(latencies[-1], 2) if count else None,
+            },
+            "db_queries_per_request": round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+            "status_counts": {str(k): v for k, v in sorted(self.statuses.items())},
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return round(sorted_values[min(rank, len(sorted_values)) - 1], 2)
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+# ========== HTTP client ========== #
+
+class Client:
+    """One virtual user with its own cookie jar."""
+
+    def __init__(self, base_url: str, recorder: Recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method: str, path: str, payload: Any = None) -> Tuple[int, bytes]:
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if method != "GET":
+            # Each call is a new action; without a key, repeats within the dedup window get 429
+            req.add_header("Idempotency-Key", uuid.uuid4().hex)
+
+        started = time.perf_counter()
+        status, body, queries = 0, b"", None
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                status, body = resp.status, resp.read()
+                queries = resp.headers.get("X-DB-Queries")
+        except urllib.error.HTTPError as exc:
+            status, body = exc.code, exc.read()
+            queries = exc.headers.get("X-DB-Queries")
+        except OSError:
+            status = 0
+        self.recorder.add((time.perf_counter() - started) * 1000, status,
+                          int(queries) if queries is not None else None)
+        return status, body
+
+    def json(self, method: str, path: str, payload: Any = None) -> Any:
+        status, body = self.request(method, path, payload)
+        if status != 200:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def login(self, username: str, password: str) -> bool:
+        status, _ = self.request("POST", "/api/auth/login", {"username": username, "password": password})
+        return status == 200
+
+
+# ========== Scenarios ========== #
+
+def scenario_login_storm(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Students log in and out back to back."""
+    students = ctx["students"]
+    i = worker
+    while time.time() < deadline:
+        username = students[i % len(students)]
+        client.login(username, f"s{username}")
+        client.request("POST", "/api/auth/logout")
+        i += ctx["concurrency"]
+
+
+def scenario_poll_available(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Logged-in students keep polling their course catalog."""
+    username = ctx["students"][worker % len(ctx["students"])]
+    client.login(username, f"s{username}")
+    while time.time() < deadline:
+        client.request("GET", "/api/student/courses/available")
+        client.request("GET", "/api/student/semesters")
+
+
+def scenario_enrollment_rush(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Students enroll in a current-semester course and drop it again."""
+    username = ctx["students"][worker % len(ctx["students"])]
+    client.login(username, f"s{username}")
+    info = client.json("GET", "/api/student/info") or {}
+    semester = info.get("current_semester") or 1
+    while time.time() < deadline:
+        courses = client.json("GET", f"/api/student/courses/available?semester={semester}") or []
+        open_courses = [c for c in courses if not c.get("already_enrolled")]
+        if not open_courses:
+            client.request("GET", "/api/student/enrollments")
+            continue
+        result = client.json("POST", "/api/student/enrollments", {"course_id": open_courses[0]["course_id"]})
+        if result and result.get("id"):
+            client.request("DELETE", f"/api/student/enrollments/{result['id']}")
+
+
+def scenario_grade_entry(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Teachers open a class roster and enter every student's scores."""
+    username = ctx["teachers"][worker % len(ctx["teachers"])]
+    client.login(username, f"t{username}")
+    courses = [c for c in (client.json("GET", "/api/teacher/courses") or []) if c.get("enrolled_count")]
+    if not courses:
+        return
+    i = 0
+    while time.time() < deadline:
+        course = courses[i % len(courses)]
+        i += 1
+        roster = client.json("GET", f"/api/teacher/courses/{course['id']}/students") or []
+        for row in roster:
+            if time.time() >= deadline:
+                break
+            client.request("PUT", f"/api/teacher/enrollments/{row['id']}/grades", {
+                "ordinary_score": 60 + row["id"] % 40,
+                "final_score": 55 + (row["id"] * 7) % 45,
+            })
+
+
+def scenario_admin_dashboard(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Admins browse statistics, lists and type-ahead search."""
+    client.login("admin", ctx["admin_password"])
+    rng = random.Random(worker)
+    while time.time() < deadline:
+        client.request("GET", "/api/statistics/overview")
+        client.request("GET", "/api/courses")
+        client.request("GET", f"/api/students/search?q={rng.choice(ctx['students'])[-4:]}&limit=10")
+        client.request("GET", f"/api/enrollments?course_id={rng.choice(ctx['course_ids'])}")
+
+
+def scenario_exports(client: Client, ctx: Dict[str, Any], worker: int, deadline: float):
+    """Admins export course grade workbooks."""
+    client.login("admin", ctx["admin_password"])
+    rng = random.Random(worker)
+    while time.time() < deadline:
+        client.request("GET", f"/api/courses/{rng.choice(ctx['course_ids'])}/grades/export")
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login_storm": scenario_login_storm,
+    "poll_available": scenario_poll_available,
+    "enrollment_rush": scenario_enrollment_rush,
+    "grade_entry": scenario_grade_entry,
+    "admin_dashboard": scenario_admin_dashboard,
+    "exports": scenario_exports,
+}
+
+
+# ========== Runner ========== #
+
+def start_server():
+    """Build the app with per-request query counting and serve it on a free port."""
+    os.environ["QUERY_COUNT_HEADER"] = "true"
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from app_core.config import Config
+
+    class BenchConfig(Config):
+        QUERY_COUNT_HEADER = True
+
+    # Per-request console logging would dominate the measurements
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, create_app(BenchConfig), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def load_context(concurrency: int) -> Dict[str, Any]:
+    from app_core.db import db
+
+    pool_size = max(concurrency * 4, 50)
+    students = [r["username"] for r in db.fetch_all(
+        "SELECT username FROM users WHERE role = 'student' ORDER BY id LIMIT %s", [pool_size])]
+    teachers = [r["username"] for r in db.fetch_all(
+        """
+        SELECT u.username FROM users u
+        JOIN courses c ON c.teacher_id = u.ref_id
+        WHERE u.role = 'teacher'
+        GROUP BY u.username ORDER BY u.username LIMIT %s
+        """, [pool_size])]
+    course_ids = [r["id"] for r in db.fetch_all(
+        "SELECT id FROM courses ORDER BY id LIMIT %s", [pool_size])]
+    if not students or not teachers or not course_ids:
+        raise RuntimeError("Database has no seeded accounts; run with --reseed small")
+    return {
+        "students": students,
+        "teachers": teachers,
+        "course_ids": course_ids,
+        "admin_password": os.getenv("BENCH_ADMIN_PASSWORD", "admin@123"),
+        "concurrency": concurrency,
+    }
+
+
+def run_scenario(name: str, base_url: str, ctx: Dict[str, Any], concurrency: int, duration: float):
+    recorder = Recorder()
+    deadline = time.time() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=SCENARIOS[name], args=(Client(base_url, recorder), ctx, i, deadline))
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any]):
+    print(f"\nCompared with {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for name, now in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rps_delta = _delta(now["throughput_rps"], before["throughput_rps"])
+        p95_delta = _delta(now["latency_ms"]["p95"], before["latency_ms"]["p95"])
+        print(f"   {name:18} rps {now['throughput_rps']:>9} ({rps_delta})  "
+              f"p95 {now['latency_ms']['p95']} ms ({p95_delta})  "
+              f"queries/req {before['db_queries_per_request']} -> {now['db_queries_per_request']}")
+
+
+def _delta(now, before) -> str:
+    if not now or not before:
+        return "n/a"
+    return f"{(now - before) / before * 100:+.1f}%"
+
+
+def main(argv: Optional[List[str]] = None):
+    import app_core.config  # noqa: F401  (loads .env, so OG_POOL_MAX below matches the app's pool)
+
+    # Every in-flight request holds a pooled connection; more users than connections exhausts the pool
+    pool_max = int(os.getenv("OG_POOL_MAX") or 10)
+    parser = argparse.ArgumentParser(description="End-to-end HTTP benchmark")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenario names")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=pool_max,
+                        help="virtual users per scenario (default and maximum: OG_POOL_MAX)")
+    parser.add_argument("--reseed", choices=["small", "medium", "large"],
+                        help="TRUNCATE and reload the database with generate_dataset first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, help="result file (default: results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="previous result file to diff against")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.concurrency > pool_max:
+        parser.error(f"--concurrency {args.concurrency} exceeds OG_POOL_MAX={pool_max}; raise OG_POOL_MAX first")
+
+    if args.reseed:
+        from app_core.scripts.generate_dataset import SCALES, DatasetGenerator, Spec, load_into_database
+        load_into_database(DatasetGenerator(Spec(**SCALES[args.reseed], seed=args.seed)), truncate=True)
+
+    server, base_url = start_server()
+    ctx = load_context(args.concurrency)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "dataset": {"scale": args.reseed, "seed": args.seed} if args.reseed else None,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            print(f"▶ {name} ({args.concurrency} users, {args.duration:.0f}s)")
+            summary = run_scenario(name, base_url, ctx, args.concurrency, args.duration)
+            results["scenarios"][name] = summary
+            lat = summary["latency_ms"]
+            print(f"   {summary['requests']} req, {summary['throughput_rps']} rps, "
+                  f"p50/p95/p99 {lat['p50']}/{lat['p95']}/{lat['p99']} ms, "
+                  f"{summary['db_queries_per_request']} queries/req, errors {summary['errors']}, "
+                  f"peak RSS {summary['peak_rss_mb']} MB")
+    finally:
+        server.shutdown()
+
+    out = args.out or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit'] or 'local'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nResults saved to {out}")
+
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Service-layer micro-benchmarks with SQL statement budgets.
+
+Usage:
+    cd backend
+    python -m app_core.benchmarks.service_bench                 # default sizes 10,100,500
+    python -m app_core.benchmarks.service_bench --sizes 10,1000 --out results.json
+
+Each hot path is called directly at several data sizes against the configured
+database. The runner records wall time and the number of SQL statements the
+call issued (via db.query_stats), then checks them against budgets.json:
+
+- ``base``: fixed statements allowed regardless of size (omitted for paths
+  whose count depends on rows already in the database)
+- ``per_item``: extra statements allowed per item of fixture data
+
+A path that used to be O(1) queries has ``per_item`` 0, so any change that
+makes it issue a query per row fails the run (exit code 1).
+
+Fixture rows are created under a unique BENCH prefix and removed afterwards.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import uuid
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BUDGETS_PATH = Path(__file__).resolve().parent / "budgets.json"
+DEFAULT_SIZES = [10, 100, 500]
+
+
+# ========== Fixtures ========== #
+
+class Fixture:
+    """A self-contained slice of data whose size scales with ``size``.
+
+    - one teacher, one major plan with ``size`` semester-1 courses plus a target course
+    - ``size`` students enrolled in the first course
+    - a probe student in semester 1 of the major with no enrollments
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.prefix = f"BENCH{uuid.uuid4().hex[:6].upper()}"
+
+    def setup(self):
+        from psycopg2.extras import execute_values
+
+        from app_core.db import db
+
+        p = self.prefix
+        self.major = f"{p}-major"
+        with db.get_cursor() as cur:
+            cur.execute(
+                "INSERT INTO teachers (teacher_no, name, department) VALUES (%s, %s, %s) RETURNING id",
+                [f"{p}-T", "基准教师", "基准学院"],
+            )
+            self.teacher_id = cur.fetchone()["id"]
+            cur.execute("INSERT INTO major_plans (major_name) VALUES (%s) RETURNING id", [self.major])
+            self.plan_id = cur.fetchone()["id"]
+
+            rows = execute_values(
+                cur,
+                "INSERT INTO courses (course_code, name, credit, capacity, teacher_id) VALUES %s RETURNING id",
+                [(f"{p}-C{i}", f"基准课程{i}", 2, 10_000, self.teacher_id) for i in range(self.size + 1)],
+                fetch=True,
+            )
+            course_ids = [r["id"] for r in rows]
+            self.course_id, self.target_course_id = course_ids[0], course_ids[-1]
+            execute_values(
+                cur,
+                "INSERT INTO major_plan_courses (plan_id, course_id, semester) VALUES %s",
+                [(self.plan_id, cid, 1) for cid in course_ids],
+            )
+
+            rows = execute_values(
+                cur,
+                "INSERT INTO students (student_no, name, major, current_semester) VALUES %s RETURNING id",
+                [(f"{p}-S{i}", f"基准学生{i}", self.major, 1) for i in range(self.size + 1)],
+                fetch=True,
+            )
+            student_ids = [r["id"] for r in rows]
+            self.probe_student_id = student_ids[-1]
+            rows = execute_values(
+                cur,
+                "INSERT INTO enrollments (student_id, course_id, ordinary_score, final_score) VALUES %s RETURNING id",
+                [(sid, self.course_id, 80, 70) for sid in student_ids[:-1]],
+                fetch=True,
+            )
+            self.enrollment_id = rows[0]["id"]
+
+    def teardown(self):
+        from app_core.db import db
+
+        like = f"{self.prefix}%"
+        with db.get_cursor() as cur:
+            cur.execute("DELETE FROM users WHERE username LIKE %s", [like])
+            cur.execute("DELETE FROM students WHERE student_no LIKE %s", [like])
+            cur.execute("DELETE FROM courses WHERE course_code LIKE %s", [like])
+            cur.execute("DELETE FROM major_plans WHERE major_name LIKE %s", [like])
+            cur.execute("DELETE FROM teachers WHERE teacher_no LIKE %s", [like])
+
+    def import_workbook(self) -> BytesIO:
+        """An admin import workbook with ``size`` new students enrolled in one new course."""
+        import pandas as pd
+
+        p = self.prefix
+        buffer = BytesIO()
+        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+            pd.DataFrame([{"course_code": f"{p}-IC", "name": "基准导入课程", "credit": 2, "capacity": 10_000,
+                           "teacher_no": f"{p}-IT", "teacher_name": "基准导入教师"}]
+                         ).to_excel(writer, sheet_name="courses", index=False)
+            pd.DataFrame([{"student_no": f"{p}-IS{i}", "name": f"导入学生{i}", "major": self.major}
+                          for i in range(self.size)]).to_excel(writer, sheet_name="students", index=False)
+            pd.DataFrame([{"course_code": f"{p}-IC", "student_no": f"{p}-IS{i}", "status": "enrolled"}
+                          for i in range(self.size)]).to_excel(writer, sheet_name="enrollments", index=False)
+        buffer.seek(0)
+        return buffer
+
+
+# ========== Benchmarked paths ========== #
+
+def _drop_probe_enrollment(fx: Fixture):
+    from app_core.db import db
+    db.execute("DELETE FROM enrollments WHERE student_id = %s", [fx.probe_student_id])
+
+
+def _paths() -> Dict[str, Dict[str, Any]]:
+    """name -> call(fx), optional reset(fx) run after each measured call, repeat count."""
+    from app_core.services import AdminService, StudentService, TeacherService
+
+    return {
+        "StudentService.get_available_courses": {
+            "call": lambda fx: StudentService.get_available_courses(fx.probe_student_id, 1),
+        },
+        "StudentService.enroll_course": {
+            "call": lambda fx: StudentService.enroll_course(fx.probe_student_id, fx.target_course_id),
+            "reset": _drop_probe_enrollment,
+        },
+        "TeacherService.get_course_students": {
+            "call": lambda fx: TeacherService.get_course_students(fx.teacher_id, fx.course_id),
+        },
+        "AdminService.get_statistics": {
+            "call": lambda fx: AdminService.get_statistics(),
+        },
+        "AdminService.import_courses_excel": {
+            "call": lambda fx: AdminService.import_courses_excel(fx.import_workbook()),
+            "repeat": 1,
+        },
+        "AdminService.update_student_grades": {
+            "call": lambda fx: AdminService.update_student_grades(
+                fx.enrollment_id, {"ordinary_score": 85, "final_score": 75}),
+        },
+    }
+
+
+def measure(call: Callable, fx: Fixture, repeat: int, reset: Optional[Callable] = None) -> Dict[str, Any]:
+    """Median wall time and the statement count of the last run."""
+    from app_core.db import query_stats
+
+    timings = []
+    statements = 0
+    for _ in range(repeat):
+        before = query_stats.thread_statements()
+        started = time.perf_counter()
+        call(fx)
+        timings.append((time.perf_counter() - started) * 1000)
+        statements = query_stats.thread_statements() - before
+        if reset:
+            reset(fx)
+    return {"ms": round(statistics.median(timings), 3), "statements": statements}
+
+
+# ========== Budgets ========== #
+
+def check_budget(name: str, samples: Dict[int, Dict[str, Any]], budget: Optional[Dict[str, Any]]) -> List[str]:
+    """Return human readable violations for one path (empty when within budget)."""
+    if not budget:
+        return [f"{name}: no budget defined in {BUDGETS_PATH.name}"]
+
+    sizes = sorted(samples)
+    smallest = sizes[0]
+    per_item = budget.get("per_item", 0)
+    violations = []
+
+    for size in sizes:
+        count = samples[size]["statements"]
+        if "base" in budget and count > budget["base"] + per_item * size:
+            violations.append(
+                f"{name}: {count} statements at size {size}, budget {budget['base'] + per_item * size}"
+            )
+        growth = count - samples[smallest]["statements"]
+        if size != smallest and growth > per_item * (size - smallest):
+            violations.append(
+                f"{name}: grew by {growth} statements from size {smallest} to {size}, "
+                f"budget {per_item} per extra item"
+            )
+    return violations
+
+
+def load_budgets(path: Path = BUDGETS_PATH) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def run(sizes: List[int], only: Optional[List[str]] = None) -> Dict[str, Dict[int, Dict[str, Any]]]:
+    paths = _paths()
+    names = only or list(paths)
+    results: Dict[str, Dict[int, Dict[str, Any]]] = {name: {} for name in names}
+
+    for size in sizes:
+        fx = Fixture(size)
+        fx.setup()
+        try:
+            for name in names:
+                spec = paths[name]
+                results[name][size] = measure(spec["call"], fx, spec.get("repeat", 3), spec.get("reset"))
+                print(f"   {name:40} size={size:<6} {results[name][size]['statements']:>5} stmts "
+                      f"{results[name][size]['ms']:>10.2f} ms")
+        finally:
+            fx.teardown()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Service-layer micro-benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--only", help="comma separated path names")
+    parser.add_argument("--out", type=Path, help="write raw results as JSON")
+    args = parser.parse_args(argv)
+
+    sizes = sorted({int(s) for s in args.sizes.split(",") if s.strip()})
+    if len(sizes) < 2:
+        parser.error("need at least two sizes to detect growth")
+    only = [n.strip() for n in args.only.split(",")] if args.only else None
+
+    results = run(sizes, only)
+    budgets = load_budgets()
+    violations = [v for name, samples in results.items() for v in check_budget(name, samples, budgets.get(name))]
+
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if violations:
+        print("\n❌ Budget violations:")
+        for v in violations:
+            print(f"   {v}")
+        return 1
+    print("\n✅ All paths within their statement budgets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Conditional GET (ETag / Last-Modified) for read-mostly list endpoints.
+
+Every table that feeds a cached endpoint has a statement-level trigger on
+INSERT / UPDATE / DELETE / TRUNCATE that appends a row to
+``resource_changes``, so any writer (services, import scripts, psql) moves
+the table's version forward. Writers only ever insert, so concurrent writes
+never wait on each other's row locks. A table's version is the number of
+committed changes, ``SUM(changes)``, which grows with every commit whatever
+order transactions commit in; old rows are periodically folded into one row
+carrying their sum, which leaves the version unchanged. A request's ETag is
+derived from the versions of the tables it reads plus the caller, the
+caller's own write count and the query string; when it matches
+``If-None-Match`` the view is never called and the response is an empty 304.
+
+Version lookups are one indexed query, cached in-process for
+Config.RESOURCE_VERSION_TTL seconds (0 = always query); the cache is dropped
+after every write handled by this process, so the TTL only bounds how long
+another worker's write can go unnoticed.
+"""
+import hashlib
+import logging
+from datetime import timezone
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from flask import Response, make_response, request, session
+
+from app_core.config import Config
+from app_core.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Tables whose writes invalidate cached list responses
+VERSIONED_TABLES = (
+    'courses',
+    'teachers',
+    'students',
+    'enrollments',
+    'major_plans',
+    'major_plan_courses',
+    'cohort_ranks',
+)
+
+_versions = TTLCache('resource_versions', ttl=Config.RESOURCE_VERSION_TTL, max_entries=256)
+
+# Change rows per table before lookups fold them into one
+COMPACT_AFTER = 1000
+
+# Versions are unavailable (schema not installed): serve full responses
+_enabled = True
+
+
+def init_conditional(app) -> bool:
+    """Install the version triggers and drop cached versions after local writes."""
+
+    @app.after_request
+    def _forget_versions_after_write(response):
+        # A client re-reading right after its own write must not get a stale 304
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            invalidate_versions()
+            # Part of the ETag, so lists that do not version every table they show
+            # (e.g. enrollment counts) still change after the caller's own writes
+            if 'user_id' in session:
+                session['writes'] = session.get('writes', 0) + 1
+        return response
+
+    return init_version_schema()
+
+
+def init_version_schema() -> bool:
+    """Create the version table and the bump triggers (idempotent)."""
+    global _enabled
+    from app_core.db import db
+    try:
+        with db.get_cursor(autocommit=True) as cur:
+            cur.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS resource_changes (
+                    id BIGSERIAL PRIMARY KEY,
+                    resource VARCHAR(64) NOT NULL,
+                    changes BIGINT NOT NULL DEFAULT 1,
+                    changed_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC')
+                )
+                '''
+            )
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_resource_changes_resource ON resource_changes(resource)')
+            cur.execute(
+                '''
+                CREATE OR REPLACE FUNCTION bump_resource_version() RETURNS trigger AS $$
+                BEGIN
+                    INSERT INTO resource_changes (resource) VALUES (TG_TABLE_NAME);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+                '''
+            )
+            for table in VERSIONED_TABLES:
+                cur.execute(
+                    'INSERT INTO resource_changes (resource, changes) '
+                    'SELECT %s, 0 WHERE NOT EXISTS (SELECT 1 FROM resource_changes WHERE resource = %s)',
+                    [table, table]
+                )
+                cur.execute(f'DROP TRIGGER IF EXISTS trg_{table}_version ON {table}')
+                cur.execute(
+                    f'CREATE TRIGGER trg_{table}_version '
+                    f'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} '
+                    f'FOR EACH STATEMENT EXECUTE PROCEDURE bump_resource_version()'
+                )
+            # Single-row counters from earlier releases; every write serialized on them
+            cur.execute('DROP TABLE IF EXISTS resource_versions')
+        _enabled = True
+        logger.info("✅ Resource version triggers installed")
+    except Exception as exc:
+        _enabled = False
+        logger.warning(f"⚠️ Conditional GET disabled, version triggers unavailable: {exc}")
+    return _enabled
+
+
+def _load_versions(tables: Tuple[str, ...]) -> Dict[str, Tuple[int, object]]:
+    from app_core.db import db
+    rows = db.fetch_all(
+        '''
+        SELECT resource, SUM(changes) AS version, MAX(changed_at) AS updated_at, COUNT(*) AS change_rows
+        FROM resource_changes
+        WHERE resource = ANY(%s)
+        GROUP BY resource
+        ''',
+        [list(tables)]
+    )
+    for row in rows:
+        if row['change_rows'] > COMPACT_AFTER:
+            compact_changes(row['resource'])
+    return {row['resource']: (int(row['version']), row['updated_at']) for row in rows}
+
+
+def compact_changes(resource: str):
+    """Fold a table's change rows into one with their sum, keeping its version and timestamp."""
+    from app_core.db import db
+    try:
+        db.execute(
+            '''
+            WITH folded AS (
+                DELETE FROM resource_changes WHERE resource = %s RETURNING changes, changed_at
+            )
+            INSERT INTO resource_changes (resource, changes, changed_at)
+            SELECT %s, SUM(changes), MAX(changed_at) FROM folded HAVING COUNT(*) > 0
+            ''',
+            [resource, resource]
+        )
+    except Exception as exc:
+        logger.warning(f"⚠️ Compacting {resource} changes failed: {exc}")
+
+
+def current_versions(tables: Iterable[str]) -> Dict[str, Tuple[int, object]]:
+    """``{table: (version, updated_at)}`` for the given tables."""
+    key = tuple(sorted(tables))
+    return _versions.get_or_load(key, lambda: _load_versions(key))
+
+
+def invalidate_versions():
+    """Forget cached versions so this process sees its own writes immediately."""
+    _versions.clear()
+
+
+def make_etag(versions: Dict[str, Tuple[int, object]], *parts) -> str:
+    token = '|'.join(f'{name}={versions[name][0]}' for name in sorted(versions))
+    token += '|' + '|'.join(str(part) for part in parts)
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:20]
+
+
+def conditional_get(*tables: str, extra: Optional[Callable[[], Any]] = None):
+    """
+    Answer GETs with 304 when the client's ETag still matches.
+
+    Place it below ``require_auth`` so unauthenticated requests never see an
+    ETag. The tag includes the user id, so per-student lists never match
+    another user's cached copy. ``extra`` returns one more tag part for views
+    that answer from a process-local copy of the tables (e.g. the analytics
+    snapshot generation), so a worker still serving an old copy never hands
+    it out under the tag of the new versions.
+
+    Example:
+        @student_bp.route('/semesters', methods=['GET'])
+        @require_auth(['student'])
+        @conditional_get('students', 'major_plans', 'major_plan_courses')
+        def get_semesters():
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not _enabled:
+                return f(*args, **kwargs)
+            try:
+                versions = current_versions(tables)
+            except Exception as exc:
+                logger.warning(f"⚠️ Version lookup failed, serving full response: {exc}")
+                return f(*args, **kwargs)
+            if len(versions) != len(tables):
+                return f(*args, **kwargs)
+
+            parts = [request.path, request.query_string.decode('latin-1'),
+                     session.get('user_id'), session.get('role'), session.get('writes', 0)]
+            if extra is not None:
+                try:
+                    parts.append(extra())
+                except Exception as exc:
+                    logger.warning(f"⚠️ ETag part lookup failed, serving full response: {exc}")
+                    return f(*args, **kwargs)
+            etag = make_etag(versions, *parts)
+            last_modified = max(updated_at for _, updated_at in versions.values())
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(since) and \
+                    last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            # Clients may keep the body but must revalidate before reusing it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -2,6 +2,8 @@
 Configuration module for Flask application.
 """
 import os
+import tempfile
+from datetime import timedelta
 from dotenv import load_dotenv
 
 
@@ -13,22 +15,31 @@ REPO_ROOT = os.path.dirname(BACKEND_ROOT)
 ENV_PATH = os.path.join(REPO_ROOT, '.env')
 load_dotenv(ENV_PATH)
 
+# Placeholder key; signed-cookie session backends refuse to start with it
+DEFAULT_SECRET_KEY = 'dev-secret-key-change-in-production'
+
 
 class Config:
     """Application configuration."""
     
     # Flask
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    SECRET_KEY = os.getenv('SECRET_KEY', DEFAULT_SECRET_KEY)
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     HOST = os.getenv('FLASK_HOST', '0.0.0.0')
     PORT = int(os.getenv('FLASK_PORT', '5000'))
     
-    # Session
+    # Session (filesystem | cookie | sqlite), see app_core/sessions.py
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'filesystem')
     SESSION_TYPE = 'filesystem'
     SESSION_FILE_DIR = os.path.join(APP_CORE_DIR, 'flask_session')
+    SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'db_ex3_sessions.sqlite3'))
     SESSION_COOKIE_SAMESITE = 'Lax'
     SESSION_COOKIE_HTTPONLY = True
     SESSION_PERMANENT = False
+    PERMANENT_SESSION_LIFETIME = timedelta(hours=int(os.getenv('SESSION_LIFETIME_HOURS', '24')))
+    # Background cleanup: stale session files / expired rows (seconds)
+    SESSION_FILE_MAX_AGE = int(os.getenv('SESSION_FILE_MAX_AGE', '86400'))
+    SESSION_JANITOR_INTERVAL = int(os.getenv('SESSION_JANITOR_INTERVAL', '300'))
     
     # CORS
     CORS_ORIGINS = [
@@ -38,7 +49,7 @@ class Config:
         'http://127.0.0.1:5174'
     ]
     CORS_SUPPORTS_CREDENTIALS = True
-    CORS_ALLOW_HEADERS = ['Content-Type']
+    CORS_ALLOW_HEADERS = ['Content-Type', 'Idempotency-Key']
     CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
     
     # Database (from db.py)
@@ -47,6 +58,60 @@ class Config:
     DB_NAME = os.getenv('OG_DBNAME', 'student_db')
     DB_USER = os.getenv('OG_USER', 'appuser')
     DB_PASSWORD = os.getenv('OG_PASSWORD', '')
+    
+    # Benchmarking: expose per-request SQL statement counts as X-DB-Queries
+    QUERY_COUNT_HEADER = os.getenv('QUERY_COUNT_HEADER', 'false').lower() == 'true'
+    
+    # Request dedup (memory | sqlite); sqlite shares keys across worker processes
+    DEDUP_BACKEND = os.getenv('DEDUP_BACKEND', 'memory')
+    DEDUP_SQLITE_PATH = os.getenv('DEDUP_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'db_ex3_dedup.sqlite3'))
+    DEDUP_MAX_ENTRIES = int(os.getenv('DEDUP_MAX_ENTRIES', '10000'))
+    # Idempotency-Key headers are remembered longer than body-based keys
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '600'))
+    
+    # Logging: async queue listener, json/plain file format, rotation (none | size | time)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'false').lower() == 'true'
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'plain')
+    LOG_ROTATION = os.getenv('LOG_ROTATION', 'none')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+    # Fraction of INFO request/response lines kept (1 = all)
+    LOG_REQUEST_SAMPLE_RATE = float(os.getenv('LOG_REQUEST_SAMPLE_RATE', '1'))
+    
+    # Metrics: per-worker snapshot directory for multi-process servers (unset = single process)
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+    
+    # Profiling: stack sampling interval in seconds for all requests (0 = off)
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0'))
+    
+    # Resolved-principal cache for auth checks and /api/auth/me (seconds)
+    PRINCIPAL_CACHE_TTL = int(os.getenv('PRINCIPAL_CACHE_TTL', '60'))
+    
+    # Password KDF (PBKDF2-SHA256) run in a process pool; KDF_WORKERS=0 hashes inline
+    PASSWORD_KDF_ITERATIONS = int(os.getenv('PASSWORD_KDF_ITERATIONS', '200000'))
+    KDF_WORKERS = int(os.getenv('KDF_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+    KDF_MAX_PENDING = int(os.getenv('KDF_MAX_PENDING', '64'))
+    
+    # Conditional GET: seconds to reuse table version counters before re-querying
+    RESOURCE_VERSION_TTL = float(os.getenv('RESOURCE_VERSION_TTL', '1'))
+    
+    # Response pipeline: JSON encoder (auto | orjson | std); gzip/brotli above COMPRESS_MIN_SIZE bytes (-1 = off)
+    JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto')
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+    
+    # Analytics snapshot: seconds between change checks (-1 = off, SQL aggregates),
+    # overlap for late-committed rows, and a periodic full reload as a safety net
+    ANALYTICS_REFRESH_SECONDS = float(os.getenv('ANALYTICS_REFRESH_SECONDS', '5'))
+    ANALYTICS_WATERMARK_LAG = float(os.getenv('ANALYTICS_WATERMARK_LAG', '5'))
+    ANALYTICS_FULL_RELOAD_SECONDS = float(os.getenv('ANALYTICS_FULL_RELOAD_SECONDS', '3600'))
+    
+    # Seconds of grade writes merged into one background re-rank (0 = re-rank inline)
+    RANKING_REFRESH_DELAY = float(os.getenv('RANKING_REFRESH_DELAY', '1'))
+    
+    # Search (auto | trgm | ngram)
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')
 
 
 # Ensure session directory exists inside app_core
@@ -0,0 +1,172 @@
+"""
+Password hashing and verification off the request threads.
+
+Stored formats:
+- ``pbkdf2_sha256$<iterations>$<salt>$<hash>`` (base64 salt/hash), current
+- 64 hex chars: legacy unsalted SHA-256 (utils.hash_password), upgraded on
+  the next successful login
+
+PBKDF2 runs in a process pool (Config.KDF_WORKERS; 0 = inline) so CPU-bound
+hashing neither holds the GIL of the request threads nor grows without
+limit: at most Config.KDF_MAX_PENDING verifications are queued, further
+logins fail fast with CredentialsBusy. The pool forks its processes in
+``start()``, which app.py calls before anything else so no other thread
+exists yet (forking a threaded process can copy locks held by other
+threads). Unknown usernames, missing passwords and legacy hashes are also
+run through PBKDF2 against a dummy hash (made in ``start()``), so every
+login pays the same KDF cost whether or not the user exists.
+"""
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from app_core.config import Config
+from app_core.metrics import registry
+
+ALGORITHM = 'pbkdf2_sha256'
+
+LOGIN_SECONDS = registry.histogram(
+    'login_duration_seconds', 'Credential verification time by result (success | failure | busy)')
+KDF_QUEUE_SECONDS = registry.histogram(
+    'kdf_queue_wait_seconds', 'Time a login waited for a KDF slot',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+PASSWORD_REHASHES = registry.counter(
+    'password_rehash_total', 'Legacy or outdated password hashes upgraded on login')
+
+
+class CredentialsBusy(Exception):
+    """Raised when the verification queue is full."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def make_hash(password: str, iterations: int, salt: Optional[bytes] = None) -> str:
+    """PBKDF2-SHA256 hash in the stored format (runs inside the pool)."""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}'
+
+
+def check_hash(stored: str, password: str) -> bool:
+    """Verify ``password`` against a stored PBKDF2 hash (runs inside the pool)."""
+    try:
+        algorithm, iterations, salt, expected = stored.split('$')
+    except ValueError:
+        return False
+    if algorithm != ALGORITHM:
+        return False
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), _unb64(salt), int(iterations))
+    return hmac.compare_digest(digest, _unb64(expected))
+
+
+def is_legacy(stored: str) -> bool:
+    return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+
+def needs_rehash(stored: str, iterations: int) -> bool:
+    if is_legacy(stored):
+        return True
+    parts = stored.split('$')
+    return len(parts) != 4 or parts[0] != ALGORITHM or int(parts[1]) < iterations
+
+
+class CredentialVerifier:
+    """Runs KDF work in a process pool behind a bounded queue."""
+
+    def __init__(self, workers: int, max_pending: int, iterations: int, queue_timeout: float = 2.0):
+        self.workers = workers
+        self.iterations = iterations
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._dummy_hash: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if not self.workers:
+            return None
+        # Created lazily per process: a pool inherited across fork is unusable
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('fork'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def start(self):
+        """Fork every pool process now; call while the process is still single-threaded."""
+        self.dummy_hash()
+        executor = self._executor()
+        if executor is not None:
+            # With the fork context the first submit launches all workers up front
+            executor.submit(os.getpid).result()
+
+    def _run(self, fn, *args):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise CredentialsBusy('Too many concurrent logins, please retry')
+        KDF_QUEUE_SECONDS.observe(time.perf_counter() - started)
+        try:
+            executor = self._executor()
+            if executor is None:
+                return fn(*args)
+            return executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(make_hash, password, self.iterations)
+
+    def verify(self, stored: Optional[str], password: str) -> bool:
+        """Check a password against either stored format; timed per result."""
+        started = time.perf_counter()
+        result = 'failure'
+        try:
+            if not stored or is_legacy(stored):
+                # Same KDF cost as a current hash, so the stored format does not show in the timing
+                self._run(check_hash, self.dummy_hash(), password)
+                legacy = hashlib.sha256(password.encode()).hexdigest()
+                ok = bool(stored) and hmac.compare_digest(legacy, stored)
+            else:
+                ok = self._run(check_hash, stored, password)
+            result = 'success' if ok else 'failure'
+            return ok
+        except CredentialsBusy:
+            result = 'busy'
+            raise
+        finally:
+            LOGIN_SECONDS.observe(time.perf_counter() - started, result=result)
+
+    def dummy_hash(self) -> str:
+        """A hash of a random password, verified for unknown users to keep the timing uniform."""
+        if self._dummy_hash is None:
+            with self._lock:
+                if self._dummy_hash is None:
+                    self._dummy_hash = make_hash(secrets.token_urlsafe(16), self.iterations)
+        return self._dummy_hash
+
+    def shutdown(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+
+verifier = CredentialVerifier(
+    workers=Config.KDF_WORKERS,
+    max_pending=Config.KDF_MAX_PENDING,
+    iterations=Config.PASSWORD_KDF_ITERATIONS,
+)
@@ -1,18 +1,64 @@
 import os
+import threading
+import time
 from contextlib import contextmanager
 from typing import Any, List, Optional, cast
 
 import psycopg2
 from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from sshtunnel import SSHTunnelForwarder
 from dotenv import load_dotenv
 
+from app_core.metrics import DB_POOL_ACQUIRE_SECONDS, DB_POOL_EXHAUSTED, DB_QUERY_SECONDS, track_pool
+
 # Load .env sitting at repository root
 ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
 load_dotenv(ENV_PATH)
 
 
+class QueryStats:
+    """Process-wide and per-thread counters for executed SQL statements."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.statements = 0
+        self.total_seconds = 0.0
+
+    def record(self, elapsed: float) -> None:
+        with self._lock:
+            self.statements += 1
+            self.total_seconds += elapsed
+        DB_QUERY_SECONDS.observe(elapsed)
+        self._local.statements = getattr(self._local, 'statements', 0) + 1
+
+    def thread_statements(self) -> int:
+        """Statements issued so far by the calling thread (diff it around a unit of work)."""
+        return getattr(self._local, 'statements', 0)
+
+
+query_stats = QueryStats()
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that records every statement in query_stats."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            query_stats.record(time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            query_stats.record(time.perf_counter() - started)
+
+
 class Database:
     """Connection pool helper for openGauss/PostgreSQL."""
 
@@ -63,22 +109,32 @@ class Database:
         if not self.user or not self.password:
             raise ValueError('Please set OG_USER and OG_PASSWORD in .env for openGauss access')
 
-        self.pool: pool.SimpleConnectionPool = pool.SimpleConnectionPool(
-            minconn=1,
-            maxconn=10,
+        # Set by warm() once pooled connections are open and answering
+        self.ready = False
+        # Requests run on several threads per worker, so the pool must be the locked variant
+        self.pool: pool.ThreadedConnectionPool = pool.ThreadedConnectionPool(
+            minconn=int(os.getenv('OG_POOL_MIN') or 1),
+            maxconn=int(os.getenv('OG_POOL_MAX') or 10),
             host=self.host,
             port=self.port,
             dbname=self.dbname,
             user=self.user,
             password=self.password,
         )
+        track_pool(self.pool)
 
     @contextmanager
     def get_cursor(self, autocommit: bool = False):
-        conn = self.pool.getconn()
+        started = time.perf_counter()
+        try:
+            conn = self.pool.getconn()
+        except pool.PoolError:
+            DB_POOL_EXHAUSTED.inc()
+            raise
+        DB_POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
         if autocommit:
             conn.autocommit = True
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
         try:
             yield cur
             if not autocommit:
@@ -89,8 +145,29 @@ class Database:
             raise
         finally:
             cur.close()
+            # Pooled connections are shared; the next user expects a transaction
+            # (named cursors in stream(), one-transaction batches in execute_values)
+            if autocommit:
+                conn.autocommit = False
             self.pool.putconn(conn)
 
+    def warm(self, connections: int = 1) -> None:
+        """Open ``connections`` pooled connections, check each with SELECT 1, and mark the pool ready."""
+        if connections > self.pool.maxconn:
+            raise RuntimeError(f'OG_POOL_MAX={self.pool.maxconn} is below the {connections} request threads')
+        conns = []
+        try:
+            for _ in range(max(1, connections)):
+                conn = self.pool.getconn()
+                conns.append(conn)
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+                conn.rollback()
+        finally:
+            for conn in conns:
+                self.pool.putconn(conn)
+        self.ready = True
+
     def init_schema(self) -> None:
         """Create base tables if they do not exist."""
         statements = [
@@ -179,6 +256,18 @@ class Database:
             """,
             """
             CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_students_major ON students(major);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_courses_teacher ON courses(teacher_id);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_major_plan_courses_plan_semester ON major_plan_courses(plan_id, semester);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_users_role_ref ON users(role, ref_id);
             """,
                         """
                         ALTER TABLE enrollments ALTER COLUMN student_id SET NOT NULL;
@@ -212,6 +301,9 @@ class Database:
                             END $$;
                             """,
                         """
+                        CREATE INDEX IF NOT EXISTS idx_students_semester_updated ON students(semester_updated_at, current_semester);
+                        """,
+                        """
                         DO $$
                         BEGIN
                             IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'courses_capacity_positive') THEN
@@ -330,6 +422,23 @@ class Database:
                                 ALTER TABLE enrollments ADD CONSTRAINT enrollments_final_grade_range CHECK (final_grade IS NULL OR (final_grade >= 0 AND final_grade <= 100));
                             END IF;
                         END $$;
+                        """,
+                        # Row versions for compare-and-swap updates of grades and course weights
+                        """
+                        DO $$
+                        BEGIN
+                            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='enrollments' AND column_name='version') THEN
+                                ALTER TABLE enrollments ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+                            END IF;
+                        END $$;
+                        """,
+                        """
+                        DO $$
+                        BEGIN
+                            IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='courses' AND column_name='version') THEN
+                                ALTER TABLE courses ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+                            END IF;
+                        END $$;
                         """
         ]
 
@@ -348,6 +457,28 @@ class Database:
             row = cur.fetchone()
             return dict(row) if row else None
 
+    def stream(self, sql: str, params: Optional[List[Any]] = None, batch_size: int = 2000):
+        """Yield rows through a server-side cursor, ``batch_size`` rows per round trip.
+
+        The pooled connection is held until the generator is exhausted or closed.
+        """
+        with self.get_cursor() as outer:
+            named = f'stream_{id(outer):x}'
+            with outer.connection.cursor(name=named, cursor_factory=InstrumentedCursor) as cur:
+                cur.itersize = batch_size
+                cur.execute(sql, params or [])
+                for row in cur:
+                    yield row
+
+    def execute_values(self, sql: str, rows: List[Any], template: Optional[str] = None,
+                       page_size: int = 1000):
+        """Expand the single ``VALUES %s`` in ``sql`` to ``rows`` and return the RETURNING rows.
+
+        All pages run in one transaction, so the batch is applied entirely or not at all.
+        """
+        with self.get_cursor() as cur:
+            return execute_values(cur, sql, rows, template=template, page_size=page_size, fetch=True)
+
     def execute(self, sql: str, params: Optional[List[Any]] = None) -> None:
         with self.get_cursor() as cur:
             cur.execute(sql, params or [])
@@ -0,0 +1,221 @@
+"""
+Request deduplication / idempotency key stores.
+
+Keys are SHA-256 digests, so the stores never hold raw request bodies. A
+key claimed with an Idempotency-Key also keeps the first successful
+response (status, mimetype, body) so retries can be answered with it; a
+failed attempt releases its key. Two backends are available
+(Config.DEDUP_BACKEND):
+
+- memory: per-process dict + min-heap of expiry times; expiry is amortised
+  O(log n) per request and the number of keys is capped
+- sqlite: a shared SQLite file so every worker process on the host sees the
+  same keys (Config.DEDUP_SQLITE_PATH)
+"""
+import hashlib
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app_core.config import Config
+
+# (status code, mimetype, body) of a response kept for replay
+StoredResponse = Tuple[int, str, bytes]
+
+
+def request_key(user_id, path: str, method: str, body: bytes = b'',
+                idempotency_key: Optional[str] = None) -> str:
+    """Digest identifying a request; an explicit Idempotency-Key replaces the body."""
+    h = hashlib.sha256(f"{user_id}\0{path}\0{method}\0".encode('utf-8'))
+    if idempotency_key:
+        h.update(b'key\0' + idempotency_key.encode('utf-8'))
+    else:
+        h.update(b'body\0' + (body or b''))
+    return h.hexdigest()
+
+
+class DedupStore:
+    """Interface: ``claim`` records a key and reports whether it was new."""
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """Return True if ``key`` was not seen within its ttl (and record it), else False."""
+        raise NotImplementedError
+
+    def save_response(self, key: str, response: StoredResponse):
+        """Keep the response of a claimed key until the key expires."""
+        raise NotImplementedError
+
+    def get_response(self, key: str) -> Optional[StoredResponse]:
+        """The saved response of a live key (None while the first request is still running)."""
+        raise NotImplementedError
+
+    def release(self, key: str):
+        """Forget a key so the request can be retried."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryDedupStore(DedupStore):
+    """Thread-safe in-process store with heap-ordered expiry and a size bound."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._expiry: Dict[str, float] = {}
+        self._responses: Dict[str, StoredResponse] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def _expire(self, now: float):
+        heap, expiry = self._heap, self._expiry
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            # Stale heap entries (key re-claimed or released) are skipped
+            if expiry.get(key) == expires_at:
+                del expiry[key]
+                self._responses.pop(key, None)
+
+    def _evict_oldest(self):
+        heap, expiry = self._heap, self._expiry
+        while heap and len(expiry) >= self.max_entries:
+            expires_at, key = heapq.heappop(heap)
+            if expiry.get(key) == expires_at:
+                del expiry[key]
+                self._responses.pop(key, None)
+
+    def claim(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if key in self._expiry:
+                return False
+            self._evict_oldest()
+            expires_at = now + ttl
+            self._expiry[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+            return True
+
+    def save_response(self, key: str, response: StoredResponse):
+        with self._lock:
+            if key in self._expiry:
+                self._responses[key] = response
+
+    def get_response(self, key: str) -> Optional[StoredResponse]:
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._responses.get(key)
+
+    def release(self, key: str):
+        with self._lock:
+            self._expiry.pop(key, None)
+            self._responses.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._expiry.clear()
+            self._responses.clear()
+            self._heap.clear()
+
+
+class SQLiteDedupStore(DedupStore):
+    """Store shared by all worker processes through a SQLite file."""
+
+    # Purge expired rows once every this many claims
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._claims = 0
+        with self._connect() as conn:
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(dedup_keys)')}
+            if columns and 'body' not in columns:
+                # Keys only live for minutes; files from older releases are simply rebuilt
+                conn.execute('DROP TABLE dedup_keys')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS dedup_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, '
+                'status INTEGER, mimetype TEXT, body BLOB)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_dedup_keys_expires ON dedup_keys(expires_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, ttl: float) -> bool:
+        # Wall clock: the value is compared across processes
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM dedup_keys WHERE key = ? AND expires_at <= ?', [key, now])
+            cur = conn.execute('INSERT OR IGNORE INTO dedup_keys (key, expires_at) VALUES (?, ?)', [key, now + ttl])
+            claimed = cur.rowcount == 1
+            self._claims += 1
+            if self._claims % self.PURGE_EVERY == 0:
+                self._purge(conn, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return claimed
+
+    def _purge(self, conn: sqlite3.Connection, now: float):
+        conn.execute('DELETE FROM dedup_keys WHERE expires_at <= ?', [now])
+        conn.execute(
+            '''
+            DELETE FROM dedup_keys WHERE key IN (
+                SELECT key FROM dedup_keys ORDER BY expires_at
+                LIMIT MAX((SELECT COUNT(*) FROM dedup_keys) - ?, 0)
+            )
+            ''',
+            [self.max_entries]
+        )
+
+    def save_response(self, key: str, response: StoredResponse):
+        status, mimetype, body = response
+        self._connect().execute('UPDATE dedup_keys SET status = ?, mimetype = ?, body = ? WHERE key = ?',
+                                [status, mimetype, body, key])
+
+    def get_response(self, key: str) -> Optional[StoredResponse]:
+        row = self._connect().execute(
+            'SELECT status, mimetype, body FROM dedup_keys WHERE key = ? AND expires_at > ? AND status IS NOT NULL',
+            [key, time.time()]
+        ).fetchone()
+        return (row[0], row[1], bytes(row[2])) if row else None
+
+    def release(self, key: str):
+        self._connect().execute('DELETE FROM dedup_keys WHERE key = ?', [key])
+
+    def clear(self):
+        self._connect().execute('DELETE FROM dedup_keys')
+
+
+_store: Optional[DedupStore] = None
+_store_lock = threading.Lock()
+
+
+def get_dedup_store() -> DedupStore:
+    """Return the process-wide store configured by Config.DEDUP_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.DEDUP_BACKEND == 'sqlite':
+                    os.makedirs(os.path.dirname(Config.DEDUP_SQLITE_PATH) or '.', exist_ok=True)
+                    _store = SQLiteDedupStore(Config.DEDUP_SQLITE_PATH, Config.DEDUP_MAX_ENTRIES)
+                else:
+                    _store = MemoryDedupStore(Config.DEDUP_MAX_ENTRIES)
+    return _store
@@ -0,0 +1,123 @@
+"""
+Final grade computation.
+
+The final grade is derived, never stored: ``ordinary_score * ordinary_weight
++ final_score * final_weight`` with the course's current weights (0.5 / 0.5
+when unset), rounded half-up to one decimal, and only when both components are
+recorded. Rows graded the old way with a single ``grade`` fall back to it.
+
+Every query that shows, aggregates or exports a final grade takes its SQL from
+here; ``compute_final_grade`` and ``final_grade_array`` mirror it for Python
+and NumPy callers, so a weight change is one UPDATE on ``courses`` and all
+read paths agree on the result.
+The legacy ``enrollments.final_grade`` column is no longer written or read.
+
+Grade points for GPA follow the common 4.0 scale below. Services that write
+enrollments, scores, weights or credits call ``grades_changed`` so derived
+per-student aggregates (transcripts, plan audits) can refresh just the
+affected students.
+"""
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHT = Decimal('0.5')
+_ONE_DECIMAL = Decimal('0.1')
+
+# (lowest final grade, grade point); below 60 is 0
+GRADE_POINTS = (
+    (90, Decimal('4.0')), (85, Decimal('3.7')), (82, Decimal('3.3')), (78, Decimal('3.0')),
+    (75, Decimal('2.7')), (72, Decimal('2.3')), (68, Decimal('2.0')), (64, Decimal('1.5')),
+    (60, Decimal('1.0')),
+)
+PASSING_GRADE = 60
+
+
+def weighted_grade_sql(e: str = 'e', c: str = 'c') -> str:
+    """Weighted grade of enrollment alias ``e`` under course alias ``c``; NULL until both scores exist."""
+    return (
+        f'(CASE WHEN {e}.ordinary_score IS NOT NULL AND {e}.final_score IS NOT NULL '
+        f'THEN ROUND(({e}.ordinary_score * COALESCE({c}.ordinary_weight, {DEFAULT_WEIGHT}) '
+        f'+ {e}.final_score * COALESCE({c}.final_weight, {DEFAULT_WEIGHT}))::numeric, 1) END)'
+    )
+
+
+def final_grade_sql(e: str = 'e', c: str = 'c') -> str:
+    """Effective grade for stats and exports: the weighted grade, else the legacy ``grade``."""
+    return f'COALESCE({weighted_grade_sql(e, c)}, {e}.grade)'
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def compute_final_grade(ordinary_score: Any, final_score: Any,
+                        ordinary_weight: Any = None, final_weight: Any = None,
+                        grade: Any = None) -> Optional[Decimal]:
+    """Python counterpart of ``final_grade_sql`` for one row."""
+    ordinary, final = _decimal(ordinary_score), _decimal(final_score)
+    if ordinary is None or final is None:
+        return _decimal(grade)
+    ow = _decimal(ordinary_weight)
+    fw = _decimal(final_weight)
+    total = ordinary * (DEFAULT_WEIGHT if ow is None else ow) + final * (DEFAULT_WEIGHT if fw is None else fw)
+    return total.quantize(_ONE_DECIMAL, rounding=ROUND_HALF_UP)
+
+
+def final_grade_array(ordinary, final, ordinary_weight, final_weight, grade):
+    """Vectorised ``compute_final_grade`` over float arrays with NaN for NULL."""
+    import numpy as np  # local import: only the analytics snapshot needs NumPy
+    # Scores are NUMERIC(4,1) and weights NUMERIC(3,2): undo float32 storage error
+    # before rounding so half-up lands on the same digit as the SQL ROUND
+    o = np.round(ordinary.astype(np.float64), 1)
+    f = np.round(final.astype(np.float64), 1)
+    ow = np.where(np.isnan(ordinary_weight), float(DEFAULT_WEIGHT), np.round(ordinary_weight.astype(np.float64), 2))
+    fw = np.where(np.isnan(final_weight), float(DEFAULT_WEIGHT), np.round(final_weight.astype(np.float64), 2))
+    weighted = np.floor((o * ow + f * fw) * 10 + 0.5 + 1e-6) / 10
+    return np.where(np.isnan(weighted), np.round(grade.astype(np.float64), 1), weighted)
+
+
+def grade_point_sql(grade: str) -> str:
+    """Grade point of the SQL expression ``grade`` on the GRADE_POINTS scale (NULL stays NULL)."""
+    steps = ' '.join(f'WHEN {grade} >= {low} THEN {point}' for low, point in GRADE_POINTS)
+    return f'(CASE WHEN {grade} IS NULL THEN NULL {steps} ELSE 0 END)'
+
+
+def grade_point(grade: Any) -> Optional[Decimal]:
+    """Python counterpart of ``grade_point_sql``."""
+    grade = _decimal(grade)
+    if grade is None:
+        return None
+    return next((point for low, point in GRADE_POINTS if grade >= low), Decimal('0'))
+
+
+# ----- change notification ----- #
+
+_listeners: List[Callable[..., None]] = []
+
+
+def on_grades_changed(listener: Callable[..., None]) -> Callable[..., None]:
+    """Register ``listener(student_ids=..., course_ids=...)``; usable as a decorator."""
+    _listeners.append(listener)
+    return listener
+
+
+def grades_changed(student_ids: Iterable[int] = (), course_ids: Iterable[int] = ()):
+    """Tell listeners that enrollments or final grades of these students (or of everyone in these courses) moved.
+
+    Called after the write has committed; a failing listener is logged and
+    does not fail the write.
+    """
+    student_ids = sorted({int(s) for s in student_ids if s is not None})
+    course_ids = sorted({int(c) for c in course_ids if c is not None})
+    if not student_ids and not course_ids:
+        return
+    for listener in list(_listeners):
+        try:
+            listener(student_ids=student_ids, course_ids=course_ids)
+        except Exception as exc:
+            logger.warning(f"⚠️ Grade change listener {getattr(listener, '__qualname__', listener)} failed: {exc}")
@@ -3,6 +3,7 @@ Logging configuration and utilities for the application.
 """
 from .config import (
     setup_logging,
+    shutdown_logging,
     log_request,
     log_response,
     log_database,
@@ -12,10 +13,13 @@ from .config import (
     Colors,
     ColoredFormatter,
     PlainFormatter,
+    JSONFormatter,
+    SamplingFilter,
 )
 
 __all__ = [
     'setup_logging',
+    'shutdown_logging',
     'log_request',
     'log_response',
     'log_database',
@@ -25,4 +29,6 @@ __all__ = [
     'Colors',
     'ColoredFormatter',
     'PlainFormatter',
+    'JSONFormatter',
+    'SamplingFilter',
 ]
@@ -1,8 +1,13 @@
 """
 Advanced logging configuration with color support for zsh shell.
 """
+import atexit
+import itertools
+import json
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 
 # ANSI 颜色代码
@@ -172,7 +177,77 @@ class PlainFormatter(logging.Formatter):
             return f"{timestamp} {level_name:8} {message}"
 
 
-def setup_logging(log_dir='logs', console_level=logging.DEBUG, file_level=logging.INFO):
+class JSONFormatter(logging.Formatter):
+    """Compact one-line JSON formatter for production log shipping"""
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of records per level (e.g. {logging.INFO: 0.1} keeps every 10th INFO).
+    
+    Levels not listed are always kept. Sampling is counter based, so the kept
+    fraction is exact rather than random.
+    """
+    
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {level: min(max(rate, 0.0), 1.0) for level, rate in rates.items()}
+        self._counters = {level: itertools.count() for level in self.rates}
+    
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        n = next(self._counters[record.levelno])
+        return int((n + 1) * rate) != int(n * rate)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# High-volume loggers that sampling applies to
+SAMPLED_LOGGERS = ('request', 'response')
+
+_listener = None
+
+
+def _file_handler(path, rotation, max_bytes, backup_count, when):
+    if rotation == 'size':
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    if rotation == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8')
+    return logging.FileHandler(path, encoding='utf-8')
+
+
+def setup_logging(log_dir='logs', console_level=logging.DEBUG, file_level=logging.INFO,
+                  async_mode=False, log_format='plain', rotation='none',
+                  max_bytes=10 * 1024 * 1024, backup_count=5, when='midnight',
+                  sample_rates=None, queue_size=10000):
     """
     Set up logging with colored console output and plain file output.
     
@@ -180,9 +255,18 @@ def setup_logging(log_dir='logs', console_level=logging.DEBUG, file_level=loggin
         log_dir: Directory for log files
         console_level: Logging level for console output
         file_level: Logging level for file output
+        async_mode: Route records through a QueueHandler; a background
+            QueueListener thread does formatting and disk I/O
+        log_format: 'plain' or 'json' for the file handlers
+        rotation: 'none', 'size' (max_bytes/backup_count) or 'time' (when/backup_count)
+        sample_rates: {level: fraction} applied to the request/response loggers
+        queue_size: Records buffered in async mode before new ones are dropped
     """
+    global _listener
+    
     # Ensure log directory exists
     os.makedirs(log_dir, exist_ok=True)
+    shutdown_logging()
     
     # Get root logger
     root_logger = logging.getLogger()
@@ -192,27 +276,59 @@ def setup_logging(log_dir='logs', console_level=logging.DEBUG, file_level=loggin
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
+    file_formatter = JSONFormatter() if log_format == 'json' else PlainFormatter()
+    
     # Console handler (colored)
     console_handler = logging.StreamHandler()
     console_handler.setLevel(console_level)
     console_handler.setFormatter(ColoredFormatter())
-    root_logger.addHandler(console_handler)
     
     # File handler (plain text)
-    file_handler = logging.FileHandler(os.path.join(log_dir, 'app.log'))
+    file_handler = _file_handler(os.path.join(log_dir, 'app.log'), rotation, max_bytes, backup_count, when)
     file_handler.setLevel(file_level)
-    file_handler.setFormatter(PlainFormatter())
-    root_logger.addHandler(file_handler)
+    file_handler.setFormatter(file_formatter)
     
     # Error file handler (for errors only)
-    error_handler = logging.FileHandler(os.path.join(log_dir, 'error.log'))
+    error_handler = _file_handler(os.path.join(log_dir, 'error.log'), rotation, max_bytes, backup_count, when)
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(PlainFormatter())
-    root_logger.addHandler(error_handler)
+    error_handler.setFormatter(file_formatter)
+    
+    handlers = [console_handler, file_handler, error_handler]
+    if async_mode:
+        log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.setLevel(min(console_level, file_level))
+        root_logger.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
+    
+    # Sampling filters sit on the loggers so dropped records never reach the queue
+    for name in SAMPLED_LOGGERS:
+        sampled = logging.getLogger(name)
+        for existing in [f for f in sampled.filters if isinstance(f, SamplingFilter)]:
+            sampled.removeFilter(existing)
+        if sample_rates:
+            sampled.addFilter(SamplingFilter(sample_rates))
     
     return root_logger
 
 
+def shutdown_logging():
+    """Stop the async listener, flushing queued records to the handlers"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
 # Helper functions for different log types
 def log_request(method, path, **kwargs):
     """Log incoming request"""
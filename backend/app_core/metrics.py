@@ -0,0 +1,333 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms carry optional labels. Under a multi-worker
+server set METRICS_MULTIPROC_DIR: each process periodically writes a JSON
+snapshot named after its pid, and a scrape of any worker merges all
+snapshots (counters and histograms are summed, gauges get a ``pid`` label).
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app_core.config import Config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ''
+    body = ','.join(
+        k + '="' + v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for k, v in pairs
+    )
+    return '{' + body + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, object]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {'values': [[list(map(list, k)), v] for k, v in self._values.items()]}
+
+
+class Gauge(_Metric):
+    """Point-in-time value; may be backed by a callback evaluated at scrape time."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[_label_key(labels)] = fn
+
+    def value(self, **labels) -> float:
+        key = _label_key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = fn()
+            except Exception:  # a broken callback must not break the scrape
+                continue
+        return {'values': [[list(map(list, k)), v] for k, v in values.items()]}
+
+
+class Histogram(_Metric):
+    """Bucketed observations with running sum and count per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts (+Inf last), then sum
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> float:
+        state = self._values.get(_label_key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'values': [[list(map(list, k)), list(v)] for k, v in self._values.items()],
+            }
+
+
+class Registry:
+    """Holds metrics, renders the text format and merges worker snapshots."""
+
+    # Minimum seconds between snapshot writes of one process
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, multiproc_dir: Optional[str] = None):
+        self.multiproc_dir = multiproc_dir
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    # ---- multiprocess snapshots ---- #
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {
+            name: dict(metric.snapshot(), kind=metric.kind, help=metric.documentation)
+            for name, metric in list(self._metrics.items())
+        }
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f'metrics_{pid}.json')
+
+    def flush(self):
+        """Write this process's snapshot (no-op without a multiprocess dir)."""
+        if not self.multiproc_dir:
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if self.multiproc_dir and time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def _collect(self) -> List[Tuple[int, Dict[str, Dict[str, object]]]]:
+        """Snapshots of every process, with the live one for the current pid."""
+        pid = os.getpid()
+        snapshots = [(pid, self.snapshot())]
+        if self.multiproc_dir:
+            for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics_*.json')):
+                other = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+                if other == pid:
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as fh:
+                        snapshots.append((other, json.load(fh)))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    # ---- exposition ---- #
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        snapshots = self._collect()
+        multiprocess = len(snapshots) > 1
+        merged: Dict[str, Dict[str, object]] = {}
+
+        for pid, snapshot in snapshots:
+            for name, data in snapshot.items():
+                target = merged.setdefault(name, {
+                    'kind': data['kind'], 'help': data['help'],
+                    'buckets': data.get('buckets'), 'values': {},
+                })
+                for raw_key, value in data['values']:
+                    key = tuple(tuple(pair) for pair in raw_key)
+                    if data['kind'] == 'gauge':
+                        if multiprocess:
+                            key = key + (('pid', str(pid)),)
+                        target['values'][key] = value
+                    elif data['kind'] == 'counter':
+                        target['values'][key] = target['values'].get(key, 0) + value
+                    else:
+                        current = target['values'].get(key)
+                        target['values'][key] = value if current is None else [a + b for a, b in zip(current, value)]
+
+        lines = []
+        for name in sorted(merged):
+            data = merged[name]
+            lines.append(f'# HELP {name} {data["help"]}')
+            lines.append(f'# TYPE {name} {data["kind"]}')
+            for key in sorted(data['values']):
+                value = data['values'][key]
+                if data['kind'] != 'histogram':
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(list(data['buckets']) + [float('inf')], value[:-1]):
+                    cumulative += count
+                    le = {'le': _format_value(bound)}
+                    lines.append(f'{name}_bucket{_format_labels(key, le)} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(key)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(key)} {_format_value(cumulative)}')
+        return '\n'.join(lines) + '\n'
+
+
+def clear_multiproc_dir(path: str):
+    """Remove stale snapshots; call once in the server master before forking workers."""
+    for snapshot in glob.glob(os.path.join(path, 'metrics_*.json*')):
+        try:
+            os.remove(snapshot)
+        except OSError:
+            pass
+
+
+registry = Registry(Config.METRICS_MULTIPROC_DIR or None)
+atexit.register(registry.flush)
+
+# ========== Application metrics ========== #
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by endpoint')
+HTTP_REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status')
+DB_QUERY_SECONDS = registry.histogram(
+    'db_query_duration_seconds', 'SQL statement execution time',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+DB_POOL_CONNECTIONS = registry.gauge(
+    'db_pool_connections', 'Pooled database connections by state (in_use | idle)')
+DB_POOL_ACQUIRE_SECONDS = registry.histogram(
+    'db_pool_acquire_seconds', 'Time spent waiting for a pooled connection',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0))
+DB_POOL_EXHAUSTED = registry.counter(
+    'db_pool_exhausted_total', 'Connection requests rejected because the pool was exhausted')
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit | miss)')
+JOB_SECONDS = registry.histogram(
+    'job_duration_seconds', 'Import/export job duration',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+DEDUP_REJECTIONS = registry.counter(
+    'dedup_rejections_total', 'Requests rejected as duplicates')
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache lookup; hit ratio = hit / (hit + miss)."""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def timed_job(job: str):
+    """Decorator recording the duration of an import/export job."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with JOB_SECONDS.time(job=job):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_pool(connection_pool):
+    """Expose in-use/idle counts of a psycopg2 pool, read at scrape time."""
+    DB_POOL_CONNECTIONS.set_function(lambda: len(connection_pool._used), state='in_use')
+    DB_POOL_CONNECTIONS.set_function(lambda: len(connection_pool._pool), state='idle')
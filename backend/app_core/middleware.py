@@ -2,56 +2,108 @@
 Middleware for request deduplication, logging, and audit trail.
 """
 from functools import wraps
-from datetime import datetime
 import logging
-import os
-from flask import request, session
+from flask import Response, g, make_response, request, session
 
-# 请求去重缓存（简易实现，生产环境应用 Redis）
-request_cache = {}
+from app_core.config import Config
+from app_core.dedup import get_dedup_store, request_key
+from app_core.metrics import DEDUP_REJECTIONS
 
 # 获取日志记录器
 audit_logger = logging.getLogger('audit')
 
+DEDUP_METHODS = ('POST', 'PUT', 'DELETE')
+
+
+def _claim_request(timeout):
+    """登记当前请求；重复请求返回应答（重放首次结果或 429），否则返回 None"""
+    g.dedup_checked = True
+    user_id = session.get('user_id', 'anonymous')
+    idempotency_key = request.headers.get('Idempotency-Key')
+    cache_key = request_key(user_id, request.path, request.method,
+                            request.get_data(), idempotency_key)
+    ttl = max(timeout, Config.IDEMPOTENCY_KEY_TTL) if idempotency_key else timeout
+    store = get_dedup_store()
+
+    if store.claim(cache_key, ttl):
+        g.dedup_key = cache_key
+        g.dedup_replayable = bool(idempotency_key)
+        return None
+
+    DEDUP_REJECTIONS.inc(endpoint=request.endpoint or 'unmatched')
+    stored = store.get_response(cache_key) if idempotency_key else None
+    if stored is not None:
+        audit_logger.info(f"🔁 重放幂等请求: {request.path} ({user_id})")
+        status, mimetype, body = stored
+        response = Response(body, status=status, mimetype=mimetype)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+    audit_logger.warning(f"⚠️ 重复请求被拦截: {request.path} ({user_id})")
+    return {
+        'success': False,
+        'message': '请勿重复提交，请稍候'
+    }, 429
+
+
+def _settle_request(response):
+    """成功的幂等请求保存应答以便重放；失败（4xx/5xx）释放键，允许立即重试"""
+    key = g.pop('dedup_key', None)
+    if key is None:
+        return response
+    store = get_dedup_store()
+    if response.status_code >= 400:
+        store.release(key)
+    elif g.pop('dedup_replayable', False) and not response.is_streamed:
+        store.save_response(key, (response.status_code, response.mimetype, response.get_data()))
+    return response
+
+
+def _release_request(exc=None):
+    # after_request 未执行（异常穿过了错误处理器）时同样释放键
+    key = g.pop('dedup_key', None)
+    if key is not None:
+        get_dedup_store().release(key)
+
+
 def deduplicate_request(timeout=5):
-    """防止重复提交相同请求（POST/PUT/DELETE）"""
+    """防止重复提交相同请求（POST/PUT/DELETE）
+
+    键为 用户 ID + 路径 + method + 请求体 的 SHA-256 摘要；若客户端携带
+    Idempotency-Key 头，则以该头替代请求体，并保留 IDEMPOTENCY_KEY_TTL 秒，
+    期间的重试直接返回首次成功的应答。首次请求失败（4xx/5xx/异常）时释放键。
+    """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            # 仅对 POST/PUT/DELETE 方法进行去重检查
-            if request.method not in ['POST', 'PUT', 'DELETE']:
+            # 仅对 POST/PUT/DELETE 方法进行去重检查；init_dedup 已检查过的请求不再重复登记
+            if request.method not in DEDUP_METHODS or g.get('dedup_checked'):
                 return f(*args, **kwargs)
-            
-            # 使用 session 用户 ID + 请求路径 + method 作为缓存键
-            user_id = session.get('user_id', 'anonymous')
-            cache_key = f"{user_id}:{request.path}:{request.method}:{request.get_data()}"
-            
-            # 检查缓存
-            if cache_key in request_cache:
-                cached_time = request_cache[cache_key]
-                elapsed = (datetime.now() - cached_time).total_seconds()
-                if elapsed < timeout:
-                    audit_logger.warning(f"⚠️ 重复请求被拦截: {request.path} ({user_id})")
-                    return {
-                        'success': False,
-                        'message': '请勿重复提交，请稍候'
-                    }, 429
-            
-            # 记录此次请求
-            request_cache[cache_key] = datetime.now()
-            
-            # 清理过期缓存（简易）
-            now = datetime.now()
-            keys_to_delete = [k for k, v in request_cache.items() 
-                            if (now - v).total_seconds() > timeout]
-            for k in keys_to_delete:
-                del request_cache[k]
-            
-            return f(*args, **kwargs)
+
+            duplicate = _claim_request(timeout)
+            if duplicate is not None:
+                return duplicate
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                _release_request()
+                raise
+            return _settle_request(response)
         return wrapper
     return decorator
 
 
+def init_dedup(app, timeout=5):
+    """对所有已登录用户的 POST/PUT/DELETE 请求去重（登录等匿名请求不参与）"""
+
+    @app.before_request
+    def _deduplicate():
+        if request.method in DEDUP_METHODS and 'user_id' in session:
+            return _claim_request(timeout)
+
+    app.after_request(_settle_request)
+    app.teardown_request(_release_request)
+
+
 def log_operation(action_type):
     """记录用户操作审计日志"""
     def decorator(f):
@@ -0,0 +1,175 @@
+"""
+On-demand request profiling and low-rate stack sampling (stdlib only).
+
+- Per-request: an admin adds ``?__profile=1`` (or the ``X-Profile: 1`` header)
+  and the request runs under cProfile; the call-tree report is stored and its
+  id returned in the ``X-Profile-Id`` response header.
+- Sampling: a daemon thread reads ``sys._current_frames()`` every interval and
+  counts the stacks of threads that are serving a request. Stacks are kept in
+  folded format (``frame;frame;frame count``) for flamegraph.pl / speedscope.
+"""
+import cProfile
+import io
+import itertools
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Stored per-request reports (oldest evicted first)
+MAX_REPORTS = 50
+# Rows of the pstats table kept in a report
+REPORT_ROWS = 60
+
+
+class ProfileStore:
+    """Bounded, thread-safe store of per-request cProfile reports."""
+
+    def __init__(self, max_reports: int = MAX_REPORTS):
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, profiler: cProfile.Profile, method: str, path: str, elapsed_ms: float,
+            sort: str = 'cumulative') -> int:
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.strip_dirs().sort_stats(sort).print_stats(REPORT_ROWS)
+        report = {
+            'method': method,
+            'path': path,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'report': stream.getvalue(),
+        }
+        with self._lock:
+            report_id = next(self._ids)
+            self._reports[report_id] = report
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return report_id
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {'id': rid, **{k: v for k, v in r.items() if k != 'report'}}
+                for rid, r in reversed(self._reports.items())
+            ]
+
+    def get(self, report_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            report = self._reports.get(report_id)
+            return dict(report, id=report_id) if report else None
+
+
+class StackSampler:
+    """Samples the stacks of request threads into aggregated folded stacks."""
+
+    def __init__(self):
+        self.interval = 0.0
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._active: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def enter(self, label: str):
+        """Mark the calling thread as serving a request."""
+        self._active[threading.get_ident()] = label
+
+    def exit(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def start(self, interval: float = 0.01):
+        self.stop()
+        self.interval = interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample_once()
+
+    def sample_once(self):
+        active = dict(self._active)
+        if not active:
+            return
+        frames = sys._current_frames()
+        folded = []
+        for ident, label in active.items():
+            frame = frames.get(ident)
+            if frame is not None:
+                folded.append(label + ';' + _fold(frame))
+        with self._lock:
+            self._stacks.update(folded)
+            self.samples += 1
+
+    def folded(self) -> str:
+        with self._lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in self._stacks.most_common())
+
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        parts.append(f'{module}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+profile_store = ProfileStore()
+sampler = StackSampler()
+
+
+def init_profiling(app):
+    """Install request hooks; starts the sampler when PROFILE_SAMPLE_INTERVAL > 0."""
+    from flask import g, request, session
+
+    @app.before_request
+    def _start_profiling():
+        sampler.enter(f'{request.method} {request.endpoint or request.path}')
+        wanted = request.args.get('__profile') == '1' or request.headers.get('X-Profile') == '1'
+        if wanted and session.get('role') == 'admin':
+            g.profiler = cProfile.Profile()
+            g.profile_started = time.perf_counter()
+            g.profiler.enable()
+
+    @app.after_request
+    def _stop_profiling(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+            report_id = profile_store.add(profiler, request.method, request.full_path, elapsed_ms)
+            response.headers['X-Profile-Id'] = str(report_id)
+        return response
+
+    @app.teardown_request
+    def _leave_sampler(exc=None):
+        sampler.exit()
+
+    interval = app.config.get('PROFILE_SAMPLE_INTERVAL', 0)
+    if interval and not sampler.running:
+        sampler.start(interval)
@@ -77,8 +77,10 @@ class StudentRepository(Repository):
             params.append(major)
         
         if keyword:
-            query += " AND (student_no ILIKE %s OR name ILIKE %s)"
-            params.extend([f"%{keyword}%", f"%{keyword}%"])
+            from app_core.services.search_service import SearchService
+            keyword_sql, keyword_params = SearchService.keyword_filter('students', keyword, self.TABLE)
+            query += f" AND {keyword_sql}"
+            params.extend(keyword_params)
         
         query += " ORDER BY id"
         return db.fetch_all(query, params)
@@ -0,0 +1,224 @@
+"""
+Response pipeline: fast JSON encoding, negotiated compression and NDJSON lists.
+
+- FastJSONProvider serialises with orjson when it is installed
+  (Config.JSON_ENCODER = auto | orjson | std). Output matches Flask's default
+  provider value for value: Decimal as string, date/datetime as HTTP dates.
+- init_compression() gzip- or brotli-encodes textual responses of at least
+  Config.COMPRESS_MIN_SIZE bytes when the client accepts it; streamed
+  responses are compressed chunk by chunk.
+- list_response() returns a JSON array, or one JSON object per line
+  (application/x-ndjson) when the client asks with ``?format=ndjson`` or an
+  ``Accept: application/x-ndjson`` header. The rows may be a generator (see
+  Database.stream), so very large lists are never held in memory.
+"""
+import decimal
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    NDJSON_MIMETYPE,
+    'text/',
+    'application/javascript',
+)
+
+
+# ========== JSON ========== #
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _http_date(value: date) -> str:
+    """werkzeug.http.http_date without the email.utils round trip (naive = UTC)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return http_date(value)
+        hour, minute, second = value.hour, value.minute, value.second
+    else:
+        hour = minute = second = 0
+    return (f'{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} '
+            f'{hour:02d}:{minute:02d}:{second:02d} GMT')
+
+
+def _default(o: Any):
+    """Same conversions as Flask's default provider."""
+    if isinstance(o, date):
+        return _http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, falling back to the stdlib encoder."""
+
+    def __init__(self, app, encoder: str = 'auto'):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and encoder in ('auto', 'orjson')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if self.use_orjson:
+            # Datetimes go through _default so the wire format stays the same
+            return orjson.dumps(obj, default=_default,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Explicit options (indent, sort_keys, ...) need the stdlib encoder
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    app.json = FastJSONProvider(app, app.config.get('JSON_ENCODER', 'auto'))
+
+
+def wants_ndjson() -> bool:
+    if request.args.get('format') == 'ndjson':
+        return True
+    # JSON wins ties, so */* keeps getting an array
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE], default='application/json')
+    return best == NDJSON_MIMETYPE
+
+
+def list_response(rows: Iterable[Any]) -> Response:
+    """JSON array of ``rows``, or an NDJSON stream when the client asks for it."""
+    if not wants_ndjson():
+        return jsonify(rows if isinstance(rows, list) else list(rows))
+
+    provider = current_app.json
+    encode = provider.dumps_bytes if isinstance(provider, FastJSONProvider) else \
+        (lambda obj: provider.dumps(obj).encode('utf-8'))
+
+    def generate():
+        for row in rows:
+            yield encode(row) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+# ========== Compression ========== #
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._obj = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+def _negotiate() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return ''
+
+
+def _encoder(encoding: str, level: int):
+    return _BrotliEncoder(level) if encoding == 'br' else _GzipEncoder(level)
+
+
+def _compressible(response: Response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if request.method == 'HEAD' or 'Content-Encoding' in response.headers:
+        return False
+    if response.direct_passthrough:  # send_file and friends
+        return False
+    mimetype = response.mimetype or ''
+    return any(mimetype.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+def compress_response(response: Response, min_size: int, level: int) -> Response:
+    """Encode ``response`` in place if it is worth it and the client accepts it."""
+    if not _compressible(response):
+        return response
+    encoding = _negotiate()
+    response.vary.add('Accept-Encoding')
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        chunks = response.response
+        encoder = _encoder(encoding, level)
+
+        def generate():
+            try:
+                for chunk in chunks:
+                    data = encoder.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    if data:
+                        yield data
+                yield encoder.finish()
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+
+        response.response = generate()
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoder = _encoder(encoding, level)
+        response.set_data(encoder.compress(body) + encoder.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag', '').startswith('"'):
+        # A strong validator names one exact byte sequence; the encoded body is another
+        response.headers['ETag'] = 'W/' + response.headers['ETag']
+    return response
+
+
+def init_compression(app):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    level = app.config.get('COMPRESS_LEVEL', 6)
+    if min_size < 0:
+        return
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, min_size, level)
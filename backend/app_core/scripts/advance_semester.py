@@ -13,6 +13,7 @@ import sys
 from datetime import datetime
 
 from app_core import db
+from app_core.services.ranking_service import RankingService
 
 MAX_SEMESTER = int(os.getenv("MAX_SEMESTER", "8"))
 MONTHS_INTERVAL = os.getenv("SEMESTER_INTERVAL_MONTHS", "6")
@@ -36,6 +37,9 @@ def advance_semesters():
         [MAX_SEMESTER, MAX_SEMESTER],
     )
     count = result.get("updated", 0) if result else 0
+    if count:
+        # Every cohort shifts by a semester, so re-rank them all
+        RankingService.refresh()
     print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] advanced semesters for {count} students")
     return count
 
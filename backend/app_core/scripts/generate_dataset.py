@@ -0,0 +1,406 @@
+"""Generate a reproducible large-scale dataset for load and benchmark runs.
+
+Usage:
+    cd backend
+    python -m app_core.scripts.generate_dataset --scale large --load --truncate
+    python -m app_core.scripts.generate_dataset --scale medium --csv out/
+    python -m app_core.scripts.generate_dataset --scale small --excel bench_import.xlsx
+
+Scales (every count can be overridden with its own flag):
+- small   5 majors,  80 courses,   40 teachers,   2k students,    40k enrollments
+- medium 20 majors, 500 courses,  250 teachers,  20k students,   500k enrollments
+- large  50 majors,  2k courses,   1k teachers, 100k students,     3M enrollments
+
+``--load`` bulk-loads straight into the configured database with COPY,
+``--csv`` writes one CSV per table, ``--excel`` writes a workbook in the
+AdminService.import_courses_excel format. The same ``--seed`` always yields
+the same rows, so performance runs are comparable across commits.
+
+Student/teacher accounts use the default passwords (s+学号 / t+工号).
+"""
+import argparse
+import csv
+import io
+import sys
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SCALES = {
+    "small": dict(majors=5, courses=80, teachers=40, students=2_000, enrollments=40_000),
+    "medium": dict(majors=20, courses=500, teachers=250, students=20_000, enrollments=500_000),
+    "large": dict(majors=50, courses=2_000, teachers=1_000, students=100_000, enrollments=3_000_000),
+}
+
+MAX_SEMESTER = 8
+CHUNK_ROWS = 100_000
+EXCEL_MAX_ROWS = 1_048_575
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+GIVEN_CHARS = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍鹏辉红晨宇浩然子轩梓涵欣怡思雨博文一诺佳琪俊杰雨桐皓轩诗涵梦瑶天佑"
+MAJORS = [
+    "计算机科学与技术", "软件工程", "人工智能", "数据科学与大数据技术", "网络工程", "信息安全",
+    "物联网工程", "电子信息工程", "通信工程", "自动化", "电气工程及其自动化", "机械工程",
+    "土木工程", "数学与应用数学", "统计学", "物理学", "化学", "生物科学", "金融学", "会计学",
+    "工商管理", "经济学", "法学", "汉语言文学", "英语", "新闻学", "临床医学", "药学",
+]
+DEPARTMENTS = ["计算机学院", "软件学院", "信息学院", "电气学院", "机械学院", "理学院", "经管学院", "文学院", "医学院"]
+SUBJECTS = [
+    "数据库原理", "操作系统", "计算机网络", "数据结构", "算法设计", "编译原理", "计算机组成原理",
+    "高等数学", "线性代数", "概率论与数理统计", "离散数学", "大学物理", "大学英语", "程序设计基础",
+    "机器学习", "深度学习", "软件工程导论", "信号与系统", "数字电路", "微观经济学", "会计学原理",
+]
+LEVELS = ["", "（一）", "（二）", "（三）", "实验", "专题", "进阶"]
+CREDITS = [1.0, 1.5, 2.0, 2.5, 3.0, 4.0]
+WEIGHTS = [(0.3, 0.7), (0.4, 0.6), (0.5, 0.5)]
+
+
+@dataclass(frozen=True)
+class Spec:
+    """Row counts and seed for one dataset."""
+    majors: int
+    courses: int
+    teachers: int
+    students: int
+    enrollments: int
+    seed: int = 42
+    plan_courses_per_semester: int = 6
+
+
+class DatasetGenerator:
+    """Deterministic row generator; every table is an iterator of tuples."""
+
+    COLUMNS = {
+        "teachers": ("id", "teacher_no", "name", "department"),
+        "courses": ("id", "course_code", "name", "credit", "capacity", "teacher_id",
+                    "ordinary_weight", "final_weight"),
+        "major_plans": ("id", "major_name", "description"),
+        "major_plan_courses": ("id", "plan_id", "course_id", "semester", "is_required"),
+        "students": ("id", "student_no", "name", "major", "current_semester", "semester_updated_at"),
+        "users": ("username", "password", "role", "ref_id"),
+        "enrollments": ("id", "student_id", "course_id", "status", "ordinary_score", "final_score",
+                        "enrolled_at"),
+    }
+
+    def __init__(self, spec: Spec, now: Optional[datetime] = None):
+        self.spec = spec
+        # Fixed reference time keeps timestamps reproducible for a given seed
+        self.now = now or datetime(2025, 9, 1, 8, 0, 0)
+        rng = np.random.default_rng(spec.seed)
+
+        self.major_names = _major_names(spec.majors)
+        self.course_teacher = rng.integers(1, spec.teachers + 1, size=spec.courses)
+        self.course_credit = rng.choice(CREDITS, size=spec.courses)
+        self.course_capacity = rng.integers(40, 201, size=spec.courses)
+        weight_idx = rng.integers(0, len(WEIGHTS), size=spec.courses)
+        self.course_weights = np.array(WEIGHTS)[weight_idx]
+
+        # plan[m][semester] -> course ids; courses are shared across majors like real curricula
+        per_sem = spec.plan_courses_per_semester
+        self.plan = [
+            [rng.choice(spec.courses, size=min(per_sem, spec.courses), replace=False) + 1
+             for _ in range(MAX_SEMESTER)]
+            for _ in range(spec.majors)
+        ]
+        self.student_major = rng.integers(0, spec.majors, size=spec.students)
+        self.student_semester = rng.integers(1, MAX_SEMESTER + 1, size=spec.students)
+        self._rng_seed = spec.seed
+
+    # ----- small dimension tables ----- #
+
+    def teachers(self) -> Iterator[Tuple]:
+        rng = np.random.default_rng(self._rng_seed + 1)
+        for i in range(1, self.spec.teachers + 1):
+            yield (i, f"T{i:05d}", _person_name(rng), DEPARTMENTS[int(rng.integers(len(DEPARTMENTS)))])
+
+    def courses(self) -> Iterator[Tuple]:
+        rng = np.random.default_rng(self._rng_seed + 2)
+        for i in range(1, self.spec.courses + 1):
+            name = SUBJECTS[int(rng.integers(len(SUBJECTS)))] + LEVELS[int(rng.integers(len(LEVELS)))]
+            ow, fw = self.course_weights[i - 1]
+            yield (i, f"C{i:05d}", name, float(self.course_credit[i - 1]), int(self.course_capacity[i - 1]),
+                   int(self.course_teacher[i - 1]), float(ow), float(fw))
+
+    def major_plans(self) -> Iterator[Tuple]:
+        for i, name in enumerate(self.major_names, start=1):
+            yield (i, name, f"{name}专业培养计划")
+
+    def major_plan_courses(self) -> Iterator[Tuple]:
+        row_id = 0
+        for m, semesters in enumerate(self.plan, start=1):
+            for sem, course_ids in enumerate(semesters, start=1):
+                for course_id in course_ids:
+                    row_id += 1
+                    yield (row_id, m, int(course_id), sem, True)
+
+    def students(self) -> Iterator[Tuple]:
+        rng = np.random.default_rng(self._rng_seed + 3)
+        for i in range(1, self.spec.students + 1):
+            updated = self.now - timedelta(days=int(rng.integers(0, 180)))
+            yield (i, _student_no(i), _person_name(rng), self.major_names[self.student_major[i - 1]],
+                   int(self.student_semester[i - 1]), updated)
+
+    def users(self) -> Iterator[Tuple]:
+        from app_core.utils import hash_password
+
+        for i in range(1, self.spec.teachers + 1):
+            no = f"T{i:05d}"
+            yield (no, hash_password(f"t{no}"), "teacher", i)
+        for i in range(1, self.spec.students + 1):
+            no = _student_no(i)
+            yield (no, hash_password(f"s{no}"), "student", i)
+
+    # ----- enrollments (the large fact table) ----- #
+
+    def enrollments(self) -> Iterator[Tuple]:
+        """Past plan courses are graded and completed; current-semester ones are in progress."""
+        spec = self.spec
+        rng = np.random.default_rng(self._rng_seed + 4)
+        per_student = np.clip(rng.poisson(spec.enrollments / max(spec.students, 1), size=spec.students),
+                              0, spec.courses)
+        # Trim or pad so the total matches the requested count exactly: only students
+        # with room (above 0 / below the course count) move, one row each per round
+        diff = spec.enrollments - int(per_student.sum())
+        while diff:
+            step = 1 if diff > 0 else -1
+            room = np.flatnonzero(per_student < spec.courses if step > 0 else per_student > 0)
+            if not len(room):
+                break  # more enrollments requested than students x courses
+            idx = rng.choice(room, size=min(abs(diff), len(room)), replace=False)
+            per_student[idx] += step
+            diff -= step * len(idx)
+
+        row_id = 0
+        for s in range(spec.students):
+            want = int(per_student[s])
+            if not want:
+                continue
+            current = int(self.student_semester[s])
+            semesters = self.plan[self.student_major[s]]
+
+            picked: Dict[int, int] = {}
+            for sem in range(1, current + 1):
+                for course_id in semesters[sem - 1]:
+                    picked.setdefault(int(course_id), sem)
+            chosen = list(picked.items())[:want]
+            if len(chosen) < want:
+                taken = set(picked)
+                pool = np.setdiff1d(rng.choice(spec.courses, size=min(spec.courses, want * 2), replace=False) + 1,
+                                    np.fromiter(taken, dtype=np.int64, count=len(taken)))
+                for course_id in pool[: want - len(chosen)]:
+                    chosen.append((int(course_id), int(rng.integers(1, current + 1))))
+
+            n = len(chosen)
+            ordinary = np.clip(rng.normal(82, 8, n), 0, 100).round(1)
+            final = np.clip(rng.normal(72, 14, n), 0, 100).round(1)
+            # A few graded rows only have one component recorded
+            missing_ordinary = rng.random(n) < 0.02
+            for k, (course_id, sem) in enumerate(chosen):
+                row_id += 1
+                enrolled_at = self.now - timedelta(days=182 * (current - sem) + int(rng.integers(0, 14)))
+                # Only the scores are stored; the final grade is derived on read
+                if sem < current:
+                    o = None if missing_ordinary[k] else float(ordinary[k])
+                    yield (row_id, s + 1, course_id, "completed", o, float(final[k]), enrolled_at)
+                else:
+                    yield (row_id, s + 1, course_id, "enrolled", None, None, enrolled_at)
+
+    def tables(self) -> List[Tuple[str, Iterator[Tuple]]]:
+        """Tables in foreign-key order."""
+        return [
+            ("teachers", self.teachers()),
+            ("courses", self.courses()),
+            ("major_plans", self.major_plans()),
+            ("major_plan_courses", self.major_plan_courses()),
+            ("students", self.students()),
+            ("users", self.users()),
+            ("enrollments", self.enrollments()),
+        ]
+
+
+def _major_names(count: int) -> List[str]:
+    names = []
+    for i in range(count):
+        base = MAJORS[i % len(MAJORS)]
+        names.append(base if i < len(MAJORS) else f"{base}{i // len(MAJORS) + 1}")
+    return names
+
+
+def _person_name(rng) -> str:
+    size = 1 if rng.random() < 0.3 else 2
+    return SURNAMES[int(rng.integers(len(SURNAMES)))] + "".join(
+        GIVEN_CHARS[int(j)] for j in rng.integers(0, len(GIVEN_CHARS), size=size)
+    )
+
+
+def _student_no(i: int) -> str:
+    return f"S{i:07d}"
+
+
+def _final_grade(ordinary, final, weights) -> Optional[float]:
+    from app_core.grading import compute_final_grade
+
+    grade = compute_final_grade(ordinary, final, float(weights[0]), float(weights[1]))
+    return None if grade is None else float(grade)
+
+
+def _chunks(rows: Iterator[Tuple], size: int = CHUNK_ROWS) -> Iterator[List[Tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+
+# ========== Sinks ========== #
+
+def load_into_database(gen: DatasetGenerator, truncate: bool = False):
+    """Bulk-load every table with COPY, then fix sequences and refresh statistics."""
+    from app_core.db import db
+
+    tables = [name for name, _ in gen.tables()]
+    if truncate:
+        with db.get_cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(t for t in reversed(tables) if t != 'users')} RESTART IDENTITY CASCADE")
+            # Keep the admin account; generated students and teachers get fresh logins below
+            cur.execute("DELETE FROM users WHERE role <> 'admin'")
+    else:
+        for table in tables:
+            if table == "users":
+                continue
+            if db.fetch_one(f"SELECT 1 AS found FROM {table} LIMIT 1"):
+                raise RuntimeError(f"Table {table} is not empty; rerun with --truncate")
+
+    for table, rows in gen.tables():
+        columns = DatasetGenerator.COLUMNS[table]
+        total = 0
+        for chunk in _chunks(rows):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow([_csv_value(v) for v in row])
+            buffer.seek(0)
+            with db.get_cursor() as cur:
+                cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV", buffer)
+            total += len(chunk)
+        print(f"   {table}: {total} rows")
+
+    with db.get_cursor(autocommit=True) as cur:
+        for table in tables:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            )
+            cur.execute(f"ANALYZE {table}")
+
+    from app_core.services.search_service import SearchService
+    SearchService.reindex("students")
+    SearchService.reindex("courses")
+
+
+def write_csv(gen: DatasetGenerator, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for table, rows in gen.tables():
+        path = out_dir / f"{table}.csv"
+        total = 0
+        with path.open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(DatasetGenerator.COLUMNS[table])
+            for row in rows:
+                writer.writerow([_csv_value(v) for v in row])
+                total += 1
+        print(f"   {path}: {total} rows")
+
+
+def write_excel(gen: DatasetGenerator, path: Path):
+    """Write the admin import workbook (courses / students / enrollments sheets)."""
+    import pandas as pd
+
+    if gen.spec.enrollments > EXCEL_MAX_ROWS or gen.spec.students > EXCEL_MAX_ROWS:
+        raise ValueError("Excel sheets hold at most 1,048,575 rows; use --csv or --load at this scale")
+
+    teachers = {t[0]: t for t in gen.teachers()}
+    course_codes = {}
+    course_rows = []
+    for c in gen.courses():
+        t = teachers[c[5]]
+        course_codes[c[0]] = c[1]
+        course_rows.append({"course_code": c[1], "name": c[2], "credit": c[3], "capacity": c[4],
+                            "teacher_no": t[1], "teacher_name": t[2], "teacher_department": t[3]})
+    student_nos = {}
+    student_rows = []
+    for s in gen.students():
+        student_nos[s[0]] = s[1]
+        student_rows.append({"student_no": s[1], "name": s[2], "major": s[3], "current_semester": s[4]})
+    # The import sheet takes a single grade, so write the derived final grade
+    enrollment_rows = [
+        {"course_code": course_codes[e[2]], "student_no": student_nos[e[1]], "status": e[3],
+         "grade": _final_grade(e[4], e[5], gen.course_weights[e[2] - 1])}
+        for e in gen.enrollments()
+    ]
+
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        pd.DataFrame(course_rows).to_excel(writer, sheet_name="courses", index=False)
+        pd.DataFrame(student_rows).to_excel(writer, sheet_name="students", index=False)
+        pd.DataFrame(enrollment_rows).to_excel(writer, sheet_name="enrollments", index=False)
+    print(f"   {path}: {len(course_rows)} courses, {len(student_rows)} students, {len(enrollment_rows)} enrollments")
+
+
+def build_spec(args: argparse.Namespace) -> Spec:
+    spec = Spec(**SCALES[args.scale], seed=args.seed)
+    overrides = {k: getattr(args, k) for k in ("majors", "courses", "teachers", "students", "enrollments")
+                 if getattr(args, k) is not None}
+    return replace(spec, **overrides)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate a reproducible benchmark dataset")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    for name in ("majors", "courses", "teachers", "students", "enrollments"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--load", action="store_true", help="bulk-load into the configured database")
+    parser.add_argument("--truncate", action="store_true", help="empty the tables before --load (keeps the admin account)")
+    parser.add_argument("--csv", type=Path, help="write one CSV per table into this directory")
+    parser.add_argument("--excel", type=Path, help="write an admin import workbook")
+    args = parser.parse_args(argv)
+
+    if not (args.load or args.csv or args.excel):
+        parser.error("choose at least one of --load, --csv, --excel")
+
+    spec = build_spec(args)
+    print(f"Dataset spec: {spec}")
+    started = datetime.now()
+
+    if args.csv:
+        write_csv(DatasetGenerator(spec), args.csv)
+    if args.excel:
+        write_excel(DatasetGenerator(spec), args.excel)
+    if args.load:
+        load_into_database(DatasetGenerator(spec), truncate=args.truncate)
+
+    print(f"Done in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as exc:  # pragma: no cover - script entry point
+        print(f"Failed to generate dataset: {exc}")
+        sys.exit(1)
@@ -0,0 +1,257 @@
+"""Replay service-layer queries with EXPLAIN and report missing indexes.
+
+Usage:
+    cd backend
+    python -m app_core.scripts.index_advisor [--json report.json] [--apply]
+
+Run it against a seeded database (see generate_dataset.py). The advisor calls
+the real service methods with sample ids taken from the database; every
+SELECT they issue is run under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``.
+Statements that would write are recorded but never executed, so the data is
+left untouched.
+
+The report lists sequential scans that filter rows away and the recommended
+hot-predicate indexes that are not present yet. ``--apply`` executes
+seeds/add_hot_predicate_indexes.sql.
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app_core.db import db
+
+MIGRATION_PATH = Path(__file__).resolve().parent.parent / "seeds" / "add_hot_predicate_indexes.sql"
+
+# Sequential scans over fewer rows than this are cheaper than an index lookup
+SEQ_SCAN_MIN_ROWS = 1000
+
+# (table, index name, columns) shipped by add_hot_predicate_indexes.sql
+RECOMMENDED_INDEXES = [
+    ("students", "idx_students_major", ["major"]),
+    ("courses", "idx_courses_teacher", ["teacher_id"]),
+    ("major_plan_courses", "idx_major_plan_courses_plan_semester", ["plan_id", "semester"]),
+    ("users", "idx_users_role_ref", ["role", "ref_id"]),
+    ("students", "idx_students_semester_updated", ["semester_updated_at", "current_semester"]),
+]
+
+# Queries issued outside the service layer (scripts, auth lookups)
+SCRIPT_QUERIES = [
+    (
+        "advance_semester.eligible",
+        """
+        SELECT id FROM students
+        WHERE current_semester < %s
+          AND (semester_updated_at IS NULL OR semester_updated_at <= NOW() - INTERVAL '6 months')
+        """,
+        lambda s: [8],
+    ),
+    (
+        "users.by_role_ref",
+        "SELECT * FROM users WHERE role = %s AND ref_id = %s",
+        lambda s: ["student", s["student_id"]],
+    ),
+]
+
+
+class ExplainRecorder:
+    """Wraps db read helpers so each distinct SELECT is explained once."""
+
+    def __init__(self):
+        self.reports: List[Dict[str, Any]] = []
+        self._seen = set()
+        self._originals = {}
+        self.label = ""
+
+    def install(self):
+        for name in ("fetch_all", "fetch_one", "execute", "execute_returning"):
+            self._originals[name] = getattr(db, name)
+        db.fetch_all = self._wrap("fetch_all")
+        db.fetch_one = self._wrap("fetch_one")
+        db.execute = self._wrap("execute")
+        db.execute_returning = self._wrap("execute_returning")
+
+    def uninstall(self):
+        for name, fn in self._originals.items():
+            setattr(db, name, fn)
+
+    def _wrap(self, name):
+        original = self._originals[name]
+
+        def wrapper(sql: str, params: Optional[List[Any]] = None):
+            if not _is_select(sql):
+                self.reports.append({"source": self.label, "sql": _compact(sql), "skipped": "write statement"})
+                return [] if name == "fetch_all" else None
+            self.explain(sql, params)
+            return original(sql, params)
+
+        return wrapper
+
+    def explain(self, sql: str, params: Optional[List[Any]] = None):
+        key = _compact(sql)
+        if key in self._seen:
+            return
+        self._seen.add(key)
+
+        with db.get_cursor() as cur:
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params or [])
+            row = cur.fetchone()
+        plan = list(row.values())[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]
+
+        self.reports.append({
+            "source": self.label,
+            "sql": key,
+            "execution_ms": root.get("Execution Time"),
+            "seq_scans": list(_seq_scans(root["Plan"])),
+        })
+
+
+def _is_select(sql: str) -> bool:
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    return head in ("SELECT", "WITH") and not re.search(r"\b(INSERT|UPDATE|DELETE)\b", sql, re.I)
+
+
+def _compact(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _seq_scans(node: Dict[str, Any]):
+    """Yield sequential scans that discard rows through a filter."""
+    if node.get("Node Type") == "Seq Scan":
+        removed = node.get("Rows Removed by Filter", 0)
+        scanned = node.get("Actual Rows", 0) + removed
+        if node.get("Filter") and scanned >= SEQ_SCAN_MIN_ROWS:
+            yield {
+                "table": node.get("Relation Name"),
+                "filter": node.get("Filter"),
+                "rows_scanned": scanned,
+                "rows_removed": removed,
+                "shared_hit": node.get("Shared Hit Blocks", 0),
+                "shared_read": node.get("Shared Read Blocks", 0),
+            }
+    for child in node.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def _sample_ids() -> Dict[str, Any]:
+    row = db.fetch_one(
+        """
+        SELECT
+            (SELECT id FROM students WHERE major <> '' ORDER BY id LIMIT 1) AS student_id,
+            (SELECT major FROM students WHERE major <> '' ORDER BY id LIMIT 1) AS major,
+            (SELECT teacher_id FROM courses WHERE teacher_id IS NOT NULL ORDER BY id LIMIT 1) AS teacher_id,
+            (SELECT id FROM courses WHERE teacher_id IS NOT NULL ORDER BY id LIMIT 1) AS course_id
+        """
+    ) or {}
+    if not row.get("student_id") or not row.get("teacher_id"):
+        raise RuntimeError("Database has no students/courses; seed it first (generate_dataset.py)")
+    return row
+
+
+def replay_services(recorder: ExplainRecorder, sample: Dict[str, Any]):
+    """Call the hot service paths so their queries get explained."""
+    from app_core.services import AdminService, StudentService, TeacherService
+
+    calls = [
+        ("StudentService.get_available_courses", lambda: StudentService.get_available_courses(sample["student_id"])),
+        ("StudentService.get_enrollments", lambda: StudentService.get_enrollments(sample["student_id"])),
+        ("TeacherService.get_courses", lambda: TeacherService.get_courses(sample["teacher_id"])),
+        ("TeacherService.get_course_students",
+         lambda: TeacherService.get_course_students(sample["teacher_id"], sample["course_id"])),
+        ("TeacherService.get_course_stats", lambda: TeacherService.get_course_stats(sample["teacher_id"])),
+        ("AdminService.get_students", lambda: AdminService.get_students(major=sample["major"])),
+        ("AdminService.get_enrollments", lambda: AdminService.get_enrollments(student_id=sample["student_id"])),
+        ("AdminService.get_statistics", lambda: AdminService.get_statistics()),
+    ]
+    for label, call in calls:
+        recorder.label = label
+        try:
+            call()
+        except Exception as exc:  # keep replaying the remaining paths
+            recorder.reports.append({"source": label, "error": str(exc)})
+
+    for label, sql, params in SCRIPT_QUERIES:
+        recorder.label = label
+        recorder.explain(sql, params(sample))
+
+
+def missing_indexes() -> List[Dict[str, Any]]:
+    existing = {row["indexname"] for row in db.fetch_all("SELECT indexname FROM pg_indexes")}
+    return [
+        {"table": table, "index": name, "columns": columns}
+        for table, name, columns in RECOMMENDED_INDEXES
+        if name not in existing
+    ]
+
+
+def apply_migration():
+    with db.get_cursor(autocommit=True) as cur:
+        cur.execute(MIGRATION_PATH.read_text(encoding="utf-8"))
+
+
+def print_report(reports: List[Dict[str, Any]], missing: List[Dict[str, Any]]):
+    print("=" * 60)
+    print("Index advisor report")
+    print("=" * 60)
+    for report in reports:
+        if "error" in report:
+            print(f"\n❌ {report['source']}: {report['error']}")
+            continue
+        if "skipped" in report:
+            continue
+        flag = "⚠️ " if report["seq_scans"] else "✅"
+        print(f"\n{flag} {report['source']} ({report['execution_ms']:.2f} ms)")
+        print(f"   {report['sql'][:120]}")
+        for scan in report["seq_scans"]:
+            print(
+                f"   Seq Scan on {scan['table']}: {scan['rows_scanned']} rows scanned, "
+                f"{scan['rows_removed']} removed by filter {scan['filter']} "
+                f"(buffers hit={scan['shared_hit']} read={scan['shared_read']})"
+            )
+
+    print("\n" + "-" * 60)
+    if missing:
+        print("Missing recommended indexes:")
+        for item in missing:
+            print(f"   {item['index']} ON {item['table']}({', '.join(item['columns'])})")
+        print(f"Apply with: --apply (runs {MIGRATION_PATH.name})")
+    else:
+        print("All recommended indexes are present.")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    parser.add_argument("--apply", action="store_true", help="apply the hot-predicate index migration first")
+    args = parser.parse_args(argv)
+
+    if args.apply:
+        apply_migration()
+        print(f"Applied {MIGRATION_PATH.name}")
+
+    sample = _sample_ids()
+    recorder = ExplainRecorder()
+    recorder.install()
+    try:
+        replay_services(recorder, sample)
+    finally:
+        recorder.uninstall()
+
+    missing = missing_indexes()
+    print_report(recorder.reports, missing)
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({"queries": recorder.reports, "missing_indexes": missing}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+-- 热点查询谓词索引迁移（由 scripts/index_advisor.py 的 EXPLAIN 报告得出）
+-- 全部使用 IF NOT EXISTS，可重复执行
+
+-- AdminService.get_students / StudentRepository.find_by_major 按专业过滤
+CREATE INDEX IF NOT EXISTS idx_students_major ON students(major);
+
+-- TeacherService.get_courses / get_course_stats 按教师过滤课程
+CREATE INDEX IF NOT EXISTS idx_courses_teacher ON courses(teacher_id);
+
+-- MajorPlanService.get_courses_by_semester 按计划 + 学期取课程
+CREATE INDEX IF NOT EXISTS idx_major_plan_courses_plan_semester ON major_plan_courses(plan_id, semester);
+
+-- 按角色与关联 ID 反查账号
+CREATE INDEX IF NOT EXISTS idx_users_role_ref ON users(role, ref_id);
+
+-- scripts/advance_semester.py 按推进时间与当前学期筛选学生
+CREATE INDEX IF NOT EXISTS idx_students_semester_updated ON students(semester_updated_at, current_semester);
+
+-- 更新统计信息，让优化器立即使用新索引
+ANALYZE students;
+ANALYZE courses;
+ANALYZE major_plan_courses;
+ANALYZE users;
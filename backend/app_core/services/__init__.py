@@ -4,7 +4,12 @@ Services package initialization.
 from .user_service import UserService
 from .student_service import StudentService
 from .teacher_service import TeacherService
-from .admin_service import AdminService
+from .admin_service import AdminService, VersionConflict
 from .major_plan_service import MajorPlanService
+from .search_service import SearchService
+from .transcript_service import TranscriptService
+from .audit_service import PlanAuditService
+from .ranking_service import RankingService
 
-__all__ = ['UserService', 'StudentService', 'TeacherService', 'AdminService', 'MajorPlanService']
+__all__ = ['UserService', 'StudentService', 'TeacherService', 'AdminService', 'MajorPlanService', 'SearchService',
+           'TranscriptService', 'PlanAuditService', 'RankingService', 'VersionConflict']
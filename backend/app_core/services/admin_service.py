@@ -1,13 +1,29 @@
 """
 Admin service for administrative operations.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
 from io import BytesIO
 from datetime import datetime
-import pandas as pd
 
 from app_core.db import db
+from app_core.grading import final_grade_sql, grades_changed, weighted_grade_sql
+from app_core.metrics import timed_job
+from app_core.services.audit_service import PlanAuditService
+from app_core.services.ranking_service import RankingService
 from app_core.services.user_service import UserService
+from app_core.services.search_service import SearchService
+from app_core.terms import parse_term
+
+# Hidden sheet in grade exports holding the scores at export time
+GRADE_BASELINE_SHEET = '_baseline'
+
+
+class VersionConflict(Exception):
+    """A compare-and-swap update found a newer row version; ``current`` is the stored row."""
+
+    def __init__(self, current: Dict[str, Any]):
+        super().__init__('记录已被他人修改，请刷新后重试')
+        self.current = current
 
 
 class AdminService:
@@ -16,8 +32,10 @@ class AdminService:
     # ===== Excel Import / Export ===== #
 
     @staticmethod
+    @timed_job('admin_import')
     def import_courses_excel(file_stream) -> Dict[str, Any]:
         """Import courses, students, and enrollments from an Excel workbook."""
+        import pandas as pd  # local import to avoid heavy module at import time
         try:
             workbook = pd.ExcelFile(file_stream)
         except Exception as exc:  # pragma: no cover - defensive parsing
@@ -116,6 +134,7 @@ class AdminService:
                 summary['courses_created'] += 1
 
         # Enrollments sheet (optional)
+        enrolled_students = set()
         if 'enrollments' in workbook.sheet_names:
             enroll_df = workbook.parse('enrollments').fillna('')
             for _, row in enroll_df.iterrows():
@@ -154,10 +173,14 @@ class AdminService:
                     [student_id, course_id, status, grade]
                 )
                 summary['enrollments_created'] += 1
+                enrolled_students.add(student_id)
+
+        grades_changed(student_ids=enrolled_students)
 
         return summary
 
     @staticmethod
+    @timed_job('admin_export')
     def export_course_grades(course_id: int):
         """Export a course's roster and grades to an Excel workbook."""
         course = db.fetch_one(
@@ -174,40 +197,47 @@ class AdminService:
 
         # Aggregate stats for the course
         course_stats = db.fetch_one(
-            '''
+            f'''
             SELECT 
                 COUNT(e.id) AS enrolled_count,
-                ROUND(AVG(COALESCE(e.final_grade, e.grade))::numeric, 2) AS avg_grade,
+                ROUND(AVG({final_grade_sql()})::numeric, 2) AS avg_grade,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 60 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 60 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS pass_rate,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 90 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 90 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS excellent_rate
             FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
             WHERE e.course_id = %s
             ''',
             [course_id]
         ) or {}
 
         enrollments = db.fetch_all(
-            '''
+            f'''
             SELECT 
+                e.id AS enrollment_id,
                 s.student_no, 
                 s.name AS student_name, 
                 s.major, 
-                COALESCE(e.final_grade, e.grade) AS grade, 
+                e.ordinary_score,
+                e.final_score,
+                {final_grade_sql()} AS grade, 
                 e.status
             FROM enrollments e
             JOIN students s ON e.student_id = s.id
+            JOIN courses c ON c.id = e.course_id
             WHERE e.course_id = %s
             ORDER BY s.student_no
             ''',
             [course_id]
         )
 
+        import pandas as pd  # local import to avoid heavy module at import time
+
         buffer = BytesIO()
         with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
             # Course info with Chinese headers
@@ -225,19 +255,24 @@ class AdminService:
             }])
             course_df.to_excel(writer, sheet_name='课程信息', index=False)
 
-            # Enrollment/grade data with Chinese headers
-            grades_df = pd.DataFrame(enrollments)
-            if not grades_df.empty:
-                grades_df = grades_df.rename(columns={
-                    'student_no': '学号',
-                    'student_name': '姓名',
-                    'major': '专业',
-                    'grade': '成绩',
-                    'status': '状态'
-                })
-            else:  # ensure headers exist even when empty
-                grades_df = pd.DataFrame(columns=['学号', '姓名', '专业', '成绩', '状态'])
-            grades_df.to_excel(writer, sheet_name='成绩名单', index=False)
+            # Enrollment/grade data with Chinese headers; 平时成绩/期末成绩 can be
+            # filled in and uploaded back (TeacherService.import_course_grades)
+            columns = {
+                'student_no': '学号',
+                'student_name': '姓名',
+                'major': '专业',
+                'ordinary_score': '平时成绩',
+                'final_score': '期末成绩',
+                'grade': '成绩',
+                'status': '状态',
+            }
+            grades_df = pd.DataFrame(enrollments, columns=['enrollment_id', *columns])
+            grades_df[list(columns)].rename(columns=columns).to_excel(writer, sheet_name='成绩名单', index=False)
+
+            # Scores as exported, so an upload can tell edited cells from changes made since
+            baseline_df = grades_df[['enrollment_id', 'student_no', 'ordinary_score', 'final_score']]
+            baseline_df.to_excel(writer, sheet_name=GRADE_BASELINE_SHEET, index=False)
+            writer.sheets[GRADE_BASELINE_SHEET].sheet_state = 'hidden'
         buffer.seek(0)
 
         teacher_part = course.get('teacher_name') or '未指定教师'
@@ -251,8 +286,9 @@ class AdminService:
     # ========== Students ========== #
     
     @staticmethod
-    def get_students(major: Optional[str] = None, keyword: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get all students with optional filtering."""
+    def get_students(major: Optional[str] = None, keyword: Optional[str] = None,
+                     stream: bool = False) -> Iterable[Dict[str, Any]]:
+        """Get all students with optional filtering (``stream`` yields rows from a server-side cursor)."""
         sql = 'SELECT * FROM students WHERE 1=1'
         params = []
         
@@ -260,11 +296,12 @@ class AdminService:
             sql += ' AND major ILIKE %s'
             params.append(f'%{major}%')
         if keyword:
-            sql += ' AND (name ILIKE %s OR student_no ILIKE %s)'
-            params.extend([f'%{keyword}%', f'%{keyword}%'])
+            keyword_sql, keyword_params = SearchService.keyword_filter('students', keyword, 'students')
+            sql += f' AND {keyword_sql}'
+            params.extend(keyword_params)
         
         sql += ' ORDER BY id DESC'
-        return db.fetch_all(sql, params)
+        return db.stream(sql, params) if stream else db.fetch_all(sql, params)
     
     @staticmethod
     def create_student(student_no: str, name: str, major: str = '') -> int:
@@ -276,6 +313,8 @@ class AdminService:
         
         # Create user account
         UserService.create_user(student_no, f"s{student_no}", 'student', student_id)
+        SearchService.reindex('students', student_id)
+        PlanAuditService.refresh(student_ids=[student_id])
         
         return student_id
     
@@ -307,12 +346,22 @@ class AdminService:
 
         params.append(student_id)
         db.execute(f"UPDATE students SET {', '.join(updates)} WHERE id=%s", params)
+        if 'student_no' in data or 'name' in data:
+            SearchService.reindex('students', student_id)
+        if 'major' in data:
+            PlanAuditService.refresh(student_ids=[student_id])
+        if 'major' in data or 'current_semester' in data:
+            RankingService.refresh_students(student_ids=[student_id])
+        UserService.invalidate_principals_for('student', student_id)
         return True
     
     @staticmethod
     def delete_student(student_id: int):
         """Delete a student."""
+        cohorts = RankingService.cohorts_of(student_ids=[student_id])
         db.execute('DELETE FROM students WHERE id=%s', [student_id])
+        RankingService.refresh(cohorts)
+        UserService.invalidate_principals_for('student', student_id)
     
     # ========== Teachers ========== #
     
@@ -351,12 +400,14 @@ class AdminService:
         
         params.append(teacher_id)
         db.execute(f"UPDATE teachers SET {', '.join(updates)} WHERE id=%s", params)
+        UserService.invalidate_principals_for('teacher', teacher_id)
         return True
     
     @staticmethod
     def delete_teacher(teacher_id: int):
         """Delete a teacher."""
         db.execute('DELETE FROM teachers WHERE id=%s', [teacher_id])
+        UserService.invalidate_principals_for('teacher', teacher_id)
     
     # ========== Courses ========== #
     
@@ -376,7 +427,7 @@ class AdminService:
     def create_course(course_code: str, name: str, credit: int = 0, 
                      capacity: int = 50, teacher_id: Optional[int] = None) -> int:
         """Create a new course."""
-        return db.execute_returning(
+        course_id = db.execute_returning(
             '''
             INSERT INTO courses (course_code, name, credit, capacity, teacher_id)
             VALUES (%s, %s, %s, %s, %s)
@@ -384,6 +435,8 @@ class AdminService:
             ''',
             [course_code, name, credit, capacity, teacher_id]
         )
+        SearchService.reindex('courses', course_id)
+        return course_id
     
     @staticmethod
     def update_course(course_id: int, data: Dict[str, Any]) -> bool:
@@ -401,23 +454,41 @@ class AdminService:
             return False
         
         params.append(course_id)
-        db.execute(f"UPDATE courses SET {', '.join(updates)} WHERE id=%s", params)
+        db.execute(f"UPDATE courses SET {', '.join(updates)}, version = version + 1 WHERE id=%s", params)
+        if 'course_code' in data or 'name' in data:
+            SearchService.reindex('courses', course_id)
+        if 'credit' in data:
+            grades_changed(course_ids=[course_id])
         return True
     
     @staticmethod
-    def update_course_weights(course_id: int, ordinary_weight: float, final_weight: float) -> bool:
+    def parse_version(data: Dict[str, Any]) -> Optional[int]:
+        """Optional ``version`` from a payload, for compare-and-swap updates."""
+        version = data.get('version')
+        if version is None or version == '':
+            return None
+        try:
+            return int(version)
+        except (TypeError, ValueError):
+            raise ValueError('version必须为整数')
+    
+    @staticmethod
+    def update_course_weights(course_id: int, ordinary_weight: float, final_weight: float,
+                              expected_version: Optional[int] = None) -> bool:
         """Update course grade weights.
         
         Args:
             course_id: The course ID to update
             ordinary_weight: 平时成绩占比 (0-1)
             final_weight: 期末成绩占比 (0-1)
+            expected_version: 客户端读到的课程版本（可选）
         
         Returns:
-            bool: True if update successful, False otherwise
+            bool: True if update successful, False if the course does not exist
         
         Raises:
             ValueError: If weights are invalid or don't sum to 1
+            VersionConflict: If ``expected_version`` is given and the course has changed since
         """
         # Validate weights
         if ordinary_weight < 0 or ordinary_weight > 1:
@@ -429,44 +500,52 @@ class AdminService:
         if abs(total_weight - 1.0) > 0.01:  # Allow small floating point errors
             raise ValueError(f'占比和必须为1，当前为{total_weight}')
         
-        # Update course weights
-        db.execute(
-            'UPDATE courses SET ordinary_weight=%s, final_weight=%s WHERE id=%s',
-            [ordinary_weight, final_weight, course_id]
-        )
-        
-        # Recalculate final_grade for all enrollments in this course
-        db.execute(
+        sql = 'UPDATE courses SET ordinary_weight=%s, final_weight=%s, version = version + 1 WHERE id=%s'
+        params = [ordinary_weight, final_weight, course_id]
+        if expected_version is not None:
+            sql += ' AND version=%s'
+            params.append(expected_version)
+        
+        # Final grades are derived at read time, so this single row is the whole write
+        if db.fetch_one(sql + ' RETURNING id', params):
+            grades_changed(course_ids=[course_id])
+            return True
+        current = db.fetch_one(
             '''
-            UPDATE enrollments
-            SET final_grade = CASE
-                WHEN ordinary_score IS NOT NULL AND final_score IS NOT NULL
-                THEN ROUND((ordinary_score * %s + final_score * %s)::numeric, 1)
-                ELSE NULL
-            END
-            WHERE course_id = %s
+            SELECT c.*, t.name AS teacher_name
+            FROM courses c
+            LEFT JOIN teachers t ON c.teacher_id = t.id
+            WHERE c.id=%s
             ''',
-            [ordinary_weight, final_weight, course_id]
+            [course_id]
         )
-        
-        return True
+        if not current:
+            return False
+        raise VersionConflict(current)
     
     @staticmethod
     def delete_course(course_id: int):
         """Delete a course."""
+        students = db.fetch_all('SELECT student_id FROM enrollments WHERE course_id=%s', [course_id])
+        plans = db.fetch_all('SELECT DISTINCT plan_id FROM major_plan_courses WHERE course_id=%s', [course_id])
         db.execute('DELETE FROM courses WHERE id=%s', [course_id])
+        grades_changed(student_ids=[row['student_id'] for row in students])
+        if plans:
+            PlanAuditService.refresh(plan_ids=[row['plan_id'] for row in plans])
     
     # ========== Enrollments ========== #
     
     @staticmethod
     def get_enrollments(student_id: Optional[int] = None, 
-                       course_id: Optional[int] = None) -> List[Dict[str, Any]]:
-        """Get all enrollments with optional filtering."""
-        sql = '''
+                       course_id: Optional[int] = None,
+                       stream: bool = False) -> Iterable[Dict[str, Any]]:
+        """Get all enrollments with optional filtering (``stream`` yields rows from a server-side cursor)."""
+        sql = f'''
             SELECT e.*, 
                    s.name AS student_name, s.student_no, s.major,
                    c.name AS course_name, c.ordinary_weight AS course_ordinary_weight, c.final_weight AS course_final_weight,
-                   t.name AS teacher_name
+                   t.name AS teacher_name,
+                   {weighted_grade_sql()} AS final_grade
             FROM enrollments e
             JOIN students s ON e.student_id = s.id
             JOIN courses c ON e.course_id = c.id
@@ -483,20 +562,25 @@ class AdminService:
             params.append(course_id)
         
         sql += ' ORDER BY e.id DESC'
-        return db.fetch_all(sql, params)
+        return db.stream(sql, params) if stream else db.fetch_all(sql, params)
     
     @staticmethod
     def create_enrollment(student_id: int, course_id: int, status: str = 'enrolled') -> int:
         """Create a new enrollment."""
-        return db.execute_returning(
+        enrollment_id = db.execute_returning(
             'INSERT INTO enrollments (student_id, course_id, status) VALUES (%s, %s, %s) RETURNING id',
             [student_id, course_id, status]
         )
+        grades_changed(student_ids=[student_id])
+        return enrollment_id
     
     @staticmethod
     def set_grade(enrollment_id: int, grade: float):
         """Set grade for an enrollment."""
-        db.execute('UPDATE enrollments SET grade=%s WHERE id=%s', [grade, enrollment_id])
+        row = db.fetch_one('UPDATE enrollments SET grade=%s, version = version + 1 WHERE id=%s RETURNING student_id',
+                           [grade, enrollment_id])
+        if row:
+            grades_changed(student_ids=[row['student_id']])
     
     @staticmethod
     def update_student_grades(enrollment_id: int, data: Dict[str, Any]) -> bool:
@@ -508,27 +592,18 @@ class AdminService:
             data: Dictionary containing:
                 - ordinary_score: 平时成绩 (0-100)
                 - final_score: 期末成绩 (0-100)
+                - version: 客户端读到的记录版本（可选，提供时做比较并交换）
         
         Returns:
-            bool: True if update successful, False otherwise
-        """
-        # Get the enrollment to find course_id
-        enrollment = db.fetch_one('SELECT course_id FROM enrollments WHERE id=%s', [enrollment_id])
-        if not enrollment:
-            return False
-        
-        course_id = enrollment['course_id']
+            bool: True if update successful, False if not found or nothing to update
         
-        # Get course weights
-        course = db.fetch_one('SELECT ordinary_weight, final_weight FROM courses WHERE id=%s', [course_id])
-        ordinary_weight = float(course['ordinary_weight']) if course and course['ordinary_weight'] is not None else 0.5
-        final_weight = float(course['final_weight']) if course and course['final_weight'] is not None else 0.5
-        
-        updates = []
-        params = []
+        Raises:
+            VersionConflict: If ``version`` is given and the row has changed since
+        """
+        expected_version = AdminService.parse_version(data)
+        scores = {}
         
         # Process ordinary_score
-        ordinary_score = None
         if 'ordinary_score' in data:
             ordinary_score = data['ordinary_score']
             if ordinary_score is not None:
@@ -538,11 +613,9 @@ class AdminService:
                         raise ValueError('平时成绩必须在0-100之间')
                 except (ValueError, TypeError) as e:
                     raise ValueError(f'平时成绩格式错误: {str(e)}')
-            updates.append('ordinary_score=%s')
-            params.append(ordinary_score)
+            scores['ordinary_score'] = ordinary_score
         
         # Process final_score
-        final_score = None
         if 'final_score' in data:
             final_score = data['final_score']
             if final_score is not None:
@@ -552,26 +625,49 @@ class AdminService:
                         raise ValueError('期末成绩必须在0-100之间')
                 except (ValueError, TypeError) as e:
                     raise ValueError(f'期末成绩格式错误: {str(e)}')
-            updates.append('final_score=%s')
-            params.append(final_score)
+            scores['final_score'] = final_score
         
-        if not updates:
+        if not scores:
             return False
         
-        # Calculate final_grade if both scores are provided
-        if ordinary_score is not None and final_score is not None:
-            final_grade = float(ordinary_score) * ordinary_weight + float(final_score) * final_weight
-            updates.append('final_grade=%s')
-            params.append(round(final_grade, 1))
-        
+        # Only the scores are stored; the final grade is derived from them at read time
+        assignments = [f'{field}=%s' for field in scores]
+        params = list(scores.values())
+        sql = f"UPDATE enrollments SET {', '.join(assignments)}, version = version + 1 WHERE id=%s"
         params.append(enrollment_id)
-        db.execute(f"UPDATE enrollments SET {', '.join(updates)} WHERE id=%s", params)
-        return True
+        if expected_version is not None:
+            sql += ' AND version=%s'
+            params.append(expected_version)
+        row = db.fetch_one(sql + ' RETURNING student_id', params)
+        if row:
+            grades_changed(student_ids=[row['student_id']])
+            return True
+        if expected_version is None:
+            return False
+        
+        # Report the row as the list endpoints show it: derived final grade, not the legacy column
+        current = db.fetch_one(
+            f'''
+            SELECT e.id, e.student_id, e.course_id, e.status, e.grade, e.ordinary_score, e.final_score,
+                   e.enrolled_at, e.version,
+                   c.ordinary_weight AS course_ordinary_weight, c.final_weight AS course_final_weight,
+                   {weighted_grade_sql()} AS final_grade
+            FROM enrollments e
+            JOIN courses c ON e.course_id = c.id
+            WHERE e.id=%s
+            ''',
+            [enrollment_id]
+        )
+        if not current:
+            return False
+        raise VersionConflict(current)
     
     @staticmethod
     def delete_enrollment(enrollment_id: int):
         """Delete an enrollment."""
-        db.execute('DELETE FROM enrollments WHERE id=%s', [enrollment_id])
+        row = db.fetch_one('DELETE FROM enrollments WHERE id=%s RETURNING student_id', [enrollment_id])
+        if row:
+            grades_changed(student_ids=[row['student_id']])
     
     # ========== Statistics ========== #
     
@@ -579,33 +675,78 @@ class AdminService:
     @staticmethod
     def _fetch_course_stats(course_code: Optional[str] = None, course_name: Optional[str] = None):
         """Internal helper to compute per-course statistics with optional filters."""
-        code_pattern = f"%{course_code}%" if course_code else None
-        name_pattern = f"%{course_name}%" if course_name else None
+        filters = []
+        params = []
+        if course_code:
+            code_sql, code_params = SearchService.keyword_filter('courses', course_code, 'c', ('course_code',))
+            filters.append(code_sql)
+            params.extend(code_params)
+        if course_name:
+            name_sql, name_params = SearchService.keyword_filter('courses', course_name, 'c', ('name',))
+            filters.append(name_sql)
+            params.extend(name_params)
+        where = ' AND '.join(filters) if filters else '1=1'
+
+        # Served from the in-memory snapshot when available; only the course filter hits the database
+        course_ids = None
+        if filters:
+            course_ids = [row['id'] for row in db.fetch_all(f'SELECT c.id FROM courses c WHERE {where}', params)]
+        from app_core.analytics import analytics  # local import: NumPy loads on first dashboard use
+        stats = analytics.course_stats(course_ids)
+        if stats is not None:
+            return stats
 
         return db.fetch_all(
-            '''
+            f'''
             SELECT 
                 c.id, 
                 c.name, 
                 c.course_code, 
                 COUNT(e.id) AS enrolled_count,
-                ROUND(AVG(COALESCE(e.final_grade, e.grade))::numeric, 2) AS avg_grade,
+                ROUND(AVG({final_grade_sql()})::numeric, 2) AS avg_grade,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 60 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 60 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS pass_rate,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 90 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 90 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS excellent_rate
             FROM courses c
             LEFT JOIN enrollments e ON e.course_id = c.id
-            WHERE (%s IS NULL OR c.course_code ILIKE %s)
-              AND (%s IS NULL OR c.name ILIKE %s)
+            WHERE {where}
             GROUP BY c.id, c.name, c.course_code
             ORDER BY c.id
             ''',
-            [code_pattern, code_pattern, name_pattern, name_pattern]
+            params
+        )
+
+    @staticmethod
+    def _persist_course_rates(course_stats: List[Dict[str, Any]]):
+        """Write pass/excellent rates that differ from the stored columns, in one statement."""
+        rates = [(c['id'], c.get('pass_rate'), c.get('excellent_rate')) for c in course_stats]
+        if not rates:
+            return
+        stored = {
+            row['id']: (row['pass_rate'], row['excellent_rate'])
+            for row in db.fetch_all('SELECT id, pass_rate, excellent_rate FROM courses WHERE id = ANY(%s)',
+                                    [[cid for cid, _, _ in rates]])
+        }
+        # The statement-level version trigger fires even when no row changes, so skip no-op updates
+        changed = [r for r in rates if r[0] in stored and stored[r[0]] != (r[1], r[2])]
+        if not changed:
+            return
+        db.execute_values(
+            '''
+            UPDATE courses AS c
+            SET pass_rate = v.pass_rate, excellent_rate = v.excellent_rate
+            FROM (VALUES %s) AS v(id, pass_rate, excellent_rate)
+            WHERE c.id = v.id
+              AND (c.pass_rate IS DISTINCT FROM v.pass_rate OR c.excellent_rate IS DISTINCT FROM v.excellent_rate)
+            RETURNING c.id
+            ''',
+            changed,
+            template='(%s::int, %s::numeric, %s::numeric)',
         )
 
     @staticmethod
@@ -626,11 +767,7 @@ class AdminService:
 
         # Compute full stats (without filters) and persist rates to courses table
         full_course_stats = AdminService._fetch_course_stats()
-        for c in full_course_stats:
-            db.execute(
-                'UPDATE courses SET pass_rate=%s, excellent_rate=%s WHERE id=%s',
-                [c.get('pass_rate'), c.get('excellent_rate'), c['id']]
-            )
+        AdminService._persist_course_rates(full_course_stats)
 
         # Apply filters for the response payload (if provided)
         course_stats = (
@@ -640,3 +777,84 @@ class AdminService:
         )
         
         return {'counts': counts, 'course_avg': course_stats}
+
+    @staticmethod
+    def distribution_generation() -> int:
+        """Analytics snapshot generation after any due refresh; part of the distribution ETags."""
+        from app_core.analytics import analytics  # local import: NumPy loads on first dashboard use
+        analytics.snapshot()
+        return analytics.generation
+
+    @staticmethod
+    def get_distribution(by: str, key: Any, bins: int = 10, term: Optional[str] = None,
+                         compare: bool = False) -> Dict[str, Any]:
+        """Histograms, mean and deciles of final grade, ordinary and final score for one group.
+
+        ``term`` ('2025秋') limits the rows to one enrolment term; ``compare``
+        adds the same distributions for the term before it.
+        """
+        from app_core.analytics import analytics, distribution_from_rows  # local import: NumPy
+        if by not in ('course', 'major', 'teacher'):
+            raise ValueError('by必须是 course, major, teacher 之一')
+        if by != 'major':
+            try:
+                key = int(key)
+            except (TypeError, ValueError):
+                raise ValueError('key必须是整数')
+        term_index = parse_term(term) if term else None
+
+        result = analytics.distribution(by, key, bins, term_index, compare)
+        if result is None:
+            # One scan of the group's rows; the same kernels summarise them
+            condition = {'course': 'e.course_id = %s', 'teacher': 'c.teacher_id = %s',
+                         'major': "COALESCE(s.major, '') = %s"}[by]
+            rows = db.fetch_all(
+                f'''
+                SELECT e.ordinary_score, e.final_score, {final_grade_sql()} AS final_grade, e.enrolled_at
+                FROM enrollments e
+                JOIN courses c ON c.id = e.course_id
+                JOIN students s ON s.id = e.student_id
+                WHERE {condition}
+                ''',
+                [key]
+            )
+            result = distribution_from_rows(rows, bins, term_index, compare)
+        return {'by': by, 'key': key, **result}
+
+    @staticmethod
+    def get_group_stats(by: str) -> List[Dict[str, Any]]:
+        """Enrolment count, average and pass/excellent rates per course, major or teacher."""
+        if by not in ('course', 'major', 'teacher'):
+            raise ValueError('by必须是 course, major, teacher 之一')
+        from app_core.analytics import analytics  # local import: NumPy loads on first dashboard use
+        stats = analytics.group_stats(by)
+        if stats is not None:
+            return stats
+        if by == 'course':
+            return AdminService._fetch_course_stats()
+
+        key, name = ("COALESCE(s.major, '')", "COALESCE(s.major, '')") if by == 'major' else ('c.teacher_id', 't.name')
+        return db.fetch_all(
+            f'''
+            SELECT
+                {key} AS key,
+                {name} AS name,
+                COUNT(e.id) AS enrolled_count,
+                ROUND(AVG({final_grade_sql()})::numeric, 2) AS avg_grade,
+                ROUND(
+                    (SUM(CASE WHEN {final_grade_sql()} >= 60 THEN 1 ELSE 0 END)::numeric
+                        / NULLIF(COUNT(e.id), 0)) * 100, 2
+                ) AS pass_rate,
+                ROUND(
+                    (SUM(CASE WHEN {final_grade_sql()} >= 90 THEN 1 ELSE 0 END)::numeric
+                        / NULLIF(COUNT(e.id), 0)) * 100, 2
+                ) AS excellent_rate
+            FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
+            JOIN students s ON s.id = e.student_id
+            LEFT JOIN teachers t ON t.id = c.teacher_id
+            WHERE {key} IS NOT NULL
+            GROUP BY 1, 2
+            ORDER BY 1
+            '''
+        )
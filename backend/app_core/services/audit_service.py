@@ -0,0 +1,230 @@
+"""
+Plan audit service: progress of every student against their major plan.
+
+Each required course of the student's plan (``major_plans.major_name =
+students.major``) is *completed* when its final grade passes, *in progress*
+when the student is enrolled but not yet graded, and *missing* otherwise
+(never taken or failed). Per-student counts and the credit shortfall are
+materialised in ``plan_audit`` with one set-based statement, for the whole
+university at startup or on demand, and afterwards only for the students a
+write touched: enrollment and grade writes through ``grades_changed``,
+student and plan edits by calling ``refresh`` directly. Course details are
+joined on read.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import time
+
+from app_core.db import db
+from app_core.grading import PASSING_GRADE, final_grade_sql, on_grades_changed
+
+logger = logging.getLogger(__name__)
+
+AUDIT_STATUSES = ('completed', 'in_progress', 'missing')
+
+
+class PlanAuditService:
+    """Service for plan completion audits."""
+
+    # ========== Schema ========== #
+
+    @staticmethod
+    def init_audit_schema() -> bool:
+        """Create ``plan_audit`` and fill it on first start."""
+        try:
+            with db.get_cursor(autocommit=True) as cur:
+                cur.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS plan_audit (
+                        student_id INT PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+                        plan_id INT NOT NULL REFERENCES major_plans(id) ON DELETE CASCADE,
+                        required_courses INT NOT NULL DEFAULT 0,
+                        completed_courses INT NOT NULL DEFAULT 0,
+                        in_progress_courses INT NOT NULL DEFAULT 0,
+                        missing_courses INT NOT NULL DEFAULT 0,
+                        required_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        completed_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        in_progress_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        credit_shortfall NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                    '''
+                )
+                cur.execute('CREATE INDEX IF NOT EXISTS idx_plan_audit_plan ON plan_audit(plan_id)')
+            if not db.fetch_one('SELECT 1 AS present FROM plan_audit LIMIT 1'):
+                PlanAuditService.refresh()
+            logger.info("✅ Plan audit ready")
+            return True
+        except Exception as exc:
+            logger.warning(f"⚠️ Plan audit unavailable: {exc}")
+            return False
+
+    # ========== Maintenance ========== #
+
+    @staticmethod
+    def _plan_rows_sql(scope: str) -> str:
+        """One row per (student, required plan course) in ``scope`` with the course's audit status."""
+        grade = final_grade_sql()
+        return f'''
+            SELECT s.id AS student_id, p.id AS plan_id, r.course_id, r.semester,
+                   c.course_code, c.name AS course_name, COALESCE(c.credit, 0) AS credit,
+                   e.id AS enrollment_id, {grade} AS final_grade,
+                   CASE WHEN {grade} >= {PASSING_GRADE} THEN 'completed'
+                        WHEN e.id IS NOT NULL AND {grade} IS NULL THEN 'in_progress'
+                        ELSE 'missing' END AS status
+            FROM students s
+            JOIN major_plans p ON p.major_name = s.major
+            JOIN (
+                SELECT plan_id, course_id, MIN(semester) AS semester
+                FROM major_plan_courses
+                WHERE COALESCE(is_required, TRUE)
+                GROUP BY plan_id, course_id
+            ) r ON r.plan_id = p.id
+            JOIN courses c ON c.id = r.course_id
+            LEFT JOIN enrollments e ON e.student_id = s.id AND e.course_id = r.course_id
+            WHERE {scope}
+        '''
+
+    @staticmethod
+    def _scope(student_ids: Optional[Sequence[int]], course_ids: Optional[Sequence[int]],
+               plan_ids: Optional[Sequence[int]]) -> Tuple[str, List[Any]]:
+        """Students to recompute: the given ones, those enrolled in or planned to take the
+        courses, and those whose major follows (or was last audited against) the plans."""
+        if student_ids is None and course_ids is None and plan_ids is None:
+            return 'TRUE', []
+        clauses, params = [], []
+        if student_ids:
+            clauses.append('{col} = ANY(%s)')
+            params.append(list(student_ids))
+        if course_ids:
+            clauses.append('{col} IN (SELECT student_id FROM enrollments WHERE course_id = ANY(%s))')
+            clauses.append('{col} IN (SELECT st.id FROM students st JOIN major_plans mp ON mp.major_name = st.major '
+                           'JOIN major_plan_courses mpc ON mpc.plan_id = mp.id WHERE mpc.course_id = ANY(%s))')
+            params += [list(course_ids)] * 2
+        if plan_ids:
+            clauses.append('{col} IN (SELECT st.id FROM students st JOIN major_plans mp ON mp.major_name = st.major '
+                           'WHERE mp.id = ANY(%s))')
+            clauses.append('{col} IN (SELECT student_id FROM plan_audit WHERE plan_id = ANY(%s))')
+            params += [list(plan_ids)] * 2
+        return ' OR '.join(clauses) or 'FALSE', params
+
+    @staticmethod
+    def refresh(student_ids: Optional[Sequence[int]] = None, course_ids: Optional[Sequence[int]] = None,
+                plan_ids: Optional[Sequence[int]] = None) -> int:
+        """Recompute ``plan_audit`` for the scope (everyone when all are None); returns the rows written."""
+        scope, params = PlanAuditService._scope(student_ids, course_ids, plan_ids)
+        rows_sql = PlanAuditService._plan_rows_sql(scope.format(col='s.id'))
+        with db.get_cursor() as cur:
+            cur.execute(f"DELETE FROM plan_audit WHERE {scope.format(col='student_id')}", params)
+            cur.execute(
+                f'''
+                INSERT INTO plan_audit
+                    (student_id, plan_id, required_courses, completed_courses, in_progress_courses,
+                     missing_courses, required_credits, completed_credits, in_progress_credits, credit_shortfall)
+                SELECT a.student_id, a.plan_id, COUNT(*),
+                       SUM(CASE WHEN a.status = 'completed' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN a.status = 'in_progress' THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN a.status = 'missing' THEN 1 ELSE 0 END),
+                       SUM(a.credit),
+                       SUM(CASE WHEN a.status = 'completed' THEN a.credit ELSE 0 END),
+                       SUM(CASE WHEN a.status = 'in_progress' THEN a.credit ELSE 0 END),
+                       SUM(CASE WHEN a.status <> 'completed' THEN a.credit ELSE 0 END)
+                FROM ({rows_sql}) a
+                GROUP BY a.student_id, a.plan_id
+                ''',
+                params
+            )
+            return cur.rowcount
+
+    @staticmethod
+    def refresh_all() -> Dict[str, Any]:
+        """Audit the whole university in one pass (e.g. after loading data outside the app)."""
+        started = time.perf_counter()
+        students = PlanAuditService.refresh()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"✅ Plan audit refreshed for {students} students in {elapsed_ms} ms")
+        return {'students': students, 'elapsed_ms': elapsed_ms}
+
+    # ========== Reads ========== #
+
+    @staticmethod
+    def _audits(where: str, params: List[Any], details: bool) -> List[Dict[str, Any]]:
+        """Audits of the students matching ``where`` (on ``s``), two queries in total."""
+        summaries = db.fetch_all(
+            f'''
+            SELECT s.id, s.student_no, s.name, s.major, s.current_semester,
+                   p.id AS plan_id,
+                   COALESCE(a.required_courses, 0) AS required_courses,
+                   COALESCE(a.completed_courses, 0) AS completed_courses,
+                   COALESCE(a.in_progress_courses, 0) AS in_progress_courses,
+                   COALESCE(a.missing_courses, 0) AS missing_courses,
+                   COALESCE(a.required_credits, 0) AS required_credits,
+                   COALESCE(a.completed_credits, 0) AS completed_credits,
+                   COALESCE(a.in_progress_credits, 0) AS in_progress_credits,
+                   COALESCE(a.credit_shortfall, 0) AS credit_shortfall
+            FROM students s
+            LEFT JOIN major_plans p ON p.major_name = s.major
+            LEFT JOIN plan_audit a ON a.student_id = s.id
+            WHERE {where}
+            ORDER BY s.student_no
+            ''',
+            params
+        )
+        audits: Dict[int, Dict[str, Any]] = {}
+        for row in summaries:
+            summary = {k: row[k] for k in ('required_courses', 'completed_courses', 'in_progress_courses',
+                                           'missing_courses', 'required_credits', 'completed_credits',
+                                           'in_progress_credits', 'credit_shortfall')}
+            summary['complete'] = row['plan_id'] is not None and row['completed_courses'] == row['required_courses']
+            audits[row['id']] = {
+                'student': {k: row[k] for k in ('id', 'student_no', 'name', 'major', 'current_semester')},
+                'plan_id': row['plan_id'],
+                'summary': summary,
+            }
+        if details and audits:
+            for audit in audits.values():
+                audit['courses'] = {status: [] for status in AUDIT_STATUSES}
+            rows = db.fetch_all(
+                PlanAuditService._plan_rows_sql(where) + ' ORDER BY r.semester, c.course_code', params)
+            for row in rows:
+                audit = audits.get(row['student_id'])
+                if audit is not None:
+                    audit['courses'][row['status']].append(
+                        {k: row[k] for k in ('course_id', 'course_code', 'course_name', 'credit', 'semester',
+                                             'enrollment_id', 'final_grade')})
+        return list(audits.values())
+
+    @staticmethod
+    def get_student_audit(student_id: int) -> Optional[Dict[str, Any]]:
+        audits = PlanAuditService._audits('s.id = %s', [student_id], details=True)
+        return audits[0] if audits else None
+
+    @staticmethod
+    def get_major_audit(major: str, details: bool = True) -> List[Dict[str, Any]]:
+        """Audits of every student in ``major``, ordered by student number."""
+        return PlanAuditService._audits('s.major = %s', [major], details)
+
+    @staticmethod
+    def get_overview() -> List[Dict[str, Any]]:
+        """Plan completion per major across the whole university, from the materialised audit."""
+        return db.fetch_all(
+            '''
+            SELECT s.major,
+                   COUNT(*) AS students,
+                   COUNT(a.student_id) AS audited_students,
+                   SUM(CASE WHEN a.missing_courses = 0 AND a.in_progress_courses = 0 THEN 1 ELSE 0 END)
+                       AS complete_students,
+                   SUM(CASE WHEN a.missing_courses > 0 THEN 1 ELSE 0 END) AS students_missing_courses,
+                   ROUND(AVG(a.credit_shortfall), 2) AS avg_credit_shortfall,
+                   MAX(a.credit_shortfall) AS max_credit_shortfall
+            FROM students s
+            LEFT JOIN plan_audit a ON a.student_id = s.id
+            GROUP BY s.major
+            ORDER BY s.major
+            '''
+        )
+
+
+@on_grades_changed
+def _refresh_audits(student_ids: Sequence[int] = (), course_ids: Sequence[int] = ()):
+    PlanAuditService.refresh(student_ids or None, course_ids or None)
@@ -5,6 +5,7 @@ from typing import List, Dict, Any, Optional
 import logging
 
 from app_core.db import db
+from app_core.services.audit_service import PlanAuditService
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ class MajorPlanService:
             RETURNING id, major_name, description, created_at
         """
         result = db.fetch_one(sql, [major_name, description])
+        PlanAuditService.refresh(plan_ids=[result['id']])
         logger.info(f"✅ Created major plan: {major_name}")
         return result
     
@@ -74,6 +76,7 @@ class MajorPlanService:
             RETURNING id, major_name, description, created_at, updated_at
         """
         created = db.fetch_one(sql, [major_name, description])
+        PlanAuditService.refresh(plan_ids=[created['id']])
         logger.info(f"✅ Auto-created major plan for major: {major_name}")
         return created
     
@@ -86,6 +89,7 @@ class MajorPlanService:
             RETURNING id, plan_id, course_id, semester, is_required, created_at
         """
         result = db.fetch_one(sql, [plan_id, course_id, semester, is_required])
+        PlanAuditService.refresh(plan_ids=[plan_id])
         logger.info(f"✅ Added course {course_id} to plan {plan_id} semester {semester}")
         return result
     
@@ -137,8 +141,10 @@ class MajorPlanService:
     @staticmethod
     def remove_course_from_plan(plan_course_id: int) -> bool:
         """Remove a course from a major plan."""
-        sql = "DELETE FROM major_plan_courses WHERE id = %s"
-        db.execute(sql, [plan_course_id])
+        sql = "DELETE FROM major_plan_courses WHERE id = %s RETURNING plan_id"
+        removed = db.fetch_one(sql, [plan_course_id])
+        if removed:
+            PlanAuditService.refresh(plan_ids=[removed['plan_id']])
         logger.info(f"✅ Removed course from plan: {plan_course_id}")
         return True
     
@@ -169,6 +175,8 @@ class MajorPlanService:
             RETURNING id, major_name, description, updated_at
         """
         result = db.fetch_one(sql, params)
+        if major_name is not None:
+            PlanAuditService.refresh(plan_ids=[plan_id])
         logger.info(f"✅ Updated major plan: {plan_id}")
         return result
     
@@ -0,0 +1,227 @@
+"""
+Ranking service: class rank and percentile within a cohort.
+
+A cohort is the students sharing ``major`` and ``current_semester``. They are
+ranked by GPA, then credit-weighted average, both taken from ``student_gpa``
+(the transcript aggregates, built from the shared final grade rule in
+app_core.grading). Rank (ties share a rank), cohort size and percentile are
+stored in ``cohort_ranks`` by one windowed INSERT ... SELECT per refresh, so a
+student's rank is a primary-key lookup and a cohort's top N an index range
+scan. When grades change only the cohorts of the affected students, old and
+new, are recomputed. Students without any graded course are not ranked.
+
+Grade writes reach the ranking through ``on_gpa_changed``, i.e. after their
+``student_gpa`` rows are refreshed. The re-rank itself runs on a background
+thread that merges the writes of Config.RANKING_REFRESH_DELAY seconds into
+one refresh (0 = re-rank inline), so grading requests do not wait for it.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import logging
+import threading
+import time
+
+from app_core.conditional import invalidate_versions
+from app_core.config import Config
+from app_core.db import db
+from app_core.services.transcript_service import on_gpa_changed
+
+logger = logging.getLogger(__name__)
+
+Cohort = Tuple[str, int]
+
+MAX_TOP_N = 200
+
+
+class RankingService:
+    """Service for precomputed cohort rankings."""
+
+    # ========== Schema ========== #
+
+    @staticmethod
+    def init_ranking_schema() -> bool:
+        """Create ``cohort_ranks`` and fill it on first start."""
+        try:
+            with db.get_cursor(autocommit=True) as cur:
+                cur.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS cohort_ranks (
+                        student_id INT PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+                        major VARCHAR(128) NOT NULL,
+                        semester INT NOT NULL,
+                        gpa NUMERIC(3,2) NOT NULL,
+                        weighted_average NUMERIC(5,2),
+                        class_rank INT NOT NULL,
+                        cohort_size INT NOT NULL,
+                        percentile NUMERIC(5,2) NOT NULL,
+                        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                    '''
+                )
+                cur.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_cohort_ranks_cohort ON cohort_ranks(major, semester, class_rank)'
+                )
+            if not db.fetch_one('SELECT 1 AS present FROM cohort_ranks LIMIT 1'):
+                RankingService.refresh()
+            logger.info("✅ Cohort rankings ready")
+            return True
+        except Exception as exc:
+            logger.warning(f"⚠️ Cohort rankings unavailable: {exc}")
+            return False
+
+    # ========== Maintenance ========== #
+
+    @staticmethod
+    def cohorts_of(student_ids: Optional[Sequence[int]] = None,
+                   course_ids: Optional[Sequence[int]] = None) -> List[Cohort]:
+        """Cohorts the students (or everyone enrolled in the courses) are in now or were last ranked in."""
+        clauses, params = [], []
+        if student_ids:
+            clauses.append('{col} = ANY(%s)')
+            params.append(list(student_ids))
+        if course_ids:
+            clauses.append('{col} IN (SELECT student_id FROM enrollments WHERE course_id = ANY(%s))')
+            params.append(list(course_ids))
+        if not clauses:
+            return []
+        scope = ' OR '.join(clauses)
+        rows = db.fetch_all(
+            f'''
+            SELECT major, current_semester AS semester FROM students WHERE {scope.format(col='id')}
+            UNION
+            SELECT major, semester FROM cohort_ranks WHERE {scope.format(col='student_id')}
+            ''',
+            params + params
+        )
+        return [(row['major'], row['semester']) for row in rows if row['major'] and row['semester'] is not None]
+
+    @staticmethod
+    def refresh(cohorts: Optional[Iterable[Cohort]] = None) -> int:
+        """Re-rank the given cohorts (all of them when None) with one windowed statement; returns rows written."""
+        if cohorts is None:
+            delete_sql, scope, params = 'DELETE FROM cohort_ranks', 'TRUE', []
+        else:
+            cohorts = tuple(sorted(set(cohorts)))
+            if not cohorts:
+                return 0
+            delete_sql = 'DELETE FROM cohort_ranks WHERE (major, semester) IN %s'
+            scope, params = '(s.major, s.current_semester) IN %s', [cohorts]
+        cohort = 'PARTITION BY s.major, s.current_semester'
+        order = 'ORDER BY g.gpa DESC, g.weighted_average DESC'
+        with db.get_cursor() as cur:
+            cur.execute(delete_sql, params)
+            cur.execute(
+                f'''
+                INSERT INTO cohort_ranks
+                    (student_id, major, semester, gpa, weighted_average, class_rank, cohort_size, percentile)
+                SELECT s.id, s.major, s.current_semester, g.gpa, g.weighted_average,
+                       RANK() OVER ({cohort} {order}),
+                       COUNT(*) OVER ({cohort}),
+                       ROUND(100 * (1 - PERCENT_RANK() OVER ({cohort} {order}))::numeric, 2)
+                FROM students s
+                JOIN student_gpa g ON g.student_id = s.id
+                WHERE g.gpa IS NOT NULL AND s.major <> '' AND s.current_semester IS NOT NULL AND {scope}
+                ''',
+                params
+            )
+            return cur.rowcount
+
+    @staticmethod
+    def refresh_students(student_ids: Optional[Sequence[int]] = None,
+                         course_ids: Optional[Sequence[int]] = None) -> int:
+        """Re-rank every cohort the given students (or courses' students) belong or belonged to."""
+        return RankingService.refresh(RankingService.cohorts_of(student_ids, course_ids))
+
+    # ========== Reads ========== #
+
+    @staticmethod
+    def get_student_rank(student_id: int) -> Optional[Dict[str, Any]]:
+        """A student's rank, cohort size and percentile (None when unranked)."""
+        return db.fetch_one(
+            '''
+            SELECT student_id, major, semester, gpa, weighted_average, class_rank, cohort_size, percentile, updated_at
+            FROM cohort_ranks
+            WHERE student_id = %s
+            ''',
+            [student_id]
+        )
+
+    @staticmethod
+    def get_top(major: str, semester: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """The best ``limit`` students of a cohort, in rank order."""
+        if not major:
+            raise ValueError('major为必填')
+        try:
+            semester, limit = int(semester), int(limit)
+        except (TypeError, ValueError):
+            raise ValueError('semester 与 limit 必须是整数')
+        if not 1 <= limit <= MAX_TOP_N:
+            raise ValueError(f'limit必须在1-{MAX_TOP_N}之间')
+        return db.fetch_all(
+            '''
+            SELECT r.class_rank, r.student_id, s.student_no, s.name, r.gpa, r.weighted_average,
+                   r.cohort_size, r.percentile
+            FROM cohort_ranks r
+            JOIN students s ON s.id = r.student_id
+            WHERE r.major = %s AND r.semester = %s
+            ORDER BY r.class_rank, s.student_no
+            LIMIT %s
+            ''',
+            [major, semester, limit]
+        )
+
+
+class RankingRefresher:
+    """Re-ranks the cohorts of changed students on a daemon thread, batching bursts of writes."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._students: Set[int] = set()
+        self._courses: Set[int] = set()
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, student_ids: Sequence[int] = (), course_ids: Sequence[int] = ()):
+        with self._lock:
+            self._students.update(student_ids)
+            self._courses.update(course_ids)
+            if self.delay > 0 and (self._thread is None or not self._thread.is_alive()):
+                # Started on first use, so a pre-fork master never owns it
+                self._thread = threading.Thread(target=self._run, name='ranking-refresher', daemon=True)
+                self._thread.start()
+        if self.delay > 0:
+            self._pending.set()
+        else:
+            self.flush()
+
+    def flush(self) -> int:
+        """Re-rank everything submitted so far; returns rows written."""
+        with self._lock:
+            students, courses = sorted(self._students), sorted(self._courses)
+            self._students.clear()
+            self._courses.clear()
+            self._pending.clear()
+        if not students and not courses:
+            return 0
+        written = RankingService.refresh_students(students or None, courses or None)
+        # Off the request path, so the after-write hook never drops this process's cached versions
+        invalidate_versions()
+        return written
+
+    def _run(self):
+        while True:
+            self._pending.wait()
+            # Let the rest of a burst (e.g. a bulk grade entry) arrive first
+            time.sleep(self.delay)
+            try:
+                self.flush()
+            except Exception as exc:  # keep the refresher alive
+                logger.warning(f"⚠️ Ranking refresh failed: {exc}")
+
+
+refresher = RankingRefresher(Config.RANKING_REFRESH_DELAY)
+
+
+@on_gpa_changed
+def _refresh_rankings(student_ids: Sequence[int] = (), course_ids: Sequence[int] = ()):
+    refresher.submit(student_ids, course_ids)
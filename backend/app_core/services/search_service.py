@@ -0,0 +1,256 @@
+"""
+Search service for indexed fuzzy lookup of students and courses.
+
+Two index backends are supported:
+- ``trgm``: openGauss/PostgreSQL ``pg_trgm`` GIN indexes, which let the
+  existing ``ILIKE '%keyword%'`` predicates use an index scan.
+- ``ngram``: a portable gram table per entity (used when the extension is not
+  available). Candidates are found through the gram table and then verified
+  with ``ILIKE`` so results match the ``trgm`` backend exactly.
+"""
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+from app_core.config import Config
+from app_core.db import db
+
+logger = logging.getLogger(__name__)
+
+# 中文姓名多为两到三个字，使用二元组才能覆盖两字关键词
+GRAM_SIZE = 2
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+
+
+class SearchService:
+    """Service for indexed keyword search over students and courses."""
+
+    # entity -> (table, gram table, gram fk column, searchable columns)
+    ENTITIES = {
+        'students': ('students', 'student_search_grams', 'student_id', ('student_no', 'name')),
+        'courses': ('courses', 'course_search_grams', 'course_id', ('course_code', 'name')),
+    }
+
+    # Resolved lazily: 'trgm', 'ngram' or 'plain' (no index support)
+    _backend: Optional[str] = None
+
+    # ========== Schema ========== #
+
+    @staticmethod
+    def init_search_schema() -> str:
+        """Create search indexes, preferring pg_trgm and falling back to gram tables.
+
+        Returns:
+            The backend in use ('trgm', 'ngram' or 'plain')
+        """
+        preferred = (Config.SEARCH_BACKEND or 'auto').lower()
+
+        if preferred in ('auto', 'trgm'):
+            try:
+                SearchService._create_trgm_indexes()
+                SearchService._backend = 'trgm'
+                logger.info("✅ Search backend: pg_trgm GIN indexes")
+                return SearchService._backend
+            except Exception as exc:
+                logger.warning(f"⚠️ pg_trgm unavailable, falling back to gram tables: {exc}")
+
+        try:
+            SearchService._create_gram_tables()
+            SearchService._backend = 'ngram'
+            logger.info("✅ Search backend: n-gram index tables")
+        except Exception as exc:
+            SearchService._backend = 'plain'
+            logger.warning(f"⚠️ Search indexes unavailable, using plain ILIKE scans: {exc}")
+        return SearchService._backend
+
+    @staticmethod
+    def _create_trgm_indexes():
+        with db.get_cursor(autocommit=True) as cur:
+            cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, _, _, columns in SearchService.ENTITIES.values():
+                for column in columns:
+                    cur.execute(
+                        f'CREATE INDEX IF NOT EXISTS idx_{table}_{column}_trgm '
+                        f'ON {table} USING gin ({column} gin_trgm_ops)'
+                    )
+
+    @staticmethod
+    def _create_gram_tables():
+        for entity, (table, gram_table, fk, _) in SearchService.ENTITIES.items():
+            db.execute(
+                f'''
+                CREATE TABLE IF NOT EXISTS {gram_table} (
+                    {fk} INT NOT NULL REFERENCES {table}(id) ON DELETE CASCADE,
+                    gram VARCHAR(8) NOT NULL,
+                    PRIMARY KEY (gram, {fk})
+                )
+                '''
+            )
+            db.execute(f'CREATE INDEX IF NOT EXISTS idx_{gram_table}_{fk} ON {gram_table}({fk})')
+
+            # Build the index once for databases that predate the gram table
+            indexed = db.fetch_one(f'SELECT 1 AS found FROM {gram_table} LIMIT 1')
+            populated = db.fetch_one(f'SELECT 1 AS found FROM {table} LIMIT 1')
+            if populated and not indexed:
+                SearchService._rebuild(entity)
+
+    @staticmethod
+    def backend() -> str:
+        """Get the active backend, detecting it from the database if needed."""
+        if SearchService._backend is None:
+            try:
+                if db.fetch_one("SELECT 1 AS found FROM pg_extension WHERE extname = 'pg_trgm'"):
+                    SearchService._backend = 'trgm'
+                elif db.fetch_one(
+                    "SELECT 1 AS found FROM information_schema.tables WHERE table_name = 'student_search_grams'"
+                ):
+                    SearchService._backend = 'ngram'
+                else:
+                    SearchService._backend = 'plain'
+            except Exception:
+                return 'plain'
+        return SearchService._backend
+
+    # ========== Index maintenance ========== #
+
+    @staticmethod
+    def reindex(entity: str, entity_id: Optional[int] = None):
+        """Refresh gram rows for one entity (or all when entity_id is None).
+
+        No-op unless the n-gram backend is active; pg_trgm indexes are
+        maintained by the database itself.
+        """
+        if SearchService.backend() != 'ngram':
+            return
+        SearchService._rebuild(entity, entity_id)
+
+    @staticmethod
+    def _rebuild(entity: str, entity_id: Optional[int] = None):
+        table, gram_table, fk, columns = SearchService.ENTITIES[entity]
+        where = ' WHERE id = %s' if entity_id is not None else ''
+        scope = ' WHERE {} = %s'.format(fk) if entity_id is not None else ''
+
+        sources = ' UNION ALL '.join(
+            f'SELECT id, LOWER({column}) AS val FROM {table}{where}' for column in columns
+        )
+        source_params = [entity_id] * len(columns) if entity_id is not None else []
+
+        with db.get_cursor() as cur:
+            cur.execute(f'DELETE FROM {gram_table}{scope}', [entity_id] if entity_id is not None else [])
+            cur.execute(
+                f'''
+                INSERT INTO {gram_table} ({fk}, gram)
+                SELECT DISTINCT v.id, SUBSTR(v.val, g.i, %s)
+                FROM ({sources}) v
+                JOIN generate_series(1, 256) AS g(i) ON g.i <= LENGTH(v.val) - %s + 1
+                ''',
+                [GRAM_SIZE] + source_params + [GRAM_SIZE]
+            )
+
+    # ========== Query building ========== #
+
+    @staticmethod
+    def keyword_filter(entity: str, keyword: str, alias: str,
+                       columns: Optional[Tuple[str, ...]] = None) -> Tuple[str, List[Any]]:
+        """Build an index-friendly WHERE fragment matching keyword as a substring.
+
+        Args:
+            entity: 'students' or 'courses'
+            keyword: User supplied keyword
+            alias: Table alias used in the surrounding query
+            columns: Subset of searchable columns to match (defaults to all)
+
+        Returns:
+            (sql_fragment, params) ready to be AND-ed into a query
+        """
+        _, gram_table, fk, searchable = SearchService.ENTITIES[entity]
+        columns = columns or searchable
+        pattern = f'%{_escape_like(keyword.lower())}%'
+
+        match_sql = '(' + ' OR '.join(f'LOWER({alias}.{c}) LIKE %s' for c in columns) + ')'
+        match_params: List[Any] = [pattern] * len(columns)
+
+        grams = _grams(keyword)
+        if SearchService.backend() != 'ngram' or not grams:
+            if SearchService.backend() == 'trgm':
+                # ILIKE on the raw column is what the gin_trgm_ops indexes serve
+                match_sql = '(' + ' OR '.join(f'{alias}.{c} ILIKE %s' for c in columns) + ')'
+            return match_sql, match_params
+
+        candidate_sql = (
+            f'{alias}.id IN (SELECT {fk} FROM {gram_table} WHERE gram = ANY(%s) '
+            f'GROUP BY {fk} HAVING COUNT(DISTINCT gram) = %s)'
+        )
+        return f'{candidate_sql} AND {match_sql}', [sorted(grams), len(grams)] + match_params
+
+    @staticmethod
+    def _rank_sql(alias: str, columns: Tuple[str, ...], keyword: str) -> Tuple[str, List[Any]]:
+        """ORDER BY fragment: exact match, then prefix match, then shortest value."""
+        lowered = keyword.lower()
+        prefix = f'{_escape_like(lowered)}%'
+        exact = ' OR '.join(f'LOWER({alias}.{c}) = %s' for c in columns)
+        starts = ' OR '.join(f'LOWER({alias}.{c}) LIKE %s' for c in columns)
+        sql = (
+            f'CASE WHEN {exact} THEN 0 WHEN {starts} THEN 1 ELSE 2 END, '
+            f'LENGTH({alias}.name), {alias}.id'
+        )
+        return sql, [lowered] * len(columns) + [prefix] * len(columns)
+
+    # ========== Search ========== #
+
+    @staticmethod
+    def search_students(keyword: str, limit: int = DEFAULT_LIMIT,
+                        major: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Ranked, limit-bounded student search by student_no or name."""
+        keyword = (keyword or '').strip()
+        if not keyword:
+            return []
+
+        where, params = SearchService.keyword_filter('students', keyword, 's')
+        sql = f'SELECT s.id, s.student_no, s.name, s.major, s.current_semester FROM students s WHERE {where}'
+        if major:
+            sql += ' AND s.major = %s'
+            params.append(major)
+
+        order_sql, order_params = SearchService._rank_sql('s', ('student_no', 'name'), keyword)
+        sql += f' ORDER BY {order_sql} LIMIT %s'
+        return db.fetch_all(sql, params + order_params + [_clamp_limit(limit)])
+
+    @staticmethod
+    def search_courses(keyword: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """Ranked, limit-bounded course search by course_code or name."""
+        keyword = (keyword or '').strip()
+        if not keyword:
+            return []
+
+        where, params = SearchService.keyword_filter('courses', keyword, 'c')
+        order_sql, order_params = SearchService._rank_sql('c', ('course_code', 'name'), keyword)
+        sql = f'''
+            SELECT c.id, c.course_code, c.name, c.credit, c.capacity, c.teacher_id,
+                   t.name AS teacher_name
+            FROM courses c
+            LEFT JOIN teachers t ON c.teacher_id = t.id
+            WHERE {where}
+            ORDER BY {order_sql}
+            LIMIT %s
+        '''
+        return db.fetch_all(sql, params + order_params + [_clamp_limit(limit)])
+
+
+def _grams(keyword: str) -> set:
+    """Split a keyword into the same lower-cased grams stored in the gram tables."""
+    value = (keyword or '').lower()
+    return {value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1)}
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _clamp_limit(limit: Any) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
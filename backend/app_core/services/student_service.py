@@ -4,6 +4,7 @@ Student service for student-related operations.
 from typing import List, Dict, Any, Optional
 
 from app_core.db import db
+from app_core.grading import final_grade_sql, grades_changed
 
 
 class StudentService:
@@ -80,15 +81,10 @@ class StudentService:
     def get_enrollments(student_id: int) -> List[Dict[str, Any]]:
         """Get student's enrollment records."""
         return db.fetch_all(
-            '''
+            f'''
             SELECT e.*, c.name AS course_name, c.course_code, c.credit,
                    t.name AS teacher_name,
-                   CASE 
-                       WHEN e.ordinary_score IS NOT NULL AND e.final_score IS NOT NULL THEN
-                           ROUND(CAST(e.ordinary_score * COALESCE(c.ordinary_weight, 0.5) + 
-                                 e.final_score * COALESCE(c.final_weight, 0.5) AS NUMERIC), 2)
-                       ELSE e.grade
-                   END AS final_grade
+                   {final_grade_sql()} AS final_grade
             FROM enrollments e
             JOIN courses c ON e.course_id = c.id
             LEFT JOIN teachers t ON c.teacher_id = t.id
@@ -148,10 +144,12 @@ class StudentService:
         if existing:
             raise ValueError('You are already enrolled in this course')
         
-        return db.execute_returning(
+        enrollment_id = db.execute_returning(
             'INSERT INTO enrollments (student_id, course_id, status) VALUES (%s, %s, %s) RETURNING id',
             [student_id, course_id, 'enrolled']
         )
+        grades_changed(student_ids=[student_id])
+        return enrollment_id
     
     @staticmethod
     def drop_course(student_id: int, enrollment_id: int) -> bool:
@@ -167,4 +165,5 @@ class StudentService:
             return False
         
         db.execute('DELETE FROM enrollments WHERE id=%s', [enrollment_id])
+        grades_changed(student_ids=[student_id])
         return True
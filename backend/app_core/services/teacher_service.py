@@ -5,8 +5,63 @@ from typing import List, Dict, Any, Optional
 from typing import Tuple
 from io import BytesIO
 from datetime import datetime
+from psycopg2.extras import execute_values
 from app_core.db import db
-from app_core.services.admin_service import AdminService
+from app_core.grading import weighted_grade_sql, final_grade_sql, grades_changed
+from app_core.metrics import timed_job
+from app_core.services.admin_service import AdminService, GRADE_BASELINE_SHEET
+from app_core.services.search_service import SearchService
+
+
+class GradeConflict(ValueError):
+    """Stored scores differ from the ones the client based its edit on."""
+
+    def __init__(self, current: Dict[str, Any]):
+        super().__init__('成绩已被他人修改，请重新导出后再录入')
+        self.current = current
+
+
+class _StaleBatch(Exception):
+    """Raised inside an atomic batch's transaction when some rows failed the version check."""
+
+    def __init__(self, matched: List[int]):
+        super().__init__('stale rows in atomic batch')
+        self.matched = matched
+
+
+def _cell(value: Any) -> Any:
+    """Normalise an Excel cell: blanks to None, whole floats to int, text stripped."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _score_key(value: Any) -> Optional[float]:
+    """Comparable form of a score cell (invalid text compares as itself)."""
+    if value is None or value == '':
+        return None
+    try:
+        return round(float(value), 1)
+    except (TypeError, ValueError):
+        return value
+
+
+def _sheet_records(sheet, aliases: Dict[str, str]):
+    """Yield one dict per data row of a read-only worksheet, keyed by (aliased) header."""
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    keys = [aliases.get(str(h).strip(), str(h).strip()) if h is not None else None for h in header]
+    for values in rows:
+        record = {key: _cell(value) for key, value in zip(keys, values) if key}
+        if 'student_no' in record and record['student_no'] is not None:
+            record['student_no'] = str(record['student_no'])
+        if any(value is not None for value in record.values()):
+            yield record
 
 
 class TeacherService:
@@ -40,10 +95,12 @@ class TeacherService:
             return None
         
         return db.fetch_all(
-            '''
-            SELECT e.*, s.name AS student_name, s.student_no, s.major
+            f'''
+            SELECT e.*, s.name AS student_name, s.student_no, s.major,
+                   {weighted_grade_sql()} AS final_grade
             FROM enrollments e
             JOIN students s ON e.student_id = s.id
+            JOIN courses c ON c.id = e.course_id
             WHERE e.course_id = %s
             ORDER BY s.student_no
             ''',
@@ -72,7 +129,8 @@ class TeacherService:
         if not enrollment or enrollment['teacher_id'] != teacher_id:
             return False
         
-        db.execute('UPDATE enrollments SET grade=%s WHERE id=%s', [grade, enrollment_id])
+        db.execute('UPDATE enrollments SET grade=%s, version = version + 1 WHERE id=%s', [grade, enrollment_id])
+        grades_changed(student_ids=[enrollment['student_id']])
         return True
 
     @staticmethod
@@ -100,9 +158,221 @@ class TeacherService:
         
         # Use AdminService for the actual update (same logic applies)
         return AdminService.update_student_grades(enrollment_id, payload)
-    
+
+    # ===== Bulk grade entry ===== #
+
+    SCORE_FIELDS = (('ordinary_score', '平时成绩'), ('final_score', '期末成绩'))
+
+    @staticmethod
+    def _parse_score(value: Any, label: str) -> Optional[float]:
+        if value is None or value == '':
+            return None
+        if isinstance(value, bool):
+            raise ValueError(f'{label}格式错误')
+        try:
+            score = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{label}格式错误: {value}')
+        if score != score or score < 0 or score > 100:  # NaN fails every comparison
+            raise ValueError(f'{label}必须在0-100之间')
+        return round(score, 1)
+
+    @staticmethod
+    def bulk_update_grades(teacher_id: int, course_id: int, rows: List[Dict[str, Any]],
+                           atomic: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Apply many grade rows for one course in a single UPDATE.
+
+        Each row names its enrollment by ``enrollment_id`` or ``student_no`` and
+        may carry ``ordinary_score`` / ``final_score``; an absent field keeps
+        the stored score, null or '' clears it. A row may also carry
+        ``expected`` (the scores the client last saw); if the stored scores
+        differ the row is a conflict and is not written. Invalid and
+        conflicting rows are reported in ``errors``; with ``atomic`` any error,
+        including a row changed between the read and the UPDATE, cancels the
+        batch (the UPDATE runs in one transaction that is rolled back).
+
+        Returns:
+            Summary dict, or None if the course does not exist or is not the teacher's
+        """
+        course = db.fetch_one('SELECT id, teacher_id FROM courses WHERE id=%s', [course_id])
+        if not course or course['teacher_id'] != teacher_id:
+            return None
+
+        current = db.fetch_all(
+            '''
+            SELECT e.id, e.version, s.student_no, e.ordinary_score, e.final_score
+            FROM enrollments e
+            JOIN students s ON e.student_id = s.id
+            WHERE e.course_id = %s
+            ''',
+            [course_id]
+        )
+        by_id = {row['id']: row for row in current}
+        by_student_no = {str(row['student_no']): row for row in current}
+
+        summary = {'updated': 0, 'unchanged': 0, 'errors': []}
+        values = []
+        seen = set()
+        for index, row in enumerate(rows, start=1):
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError('每行必须是对象')
+                if row.get('enrollment_id') not in (None, ''):
+                    try:
+                        existing = by_id.get(int(row['enrollment_id']))
+                    except (TypeError, ValueError):
+                        existing = None
+                else:
+                    existing = by_student_no.get(str(row.get('student_no', '')).strip())
+                if existing is None:
+                    raise ValueError('选课记录不存在或不属于该课程')
+                if existing['id'] in seen:
+                    raise ValueError('同一选课记录重复出现')
+                seen.add(existing['id'])
+
+                stored = [float(existing[f]) if existing[f] is not None else None
+                          for f, _ in TeacherService.SCORE_FIELDS]
+                expected = row.get('expected')
+                if expected is not None:
+                    if not isinstance(expected, dict):
+                        raise ValueError('expected必须是对象')
+                    seen_scores = [TeacherService._parse_score(expected.get(f), label)
+                                   for f, label in TeacherService.SCORE_FIELDS]
+                    if seen_scores != stored:
+                        raise GradeConflict(dict(zip((f for f, _ in TeacherService.SCORE_FIELDS), stored)))
+
+                scores = [
+                    TeacherService._parse_score(row[field], label) if field in row else kept
+                    for (field, label), kept in zip(TeacherService.SCORE_FIELDS, stored)
+                ]
+            except ValueError as exc:
+                error = {
+                    'row': index,
+                    'enrollment_id': row.get('enrollment_id') if isinstance(row, dict) else None,
+                    'student_no': row.get('student_no') if isinstance(row, dict) else None,
+                    'error': str(exc),
+                }
+                if isinstance(exc, GradeConflict):
+                    error.update(conflict=True, current=exc.current)
+                summary['errors'].append(error)
+                continue
+
+            if scores == stored:
+                summary['unchanged'] += 1
+                continue
+            values.append((existing['id'], *scores, existing['version']))
+
+        if not values or (atomic and summary['errors']):
+            return summary
+
+        sql = f'''
+            UPDATE enrollments AS e
+            SET ordinary_score = v.ordinary_score,
+                final_score = v.final_score,
+                version = e.version + 1
+            FROM (VALUES %s) AS v(id, ordinary_score, final_score, version)
+            WHERE e.id = v.id AND e.course_id = {int(course_id)}
+              -- rows changed since they were read are left alone
+              AND e.version = v.version
+            RETURNING e.id, e.student_id
+            '''
+        template = '(%s::int, %s::numeric, %s::numeric, %s::int)'
+        if atomic:
+            try:
+                with db.get_cursor() as cur:
+                    updated = execute_values(cur, sql, values, template=template, fetch=True)
+                    matched = {row['id'] for row in updated}
+                    if len(matched) != len(values):
+                        # Raising rolls back the rows that did match, so the batch stays all or nothing
+                        raise _StaleBatch(list(matched))
+            except _StaleBatch as exc:
+                updated, matched = [], set(exc.matched)
+        else:
+            updated = db.execute_values(sql, values, template=template)
+            matched = {row['id'] for row in updated}
+        summary['updated'] = len(updated)
+        if updated:
+            grades_changed(student_ids=[row['student_id'] for row in updated])
+        for value in values:
+            if value[0] not in matched:
+                summary['errors'].append({
+                    'row': None, 'enrollment_id': value[0], 'student_no': None,
+                    'error': '成绩已被他人修改，请刷新后重试', 'conflict': True,
+                })
+        return summary
+
     @staticmethod
-    def update_course_weights(teacher_id: int, course_id: int, ordinary_weight: float, final_weight: float) -> bool:
+    @timed_job('teacher_grade_import')
+    def import_course_grades(teacher_id: int, course_id: int, file_stream,
+                             atomic: bool = False) -> Optional[Dict[str, Any]]:
+        """Bulk grade entry from Excel, typically a filled-in grade export.
+
+        Reads sheet '成绩名单' (or the first sheet) with columns
+        学号/student_no, 平时成绩/ordinary_score, 期末成绩/final_score.
+
+        When the workbook carries the export's hidden baseline sheet, only
+        rows whose scores were edited are sent, an emptied cell clears the
+        score, and a row whose stored scores changed since the export is
+        reported as a conflict instead of being overwritten. Without a
+        baseline, empty cells keep the stored score.
+        """
+        from openpyxl import load_workbook  # streamed read; pandas is not needed here
+        try:
+            workbook = load_workbook(file_stream, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ValueError(f"无法读取Excel文件: {exc}")
+
+        try:
+            sheet = workbook['成绩名单'] if '成绩名单' in workbook.sheetnames else workbook.worksheets[0]
+            records = list(_sheet_records(sheet, {
+                '学号': 'student_no', '平时成绩': 'ordinary_score', '期末成绩': 'final_score',
+            }))
+            baseline = None
+            if GRADE_BASELINE_SHEET in workbook.sheetnames:
+                baseline = {
+                    record['student_no']: record
+                    for record in _sheet_records(workbook[GRADE_BASELINE_SHEET], {})
+                    if record.get('student_no') is not None
+                }
+        finally:
+            workbook.close()
+
+        if records and 'student_no' not in records[0]:
+            raise ValueError("成绩表需包含 '学号' 列")
+        fields = [f for f, _ in TeacherService.SCORE_FIELDS if records and f in records[0]]
+        if records and not fields:
+            raise ValueError("成绩表需包含 '平时成绩' 或 '期末成绩' 列")
+
+        rows = []
+        unedited = 0
+        for record in records:
+            if record.get('student_no') is None:
+                continue
+            exported = baseline.get(record['student_no']) if baseline is not None else None
+            if exported is None:
+                rows.append({'student_no': record['student_no'],
+                             **{f: record[f] for f in fields if record.get(f) is not None}})
+                continue
+            edited = {f: record.get(f) for f in fields
+                      if _score_key(record.get(f)) != _score_key(exported.get(f))}
+            if not edited:
+                unedited += 1
+                continue
+            rows.append({
+                'student_no': record['student_no'],
+                **edited,
+                'expected': {f: exported.get(f) for f, _ in TeacherService.SCORE_FIELDS},
+            })
+
+        summary = TeacherService.bulk_update_grades(teacher_id, course_id, rows, atomic=atomic)
+        if summary is not None:
+            summary['unchanged'] += unedited
+        return summary
+
+    @staticmethod
+    def update_course_weights(teacher_id: int, course_id: int, ordinary_weight: float, final_weight: float,
+                              expected_version: Optional[int] = None) -> bool:
         """Update course grade weights (only if teacher teaches the course).
         
         Args:
@@ -110,9 +380,13 @@ class TeacherService:
             course_id: The course ID to update
             ordinary_weight: 平时成绩占比 (0-1)
             final_weight: 期末成绩占比 (0-1)
+            expected_version: 客户端读到的课程版本（可选）
         
         Returns:
             bool: True if update successful, False if access denied
+        
+        Raises:
+            VersionConflict: If ``expected_version`` is given and the course has changed since
         """
         # Verify teacher teaches this course
         course = db.fetch_one("SELECT * FROM courses WHERE id=%s", [course_id])
@@ -120,25 +394,29 @@ class TeacherService:
             return False
         
         # Use AdminService for the actual update
-        return AdminService.update_course_weights(course_id, ordinary_weight, final_weight)
+        return AdminService.update_course_weights(course_id, ordinary_weight, final_weight, expected_version)
 
     @staticmethod
     def get_course_stats(teacher_id: int) -> List[Dict[str, Any]]:
         """Get per-course stats (avg, pass, excellent) for courses taught by the teacher."""
+        from app_core.analytics import analytics  # local import: NumPy loads on first dashboard use
+        stats = analytics.course_stats(teacher_id=teacher_id)
+        if stats is not None:
+            return stats[::-1]
         return db.fetch_all(
-            '''
+            f'''
             SELECT 
                 c.id,
                 c.name,
                 c.course_code,
                 COUNT(e.id) AS enrolled_count,
-                ROUND(AVG(COALESCE(e.final_grade, e.grade))::numeric, 2) AS avg_grade,
+                ROUND(AVG({final_grade_sql()})::numeric, 2) AS avg_grade,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 60 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 60 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS pass_rate,
                 ROUND(
-                    (SUM(CASE WHEN COALESCE(e.final_grade, e.grade) >= 90 THEN 1 ELSE 0 END)::numeric
+                    (SUM(CASE WHEN {final_grade_sql()} >= 90 THEN 1 ELSE 0 END)::numeric
                         / NULLIF(COUNT(e.id), 0)) * 100, 2
                 ) AS excellent_rate
             FROM courses c
@@ -150,8 +428,18 @@ class TeacherService:
             [teacher_id]
         )
 
+    @staticmethod
+    def get_course_distribution(teacher_id: int, course_id: int, bins: int = 10, term: Optional[str] = None,
+                                compare: bool = False) -> Optional[Dict[str, Any]]:
+        """Grade distributions of a course the teacher teaches, or None."""
+        course = db.fetch_one('SELECT id, teacher_id FROM courses WHERE id=%s', [course_id])
+        if not course or course['teacher_id'] != teacher_id:
+            return None
+        return AdminService.get_distribution('course', course_id, bins, term, compare)
+
     # ===== Export ===== #
     @staticmethod
+    @timed_job('teacher_export')
     def export_course_grades(teacher_id: int, course_id: int) -> Tuple[Any, Any]:
         """Export grades for a course taught by the teacher."""
         course = db.fetch_one('SELECT id, teacher_id FROM courses WHERE id=%s', [course_id])
@@ -187,6 +475,7 @@ class TeacherService:
 
     # ===== Import roster (teacher) ===== #
     @staticmethod
+    @timed_job('teacher_import')
     def import_course_roster(teacher_id: int, file_stream) -> Dict[str, Any]:
         """Teacher imports a course roster Excel and binds it to themselves."""
         import pandas as pd  # local import to avoid heavy module at import time
@@ -246,9 +535,10 @@ class TeacherService:
         if existing:
             course_id = existing['id']
             db.execute(
-                'UPDATE courses SET name=%s, credit=%s, capacity=%s, teacher_id=%s WHERE id=%s',
+                'UPDATE courses SET name=%s, credit=%s, capacity=%s, teacher_id=%s, version = version + 1 WHERE id=%s',
                 [course_name, credit, capacity, teacher_id, course_id]
             )
+            SearchService.reindex('courses', course_id)
             summary['course_updated'] += 1
         else:
             course_id = AdminService.create_course(course_code, course_name, credit, capacity, teacher_id)
@@ -258,6 +548,7 @@ class TeacherService:
         student_map = {row['student_no']: row['id'] for row in db.fetch_all('SELECT id, student_no FROM students')}
 
         students_df = workbook.parse('students').fillna('')
+        enrolled_students = []
         for _, row in students_df.iterrows():
             student_no = str(row.get('student_no', '')).strip()
             if not student_no:
@@ -285,7 +576,10 @@ class TeacherService:
                 [student_id, course_id, 'enrolled']
             )
             summary['enrollments_created'] += 1
+            enrolled_students.append(student_id)
 
+        # An existing course may have a new credit, which moves every enrolled student's GPA
+        grades_changed(student_ids=enrolled_students, course_ids=[course_id] if existing else ())
         summary['course_id'] = course_id
         summary['course_code'] = course_code
         summary['course_name'] = course_name
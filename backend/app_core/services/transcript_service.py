@@ -0,0 +1,232 @@
+"""
+Transcript service: credit-weighted GPA and earned credits per student.
+
+Per-student totals live in ``student_gpa`` and per-term totals in
+``student_term_gpa``. They are materialised with one set-based statement per
+table: a full rebuild at startup when empty, then only for the students named
+by ``grades_changed`` (a course-level change refreshes everyone enrolled in
+the course). Final grades and grade points come from app_core.grading, terms
+from app_core.terms, so the transcript agrees with every other read path.
+Consumers of the aggregates register with ``on_gpa_changed`` and are called
+right after each refresh, so they never read stale rows.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from app_core.db import db
+from app_core.grading import PASSING_GRADE, final_grade_sql, grade_point_sql, on_grades_changed
+from app_core.terms import term_sql
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptService:
+    """Service for transcripts and materialised GPA aggregates."""
+
+    # ========== Schema ========== #
+
+    @staticmethod
+    def init_transcript_schema() -> bool:
+        """Create the aggregate tables and fill them on first start."""
+        try:
+            with db.get_cursor(autocommit=True) as cur:
+                cur.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS student_gpa (
+                        student_id INT PRIMARY KEY REFERENCES students(id) ON DELETE CASCADE,
+                        graded_courses INT NOT NULL DEFAULT 0,
+                        attempted_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        earned_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        gpa NUMERIC(3,2),
+                        weighted_average NUMERIC(5,2),
+                        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+                    )
+                    '''
+                )
+                cur.execute(
+                    '''
+                    CREATE TABLE IF NOT EXISTS student_term_gpa (
+                        student_id INT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+                        term VARCHAR(8) NOT NULL,
+                        graded_courses INT NOT NULL DEFAULT 0,
+                        attempted_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        earned_credits NUMERIC(6,1) NOT NULL DEFAULT 0,
+                        gpa NUMERIC(3,2),
+                        weighted_average NUMERIC(5,2),
+                        PRIMARY KEY (student_id, term)
+                    )
+                    '''
+                )
+            if not db.fetch_one('SELECT 1 AS present FROM student_gpa LIMIT 1'):
+                TranscriptService.refresh()
+            logger.info("✅ Transcript aggregates ready")
+            return True
+        except Exception as exc:
+            logger.warning(f"⚠️ Transcript aggregates unavailable: {exc}")
+            return False
+
+    # ========== Maintenance ========== #
+
+    @staticmethod
+    def _graded_rows_sql(scope: str) -> str:
+        """One row per graded enrollment in ``scope`` with its credit, final grade, grade point and term."""
+        return f'''
+            SELECT e.student_id,
+                   {term_sql('e.enrolled_at')} AS term,
+                   COALESCE(c.credit, 0) AS credit,
+                   {final_grade_sql()} AS grade,
+                   {grade_point_sql(final_grade_sql())} AS point
+            FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
+            WHERE {scope}
+        '''
+
+    @staticmethod
+    def _totals_sql() -> str:
+        """Aggregate columns over ``_graded_rows_sql`` rows aliased ``g``."""
+        return f'''
+            COUNT(*),
+            SUM(g.credit),
+            SUM(CASE WHEN g.grade >= {PASSING_GRADE} THEN g.credit ELSE 0 END),
+            ROUND(SUM(g.point * g.credit) / NULLIF(SUM(g.credit), 0), 2),
+            ROUND(SUM(g.grade * g.credit) / NULLIF(SUM(g.credit), 0), 2)
+        '''
+
+    @staticmethod
+    def _scope(student_ids: Optional[Sequence[int]], course_ids: Optional[Sequence[int]]) -> Tuple[str, List[Any]]:
+        if student_ids is None and course_ids is None:
+            return 'TRUE', []
+        clauses, params = [], []
+        if student_ids:
+            clauses.append('{col} = ANY(%s)')
+            params.append(list(student_ids))
+        if course_ids:
+            clauses.append('{col} IN (SELECT student_id FROM enrollments WHERE course_id = ANY(%s))')
+            params.append(list(course_ids))
+        return ' OR '.join(clauses) or 'FALSE', params
+
+    @staticmethod
+    def refresh(student_ids: Optional[Sequence[int]] = None, course_ids: Optional[Sequence[int]] = None):
+        """Recompute the aggregates of the given students / courses' students (everyone when both are None)."""
+        scope, params = TranscriptService._scope(student_ids, course_ids)
+        rows_sql = TranscriptService._graded_rows_sql(scope.format(col='e.student_id'))
+        totals = TranscriptService._totals_sql()
+        # The same scope drives the deletes and the inserts, so a student whose
+        # last graded row went away is cleared rather than left stale
+        target = scope.format(col='student_id')
+        with db.get_cursor() as cur:
+            cur.execute(f'DELETE FROM student_term_gpa WHERE {target}', params)
+            cur.execute(
+                f'''
+                INSERT INTO student_term_gpa
+                    (student_id, term, graded_courses, attempted_credits, earned_credits, gpa, weighted_average)
+                SELECT g.student_id, g.term, {totals}
+                FROM ({rows_sql}) g
+                WHERE g.grade IS NOT NULL
+                GROUP BY g.student_id, g.term
+                ''',
+                params
+            )
+            cur.execute(f'DELETE FROM student_gpa WHERE {target}', params)
+            cur.execute(
+                f'''
+                INSERT INTO student_gpa
+                    (student_id, graded_courses, attempted_credits, earned_credits, gpa, weighted_average)
+                SELECT g.student_id, {totals}
+                FROM ({rows_sql}) g
+                WHERE g.grade IS NOT NULL
+                GROUP BY g.student_id
+                ''',
+                params
+            )
+
+    # ========== Reads ========== #
+
+    @staticmethod
+    def get_transcripts(student_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Transcripts of many students with three queries in total, in ``student_ids`` order."""
+        student_ids = list(dict.fromkeys(int(s) for s in student_ids))
+        if not student_ids:
+            return []
+        students = db.fetch_all(
+            '''
+            SELECT s.id, s.student_no, s.name, s.major, s.current_semester,
+                   COALESCE(g.graded_courses, 0) AS graded_courses,
+                   COALESCE(g.attempted_credits, 0) AS attempted_credits,
+                   COALESCE(g.earned_credits, 0) AS earned_credits,
+                   g.gpa, g.weighted_average
+            FROM students s
+            LEFT JOIN student_gpa g ON g.student_id = s.id
+            WHERE s.id = ANY(%s)
+            ''',
+            [student_ids]
+        )
+        terms = db.fetch_all(
+            '''
+            SELECT student_id, term, graded_courses, attempted_credits, earned_credits, gpa, weighted_average
+            FROM student_term_gpa
+            WHERE student_id = ANY(%s)
+            ORDER BY student_id, term
+            ''',
+            [student_ids]
+        )
+        courses = db.fetch_all(
+            f'''
+            SELECT e.student_id, e.id AS enrollment_id, {term_sql('e.enrolled_at')} AS term,
+                   c.id AS course_id, c.course_code, c.name AS course_name, c.credit,
+                   e.status, e.ordinary_score, e.final_score,
+                   {final_grade_sql()} AS final_grade,
+                   {grade_point_sql(final_grade_sql())} AS grade_point
+            FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
+            WHERE e.student_id = ANY(%s)
+            ORDER BY e.student_id, e.enrolled_at, c.course_code
+            ''',
+            [student_ids]
+        )
+
+        by_student: Dict[int, Dict[str, Any]] = {}
+        for row in students:
+            summary = {k: row[k] for k in ('graded_courses', 'attempted_credits', 'earned_credits',
+                                           'gpa', 'weighted_average')}
+            by_student[row['id']] = {
+                'student': {k: row[k] for k in ('id', 'student_no', 'name', 'major', 'current_semester')},
+                'summary': summary,
+                'terms': [],
+                'courses': [],
+            }
+        for row in terms:
+            by_student[row['student_id']]['terms'].append({k: v for k, v in row.items() if k != 'student_id'})
+        for row in courses:
+            by_student[row['student_id']]['courses'].append({k: v for k, v in row.items() if k != 'student_id'})
+        return [by_student[s] for s in student_ids if s in by_student]
+
+    @staticmethod
+    def get_transcript(student_id: int) -> Optional[Dict[str, Any]]:
+        transcripts = TranscriptService.get_transcripts([student_id])
+        return transcripts[0] if transcripts else None
+
+    @staticmethod
+    def get_major_transcripts(major: str) -> List[Dict[str, Any]]:
+        """Transcripts of every student in ``major``, ordered by student number."""
+        rows = db.fetch_all('SELECT id FROM students WHERE major = %s ORDER BY student_no', [major])
+        return TranscriptService.get_transcripts(row['id'] for row in rows)
+
+
+_gpa_listeners: List[Callable[..., None]] = []
+
+
+def on_gpa_changed(listener: Callable[..., None]) -> Callable[..., None]:
+    """Register ``listener(student_ids=..., course_ids=...)`` to run once ``student_gpa`` is refreshed."""
+    _gpa_listeners.append(listener)
+    return listener
+
+
+@on_grades_changed
+def _refresh_transcripts(student_ids: Sequence[int] = (), course_ids: Sequence[int] = ()):
+    TranscriptService.refresh(student_ids or None, course_ids or None)
+    for listener in list(_gpa_listeners):
+        try:
+            listener(student_ids=student_ids, course_ids=course_ids)
+        except Exception as exc:
+            logger.warning(f"⚠️ GPA change listener {getattr(listener, '__qualname__', listener)} failed: {exc}")
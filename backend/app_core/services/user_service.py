@@ -2,9 +2,15 @@
 User service for authentication and user management.
 """
 from typing import Optional, Dict, Any
-from flask import session
+from flask import current_app, session
+from app_core.config import Config
+from app_core.credentials import PASSWORD_REHASHES, CredentialsBusy, needs_rehash, verifier
 from app_core.db import db
-from app_core.utils import hash_password
+from app_core.sessions import regenerate_session
+from app_core.utils.cache import TTLCache
+
+# user_id -> {'ref_id': ..., 'info': get_user_info(...)}
+principal_cache = TTLCache('principal', ttl=Config.PRINCIPAL_CACHE_TTL)
 
 
 class UserService:
@@ -17,17 +23,32 @@ class UserService:
         
         Returns:
             User information dict if successful, None otherwise
+        
+        Raises:
+            CredentialsBusy: If the verification queue is full
         """
-        hashed_password = hash_password(password)
         user = db.fetch_one(
-            "SELECT * FROM users WHERE username=%s AND password=%s",
-            [username, hashed_password]
+            "SELECT id, username, password, role, ref_id FROM users WHERE username=%s",
+            [username]
         )
         
         if not user:
+            # Same KDF cost as a wrong password, so response time does not reveal valid usernames
+            verifier.verify(verifier.dummy_hash(), password)
+            return None
+        if not verifier.verify(user['password'], password):
             return None
         
-        # Set session
+        # Upgrade legacy SHA-256 / low-iteration hashes transparently
+        if needs_rehash(user['password'], verifier.iterations):
+            try:
+                db.execute("UPDATE users SET password=%s WHERE id=%s", [verifier.hash(password), user['id']])
+                PASSWORD_REHASHES.inc()
+            except CredentialsBusy:
+                pass  # retried on a later login
+        
+        # Set session, under a fresh id so a pre-login session id cannot be fixed
+        regenerate_session(current_app)
         session['user_id'] = user['id']
         session['username'] = user['username']
         session['role'] = user['role']
@@ -58,17 +79,40 @@ class UserService:
         
         return user_info
     
+    @staticmethod
+    def get_principal(user_id: int) -> Optional[Dict[str, Any]]:
+        """Resolved user (role, ref_id, display info), served from principal_cache."""
+        def load():
+            user = db.fetch_one("SELECT id, username, role, ref_id FROM users WHERE id=%s", [user_id])
+            if not user:
+                return None
+            return {'ref_id': user['ref_id'], 'info': UserService.get_user_info(user)}
+        
+        return principal_cache.get_or_load(user_id, load)
+    
+    @staticmethod
+    def invalidate_principal(user_id: int):
+        """Drop a cached principal (password change, account update)."""
+        principal_cache.invalidate(user_id)
+    
+    @staticmethod
+    def invalidate_principals_for(role: str, ref_id: int):
+        """Drop cached principals linked to a student/teacher record."""
+        principal_cache.invalidate_if(
+            lambda _, p: p['info']['role'] == role and p['ref_id'] == ref_id
+        )
+    
     @staticmethod
     def get_current_user() -> Optional[Dict[str, Any]]:
         """Get current logged-in user information."""
         if 'user_id' not in session:
             return None
         
-        user = db.fetch_one("SELECT * FROM users WHERE id=%s", [session['user_id']])
-        if not user:
+        principal = UserService.get_principal(session['user_id'])
+        if not principal:
             return None
         
-        return UserService.get_user_info(user)
+        return dict(principal['info'])
     
     @staticmethod
     def change_password(user_id: int, old_password: str, new_password: str) -> bool:
@@ -78,26 +122,24 @@ class UserService:
         Returns:
             True if successful, False if old password is incorrect
         """
-        user = db.fetch_one(
-            "SELECT * FROM users WHERE id=%s AND password=%s",
-            [user_id, hash_password(old_password)]
-        )
+        user = db.fetch_one("SELECT password FROM users WHERE id=%s", [user_id])
         
-        if not user:
+        if not user or not verifier.verify(user['password'], old_password):
             return False
         
         db.execute(
             "UPDATE users SET password=%s WHERE id=%s",
-            [hash_password(new_password), user_id]
+            [verifier.hash(new_password), user_id]
         )
+        UserService.invalidate_principal(user_id)
         return True
     
     @staticmethod
     def create_user(username: str, password: str, role: str, ref_id: Optional[int] = None) -> int:
-        """Create a new user account."""
+        """Create a new user account with a PBKDF2 password hash."""
         user_id = db.execute_returning(
             "INSERT INTO users (username, password, role, ref_id) VALUES (%s, %s, %s, %s) RETURNING id",
-            [username, hash_password(password), role, ref_id]
+            [username, verifier.hash(password), role, ref_id]
         )
         return user_id
     
@@ -0,0 +1,355 @@
+"""
+Pluggable session backends (Config.SESSION_BACKEND).
+
+- filesystem: Flask-Session files under SESSION_FILE_DIR (default); a
+  background janitor removes files older than SESSION_FILE_MAX_AGE
+- cookie: signed, stateless cookies carrying user_id/username/role/ref_id.
+  No server I/O per request and works across hosts; logout and password
+  changes are enforced through a revocation list kept in the database
+- sqlite: server-side sessions in a WAL-mode SQLite file shared by all
+  workers on one host; the cookie only holds a signed session id
+
+Both signed backends refuse to start without a real SECRET_KEY: with the
+public default anyone could sign a session of their choosing.
+"""
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import session
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+from app_core.config import DEFAULT_SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+
+# ========== Revocation (cookie backend) ========== #
+
+class RevocationList:
+    """Revoked session ids and per-user cut-off times, stored in the database.
+
+    Lookups hit an in-process snapshot that is reloaded at most every
+    ``refresh_interval`` seconds, so a request costs no query.
+    """
+
+    def __init__(self, refresh_interval: float = 5.0):
+        self.refresh_interval = refresh_interval
+        self._sids: Dict[str, float] = {}
+        self._users: Dict[str, float] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def init_schema():
+        from app_core.db import db
+        db.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS session_revocations (
+                key VARCHAR(80) PRIMARY KEY,
+                revoked_at DOUBLE PRECISION NOT NULL,
+                expires_at DOUBLE PRECISION NOT NULL
+            )
+            '''
+        )
+
+    def _refresh(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._loaded_at < self.refresh_interval:
+            return
+        from app_core.db import db
+        rows = db.fetch_all(
+            'SELECT key, revoked_at FROM session_revocations WHERE expires_at > %s', [now]
+        )
+        sids, users = {}, {}
+        for row in rows:
+            kind, _, value = row['key'].partition(':')
+            (users if kind == 'user' else sids)[value] = row['revoked_at']
+        with self._lock:
+            self._sids, self._users, self._loaded_at = sids, users, now
+
+    def is_revoked(self, sid: Optional[str], user_id, issued_at: float) -> bool:
+        self._refresh()
+        if sid and sid in self._sids:
+            return True
+        cutoff = self._users.get(str(user_id))
+        return cutoff is not None and issued_at < cutoff
+
+    def _store(self, key: str, ttl: float):
+        from app_core.db import db
+        now = time.time()
+        db.execute(
+            '''
+            INSERT INTO session_revocations (key, revoked_at, expires_at) VALUES (%s, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET revoked_at = EXCLUDED.revoked_at, expires_at = EXCLUDED.expires_at
+            ''',
+            [key, now, now + ttl]
+        )
+        self._refresh(force=True)
+        return now
+
+    def revoke_sid(self, sid: str, ttl: float):
+        self._store(f'sid:{sid}', ttl)
+
+    def revoke_user(self, user_id, ttl: float) -> float:
+        """Invalidate every session of ``user_id`` issued before now; returns the cut-off."""
+        return self._store(f'user:{user_id}', ttl)
+
+    def purge(self):
+        from app_core.db import db
+        db.execute('DELETE FROM session_revocations WHERE expires_at <= %s', [time.time()])
+
+
+class RevocableCookieSessionInterface(SecureCookieSessionInterface):
+    """Signed cookie sessions that carry a session id and issue time."""
+
+    def __init__(self, revocations: RevocationList):
+        self.revocations = revocations
+
+    def open_session(self, app, request):
+        sess = super().open_session(app, request)
+        if sess is not None and 'user_id' in sess and self.revocations.is_revoked(
+                sess.get('sid'), sess['user_id'], sess.get('iat', 0)):
+            return self.session_class()
+        return sess
+
+    def save_session(self, app, sess, response):
+        if 'user_id' in sess and 'sid' not in sess:
+            sess['sid'] = secrets.token_urlsafe(12)
+            sess['iat'] = time.time()
+        super().save_session(app, sess, response)
+
+
+# ========== SQLite server-side sessions ========== #
+
+class SQLiteSession(SecureCookieSession):
+    """Session dict that remembers its server-side id."""
+
+    def __init__(self, initial=None, sid: Optional[str] = None):
+        super().__init__(initial)
+        self.sid = sid
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """Server-side sessions in a SQLite file (WAL) shared by local workers."""
+
+    session_class = SQLiteSession
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY,
+                user_id TEXT,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            '''
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _signer(self, app) -> Signer:
+        return Signer(app.secret_key, salt='sqlite-session')
+
+    def open_session(self, app, request):
+        token = request.cookies.get(self.get_cookie_name(app))
+        if token:
+            try:
+                sid = self._signer(app).unsign(token).decode('utf-8')
+            except BadSignature:
+                sid = None
+            if sid:
+                row = self._connect().execute(
+                    'SELECT data FROM sessions WHERE sid = ? AND expires_at > ?', [sid, time.time()]
+                ).fetchone()
+                if row:
+                    return self.session_class(json.loads(row[0]), sid=sid)
+        return self.session_class()
+
+    def save_session(self, app, sess, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not sess:
+            if sess.modified and sess.sid:
+                self._connect().execute('DELETE FROM sessions WHERE sid = ?', [sess.sid])
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not sess.modified:
+            return
+
+        sid = sess.sid or secrets.token_urlsafe(24)
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self._connect().execute(
+            'INSERT OR REPLACE INTO sessions (sid, user_id, data, expires_at) VALUES (?, ?, ?, ?)',
+            [sid, str(sess.get('user_id', '')), json.dumps(dict(sess)), time.time() + lifetime]
+        )
+        response.set_cookie(
+            name,
+            self._signer(app).sign(sid).decode('utf-8'),
+            expires=self.get_expiration_time(app, sess),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def revoke_sid(self, sid: str):
+        self._connect().execute('DELETE FROM sessions WHERE sid = ?', [sid])
+
+    def revoke_user(self, user_id, keep_sid: Optional[str] = None):
+        self._connect().execute(
+            'DELETE FROM sessions WHERE user_id = ? AND sid IS NOT ?', [str(user_id), keep_sid]
+        )
+
+    def purge(self):
+        self._connect().execute('DELETE FROM sessions WHERE expires_at <= ?', [time.time()])
+
+
+# ========== Filesystem janitor ========== #
+
+def evict_stale_session_files(directory: str, max_age: float) -> int:
+    """Delete Flask-Session files not modified for ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        # cachelib keeps its file count in a bookkeeping file
+        if entry.name.startswith('__wz_cache') or not entry.is_file():
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class SessionJanitor:
+    """Daemon thread running a cleanup callable at a fixed interval."""
+
+    def __init__(self, cleanup, interval: float):
+        self.cleanup = cleanup
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='session-janitor', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.cleanup()
+            except Exception as exc:  # keep the janitor alive
+                logger.warning(f"⚠️ Session cleanup failed: {exc}")
+
+
+# ========== Setup and helpers ========== #
+
+_revocations: Optional[RevocationList] = None
+_janitor: Optional[SessionJanitor] = None
+
+
+def init_sessions(app):
+    """Install the session backend selected by SESSION_BACKEND."""
+    global _revocations, _janitor
+    backend = app.config.get('SESSION_BACKEND', 'filesystem')
+    interval = app.config.get('SESSION_JANITOR_INTERVAL', 300)
+
+    if backend in ('cookie', 'sqlite') and app.secret_key in (None, '', DEFAULT_SECRET_KEY):
+        raise RuntimeError(f'SESSION_BACKEND={backend} signs session cookies; set SECRET_KEY in .env')
+
+    if backend == 'cookie':
+        RevocationList.init_schema()
+        _revocations = RevocationList()
+        app.session_interface = RevocableCookieSessionInterface(_revocations)
+        cleanup = _revocations.purge
+    elif backend == 'sqlite':
+        app.session_interface = SQLiteSessionInterface(app.config['SESSION_SQLITE_PATH'])
+        cleanup = app.session_interface.purge
+    else:
+        from flask_session import Session
+        Session(app)
+        directory = app.config['SESSION_FILE_DIR']
+        max_age = app.config.get('SESSION_FILE_MAX_AGE', 86400)
+        cleanup = lambda: evict_stale_session_files(directory, max_age)  # noqa: E731
+
+    if _janitor is None and interval:
+        _janitor = SessionJanitor(cleanup, interval)
+        _janitor.start()
+    logger.info(f"✅ Session backend: {backend}")
+
+
+def revoke_current_session(app):
+    """Make the current session unusable everywhere (call before session.clear())."""
+    interface = app.session_interface
+    lifetime = app.permanent_session_lifetime.total_seconds()
+    if isinstance(interface, RevocableCookieSessionInterface) and session.get('sid'):
+        interface.revocations.revoke_sid(session['sid'], lifetime)
+    elif isinstance(interface, SQLiteSessionInterface) and getattr(session, 'sid', None):
+        interface.revoke_sid(session.sid)
+
+
+def regenerate_session(app):
+    """Drop the current session and continue under a new id (call on login, before
+    storing the new identity), so an id planted before the login never becomes
+    an authenticated session."""
+    interface = app.session_interface
+    lifetime = app.permanent_session_lifetime.total_seconds()
+    if isinstance(interface, RevocableCookieSessionInterface):
+        if 'user_id' in session and session.get('sid'):
+            interface.revocations.revoke_sid(session['sid'], lifetime)
+    elif isinstance(interface, SQLiteSessionInterface):
+        if session.sid:
+            interface.revoke_sid(session.sid)
+            session.sid = None
+    elif getattr(session, 'sid', None) and hasattr(interface, '_generate_sid'):
+        # Flask-Session filesystem store
+        interface.cache.delete(interface.key_prefix + session.sid)
+        session.sid = interface._generate_sid()
+    # Also removes the cookie backend's sid/iat, so save_session issues new ones
+    session.clear()
+
+
+def revoke_user_sessions(app, user_id, keep_current: bool = True):
+    """Log ``user_id`` out of every session (e.g. after a password change)."""
+    interface = app.session_interface
+    lifetime = app.permanent_session_lifetime.total_seconds()
+    if isinstance(interface, RevocableCookieSessionInterface):
+        cutoff = interface.revocations.revoke_user(user_id, lifetime)
+        if keep_current and session.get('user_id') == user_id:
+            # Re-issue the current cookie after the cut-off
+            session['sid'] = secrets.token_urlsafe(12)
+            session['iat'] = max(time.time(), cutoff + 1e-6)
+    elif isinstance(interface, SQLiteSessionInterface):
+        keep = getattr(session, 'sid', None) if keep_current else None
+        interface.revoke_user(user_id, keep_sid=keep)
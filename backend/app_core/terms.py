@@ -0,0 +1,46 @@
+"""
+Academic terms derived from ``enrolled_at``.
+
+Enrollments carry no term column, so the term is the half-year the student
+enrolled in: autumn runs August-January, spring February-July. Labels look
+like '2025秋' / '2025春' and sort chronologically as text; ``term_index``
+gives the same order as integers for in-memory arrays.
+"""
+from typing import Optional
+
+
+def term_index(enrolled_at) -> int:
+    """Half-year term of an enrolment as ``year * 2 (+1 for autumn)`` (-1 if unknown)."""
+    if enrolled_at is None:
+        return -1
+    year, month = enrolled_at.year, enrolled_at.month
+    if month >= 8:
+        return year * 2 + 1
+    if month >= 2:
+        return year * 2
+    return (year - 1) * 2 + 1
+
+
+def term_label(index: int) -> Optional[str]:
+    if index < 0:
+        return None
+    return f"{index // 2}{'秋' if index % 2 else '春'}"
+
+
+def parse_term(label: str) -> int:
+    """Inverse of ``term_label`` ('2025秋' / '2025春')."""
+    label = (label or '').strip()
+    if len(label) != 5 or not label[:4].isdigit() or label[4] not in '春秋':
+        raise ValueError('term格式应为如 2025秋 / 2025春')
+    return int(label[:4]) * 2 + (1 if label[4] == '秋' else 0)
+
+
+def term_sql(column: str = 'e.enrolled_at') -> str:
+    """SQL expression giving ``term_label`` of a timestamp column."""
+    month = f'EXTRACT(MONTH FROM {column})'
+    year = f'EXTRACT(YEAR FROM {column})::int'
+    return (
+        f"(CASE WHEN {month} >= 8 THEN {year}::text || '秋' "
+        f"WHEN {month} >= 2 THEN {year}::text || '春' "
+        f"ELSE ({year} - 1)::text || '秋' END)"
+    )
@@ -0,0 +1,255 @@
+"""
+Tests for the in-memory enrollment analytics snapshot.
+"""
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from app_core.analytics import DECILES, EnrollmentAnalytics, distribution_from_rows
+from app_core.config import Config
+from app_core.grading import compute_final_grade, final_grade_array
+from app_core.terms import parse_term, term_index, term_label
+
+T0 = datetime(2025, 9, 1, 8, 0, 0)
+
+
+class FakeDB:
+    """Answers the snapshot's queries from in-memory tables and records them."""
+
+    def __init__(self):
+        self.courses = [
+            {'id': 1, 'name': '数据库', 'course_code': 'C1', 'teacher_id': 10,
+             'ordinary_weight': Decimal('0.40'), 'final_weight': Decimal('0.60')},
+            {'id': 2, 'name': '操作系统', 'course_code': 'C2', 'teacher_id': 11,
+             'ordinary_weight': None, 'final_weight': None},
+            {'id': 3, 'name': '编译原理', 'course_code': 'C3', 'teacher_id': 10,
+             'ordinary_weight': Decimal('0.50'), 'final_weight': Decimal('0.50')},
+        ]
+        self.teachers = [{'id': 10, 'name': '王老师'}, {'id': 11, 'name': '李老师'}]
+        self.students = [{'id': 1, 'major': '计算机'}, {'id': 2, 'major': '软件工程'}, {'id': 3, 'major': '计算机'}]
+        self.enrollments = [
+            self._row(1, 1, 1, '90', '95'),
+            self._row(2, 2, 1, '50', '40'),
+            self._row(3, 3, 1, None, '80', grade='70'),
+            self._row(4, 1, 2, '85', '70.1'),
+            self._row(5, 2, 2, None, None),
+        ]
+        self.deletions = []
+        self.queries = []
+
+    @staticmethod
+    def _row(rid, student, course, ordinary, final, grade=None, at=T0, enrolled_at=T0):
+        as_dec = lambda v: None if v is None else Decimal(v)
+        return {'id': rid, 'student_id': student, 'course_id': course, 'ordinary_score': as_dec(ordinary),
+                'final_score': as_dec(final), 'grade': as_dec(grade), 'enrolled_at': enrolled_at,
+                'updated_at': at}
+
+    def fetch_all(self, sql, params=None):
+        self.queries.append(sql)
+        if 'FROM courses' in sql:
+            return self.courses
+        if 'FROM teachers' in sql:
+            return self.teachers
+        if 'FROM students' in sql:
+            return self.students
+        if 'FROM enrollment_deletions' in sql:
+            since = params[0] if params else datetime.min
+            return [d for d in self.deletions if d['deleted_at'] >= since]
+        if 'FROM enrollments WHERE' in sql:
+            max_id, since = params[0], params[1] if len(params) > 1 else datetime.max
+            return [r for r in self.enrollments if r['id'] > max_id or r['updated_at'] >= since]
+        raise AssertionError(sql)
+
+    def stream(self, sql, params=None, batch_size=2000):
+        self.queries.append(sql)
+        return iter(list(self.enrollments))
+
+    def fetch_one(self, sql, params=None):
+        self.queries.append(sql)
+        return {'at': max((d['deleted_at'] for d in self.deletions), default=None)}
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+
+
+class TestEnrollmentAnalytics(unittest.TestCase):
+    """Aggregates from memory agree with the SQL definitions."""
+
+    def setUp(self):
+        self.db = FakeDB()
+        self.versions = {'enrollments': 1, 'courses': 1, 'teachers': 1, 'students': 1}
+        for target, value in (('app_core.db.db', self.db),
+                              ('app_core.conditional.current_versions', self._versions)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(Config, 'ANALYTICS_REFRESH_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = EnrollmentAnalytics()
+
+    def _versions(self, tables):
+        return {name: (self.versions[name], T0) for name in tables}
+
+    def _change(self, table='enrollments'):
+        self.versions[table] += 1
+
+    def test_course_stats_match_sql_rules(self):
+        stats = {row['id']: row for row in self.engine.course_stats()}
+        # 90*.4+95*.6=93.0, 50*.4+40*.6=44.0, legacy 70 -> avg 69.00, 2/3 pass, 1/3 excellent
+        assert stats[1]['enrolled_count'] == 3
+        assert stats[1]['avg_grade'] == Decimal('69.00')
+        assert stats[1]['pass_rate'] == Decimal('66.67') and stats[1]['excellent_rate'] == Decimal('33.33')
+        # Default weights and half-up rounding; the ungraded row counts in the denominator
+        assert stats[2]['avg_grade'] == compute_final_grade(85, '70.1').quantize(Decimal('0.01'))
+        assert stats[2]['pass_rate'] == Decimal('50.00')
+        # Courses without enrollments are listed like the LEFT JOIN does
+        assert stats[3] == {'id': 3, 'name': '编译原理', 'course_code': 'C3', 'enrolled_count': 0,
+                            'avg_grade': None, 'pass_rate': None, 'excellent_rate': None}
+        assert [row['id'] for row in self.engine.course_stats(teacher_id=10)] == [1, 3]
+
+    def test_rates_round_half_up_from_counts(self):
+        # 1 of 32 passes: 3.125 exactly, which half-even float formatting would give as 3.12
+        self.db.enrollments = [FakeDB._row(100 + i, 1, 3, '90' if i == 0 else '10', '90' if i == 0 else '10')
+                               for i in range(32)]
+        stats = {row['id']: row for row in self.engine.course_stats()}
+        assert stats[3]['pass_rate'] == Decimal('3.13')
+        assert stats[3]['excellent_rate'] == Decimal('3.13')
+
+    def test_full_load_in_batches(self):
+        with patch('app_core.analytics.LOAD_BATCH', 2):
+            stats = self.engine.course_stats()
+        whole = EnrollmentAnalytics()
+        assert whole.course_stats() == stats
+        assert self.engine._columns.ids.tolist() == [1, 2, 3, 4, 5]
+        assert self.engine._max_id == 5 and self.engine._updated_watermark == T0
+
+    def test_unchanged_versions_skip_the_database(self):
+        self.engine.course_stats()
+        self.db.queries.clear()
+        self.engine.course_stats()
+        assert self.db.queries == []
+
+    def test_incremental_refresh(self):
+        self.engine.course_stats()
+        self.db.queries.clear()
+        later = T0 + timedelta(minutes=5)
+        self.db.enrollments[4] = FakeDB._row(5, 2, 2, '60', '60', at=later)
+        self.db.enrollments.append(FakeDB._row(6, 3, 3, '100', '99', at=later))
+        self.db.enrollments.pop(1)
+        self.db.deletions.append({'id': 2, 'deleted_at': later})
+        self._change()
+
+        stats = {row['id']: row for row in self.engine.course_stats()}
+        assert not any('ORDER BY id' in q and 'WHERE' not in q for q in self.db.queries), 'no full reload'
+        assert stats[1]['enrolled_count'] == 2
+        assert stats[2]['avg_grade'] == Decimal('68.80') and stats[2]['pass_rate'] == Decimal('100.00')
+        assert stats[3]['enrolled_count'] == 1 and stats[3]['excellent_rate'] == Decimal('100.00')
+
+    def test_weight_change_reloads_dimensions_only(self):
+        self.engine.course_stats()
+        self.db.queries.clear()
+        self.db.courses[0]['ordinary_weight'], self.db.courses[0]['final_weight'] = Decimal('1'), Decimal('0')
+        self._change('courses')
+        stats = {row['id']: row for row in self.engine.course_stats()}
+        assert not any('enrollments' in q for q in self.db.queries)
+        assert stats[1]['avg_grade'] == Decimal('70.00')
+
+    def test_groups_histogram_and_percentiles(self):
+        majors = {row['key']: row for row in self.engine.group_stats('major')}
+        assert majors['计算机']['enrolled_count'] == 3 and majors['软件工程']['enrolled_count'] == 2
+        teachers = {row['key']: row for row in self.engine.group_stats('teacher')}
+        assert teachers[10]['name'] == '王老师' and teachers[11]['enrolled_count'] == 2
+
+        histogram = self.engine.histogram('course', 1, bins=10)
+        assert sum(histogram['counts']) == 3 and histogram['counts'][9] == 1
+        assert self.engine.percentiles('course', 1, qs=(50,)) == {'p50': 70.0}
+        assert self.engine.percentiles('major', '计算机', column='ordinary_score') == {
+            f'p{q}': round(float(v), 2) for q, v in zip(DECILES, np.percentile([90, 85], DECILES))}
+
+    def test_distribution_by_term(self):
+        spring = datetime(2025, 3, 1)
+        self.db.enrollments.append(FakeDB._row(6, 1, 3, '60', '60', enrolled_at=spring))
+        self.db.enrollments.append(FakeDB._row(7, 2, 3, '40', '50', enrolled_at=spring))
+        self.db.enrollments.append(FakeDB._row(8, 3, 3, '100', '90'))
+
+        result = self.engine.distribution('course', 3, bins=5, compare=True)
+        assert result['term'] == '2025秋' and result['previous']['term'] == '2025春'
+        current, previous = result['columns'], result['previous']['columns']
+        assert current['final_grade']['count'] == 1 and current['final_grade']['mean'] == 95.0
+        assert previous['final_score']['histogram']['counts'] == [0, 0, 1, 1, 0]
+        assert previous['ordinary_score']['percentiles']['p50'] == 50.0
+        # Same snapshot generation: served from the cache
+        assert self.engine.distribution('course', 3, bins=5, compare=True) is result
+
+        whole = self.engine.distribution('course', 3, bins=5)
+        assert whole['term'] is None and whole['previous'] is None
+        assert whole['columns']['final_grade']['count'] == 3
+
+    def test_sql_fallback_uses_the_same_kernels(self):
+        expected = self.engine.distribution('course', 1, bins=4, compare=True)
+        rows = [dict(r, final_grade=compute_final_grade(r['ordinary_score'], r['final_score'], Decimal('0.4'),
+                                                        Decimal('0.6'), r['grade']))
+                for r in self.db.enrollments if r['course_id'] == 1]
+        assert distribution_from_rows(rows, bins=4, compare=True) == expected
+
+    def test_terms(self):
+        assert term_label(term_index(datetime(2025, 9, 1))) == '2025秋'
+        assert term_label(term_index(datetime(2026, 1, 10))) == '2025秋'
+        assert term_label(term_index(datetime(2026, 2, 20))) == '2026春'
+        assert parse_term('2025秋') - 1 == parse_term('2025春')
+        with self.assertRaises(ValueError):
+            parse_term('2025')
+        with self.assertRaises(ValueError):
+            self.engine.distribution('course', 1, bins=0)
+
+    def test_disabled_returns_none(self):
+        with patch.object(Config, 'ANALYTICS_REFRESH_SECONDS', -1):
+            assert self.engine.course_stats() is None
+        assert self.db.queries == []
+
+    def test_vectorised_rule_matches_decimal_rule(self):
+        rng = np.random.default_rng(7)
+        ordinary = np.round(rng.uniform(0, 100, 2000), 1).astype(np.float32)
+        final = np.round(rng.uniform(0, 100, 2000), 1).astype(np.float32)
+        weight = np.round(rng.uniform(0, 1, 2000), 2).astype(np.float32)
+        grades = final_grade_array(ordinary, final, weight, (1 - weight.astype(np.float64)).astype(np.float32),
+                                   np.full(2000, np.nan, dtype=np.float32))
+        for o, f, w, g in zip(ordinary, final, weight, grades):
+            ow = Decimal(f'{w:.2f}')
+            assert Decimal(f'{g:.1f}') == compute_final_grade(f'{o:.1f}', f'{f:.1f}', ow, 1 - ow)
+
+
+class TestPersistCourseRates(unittest.TestCase):
+    """get_statistics writes back only rates that differ from the stored columns."""
+
+    def setUp(self):
+        from app_core.services import admin_service
+        self.db = MagicMock()
+        self.db.fetch_all.return_value = [
+            {'id': 1, 'pass_rate': Decimal('66.67'), 'excellent_rate': Decimal('33.33')},
+            {'id': 2, 'pass_rate': None, 'excellent_rate': None},
+        ]
+        patcher = patch.object(admin_service, 'db', self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.persist = admin_service.AdminService._persist_course_rates
+
+    def test_unchanged_rates_issue_no_update(self):
+        self.persist([{'id': 1, 'pass_rate': Decimal('66.67'), 'excellent_rate': Decimal('33.33')},
+                      {'id': 2, 'pass_rate': None, 'excellent_rate': None}])
+        self.db.execute_values.assert_not_called()
+
+    def test_changed_rates_are_compared_in_the_update(self):
+        self.persist([{'id': 1, 'pass_rate': Decimal('66.67'), 'excellent_rate': Decimal('33.33')},
+                      {'id': 2, 'pass_rate': Decimal('50.00'), 'excellent_rate': Decimal('0.00')}])
+        sql, rows = self.db.execute_values.call_args[0][:2]
+        assert rows == [(2, Decimal('50.00'), Decimal('0.00'))]
+        assert 'IS DISTINCT FROM' in sql
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""
+Tests for bulk grade entry.
+"""
+import time
+import unittest
+from contextlib import contextmanager
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from app_core.services.admin_service import AdminService
+from app_core.services.teacher_service import TeacherService
+
+
+class TestBulkUpdateGrades(unittest.TestCase):
+    """One ownership check, one read and one UPDATE per batch."""
+
+    ENROLLMENTS = [
+        {'id': 1, 'version': 1, 'student_no': 'S001', 'ordinary_score': None, 'final_score': None},
+        {'id': 2, 'version': 4, 'student_no': 'S002', 'ordinary_score': Decimal('80.0'), 'final_score': Decimal('70.0')},
+        {'id': 3, 'version': 2, 'student_no': 'S003', 'ordinary_score': Decimal('60.0'), 'final_score': None},
+    ]
+
+    def setUp(self):
+        patcher = patch('app_core.services.teacher_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db.fetch_one.return_value = {'id': 5, 'teacher_id': 7}
+        self.db.fetch_all.return_value = [dict(row) for row in self.ENROLLMENTS]
+        self.db.execute_values.side_effect = lambda sql, values, template=None: [{'id': v[0], 'student_id': v[0]} for v in values]
+
+    def test_single_statement_for_the_batch(self):
+        summary = TeacherService.bulk_update_grades(7, 5, [
+            {'enrollment_id': 1, 'ordinary_score': 90, 'final_score': '85.5'},
+            {'student_no': 'S003', 'final_score': 75},
+        ])
+        assert summary == {'updated': 2, 'unchanged': 0, 'errors': []}
+        assert self.db.fetch_one.call_count == 1
+        assert self.db.fetch_all.call_count == 1
+        self.db.execute_values.assert_called_once()
+        sql, values = self.db.execute_values.call_args[0]
+        assert 'course_id = 5' in sql
+        # Missing fields keep the stored score; the version read guards against concurrent edits
+        assert values == [(1, 90.0, 85.5, 1), (3, 60.0, 75.0, 2)]
+
+    def test_per_row_errors_do_not_block_valid_rows(self):
+        summary = TeacherService.bulk_update_grades(7, 5, [
+            {'enrollment_id': 1, 'final_score': 101},
+            {'enrollment_id': 99, 'final_score': 50},
+            {'student_no': 'S002', 'ordinary_score': 'abc'},
+            {'student_no': 'S003', 'final_score': 88},
+            {'enrollment_id': 3, 'final_score': 89},
+        ])
+        assert summary['updated'] == 1
+        assert [e['row'] for e in summary['errors']] == [1, 2, 3, 5]
+        assert self.db.execute_values.call_args[0][1] == [(3, 60.0, 88.0, 2)]
+
+    def test_atomic_batch_cancelled_by_any_error(self):
+        summary = TeacherService.bulk_update_grades(7, 5, [
+            {'enrollment_id': 1, 'final_score': 80},
+            {'enrollment_id': 2, 'final_score': -1},
+        ], atomic=True)
+        assert summary['updated'] == 0 and len(summary['errors']) == 1
+        self.db.execute_values.assert_not_called()
+
+    def _transaction(self):
+        """db.get_cursor stand-in recording whether the transaction was rolled back."""
+        outcome = {}
+
+        @contextmanager
+        def get_cursor(autocommit=False):
+            try:
+                yield object()
+                outcome['committed'] = True
+            except Exception:
+                outcome['rolled_back'] = True
+                raise
+        self.db.get_cursor.side_effect = get_cursor
+        return outcome
+
+    def test_atomic_batch_rolled_back_on_concurrent_change(self):
+        outcome = self._transaction()
+        with patch('app_core.services.teacher_service.execute_values',
+                   return_value=[{'id': 1, 'student_id': 1}]), \
+                patch('app_core.services.teacher_service.grades_changed') as changed:
+            summary = TeacherService.bulk_update_grades(7, 5, [
+                {'enrollment_id': 1, 'final_score': 80},
+                {'enrollment_id': 3, 'final_score': 90},
+            ], atomic=True)
+        assert outcome == {'rolled_back': True}
+        assert summary['updated'] == 0
+        assert [(e['enrollment_id'], e['conflict']) for e in summary['errors']] == [(3, True)]
+        changed.assert_not_called()
+
+    def test_atomic_batch_committed_when_every_row_matches(self):
+        outcome = self._transaction()
+        with patch('app_core.services.teacher_service.execute_values',
+                   return_value=[{'id': 1, 'student_id': 1}, {'id': 3, 'student_id': 3}]):
+            summary = TeacherService.bulk_update_grades(7, 5, [
+                {'enrollment_id': 1, 'final_score': 80},
+                {'enrollment_id': 3, 'final_score': 90},
+            ], atomic=True)
+        assert outcome == {'committed': True}
+        assert summary == {'updated': 2, 'unchanged': 0, 'errors': []}
+
+    def test_unchanged_rows_skipped(self):
+        summary = TeacherService.bulk_update_grades(7, 5, [
+            {'enrollment_id': 2, 'ordinary_score': 80, 'final_score': 70},
+        ])
+        assert summary == {'updated': 0, 'unchanged': 1, 'errors': []}
+        self.db.execute_values.assert_not_called()
+
+    def test_concurrent_change_reported_as_conflict(self):
+        self.db.execute_values.side_effect = lambda sql, values, template=None: [{'id': 1, 'student_id': 1}]
+        summary = TeacherService.bulk_update_grades(7, 5, [
+            {'enrollment_id': 1, 'final_score': 80},
+            {'enrollment_id': 3, 'final_score': 90},
+        ])
+        assert summary['updated'] == 1
+        assert summary['errors'][0]['enrollment_id'] == 3 and summary['errors'][0]['conflict']
+
+    def test_foreign_course_rejected(self):
+        self.db.fetch_one.return_value = {'id': 5, 'teacher_id': 8}
+        assert TeacherService.bulk_update_grades(7, 5, [{'enrollment_id': 1, 'final_score': 80}]) is None
+        self.db.fetch_all.assert_not_called()
+
+    def test_excel_import(self):
+        import pandas as pd
+        buffer = BytesIO()
+        pd.DataFrame([
+            {'学号': 'S001', '平时成绩': 90, '期末成绩': 80},
+            {'学号': 'S003', '平时成绩': None, '期末成绩': 70},
+        ]).to_excel(buffer, sheet_name='成绩名单', index=False)
+        buffer.seek(0)
+
+        summary = TeacherService.import_course_grades(7, 5, buffer)
+        assert summary['updated'] == 2
+        assert self.db.execute_values.call_args[0][1] == [(1, 90.0, 80.0, 1), (3, 60.0, 70.0, 2)]
+
+
+
+class TestGradeSheetRoundTrip(unittest.TestCase):
+    """Export a class sheet, edit a few cells and upload it back."""
+
+    SIZE = 200
+
+    def setUp(self):
+        self.enrollments = [
+            {'enrollment_id': i, 'student_no': f'S{i:04d}', 'student_name': f'学生{i}', 'major': '计算机',
+             'ordinary_score': Decimal('80.0'), 'final_score': None, 'grade': None, 'status': 'enrolled'}
+            for i in range(1, self.SIZE + 1)
+        ]
+        with patch('app_core.services.admin_service.db') as admin_db:
+            admin_db.fetch_one.side_effect = [{'id': 5, 'name': '数据库', 'course_code': 'C5'}, {}]
+            admin_db.fetch_all.return_value = self.enrollments
+            buffer, _ = AdminService.export_course_grades(5)
+        self.exported = buffer.getvalue()
+
+        patcher = patch('app_core.services.teacher_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db.fetch_one.return_value = {'id': 5, 'teacher_id': 7}
+        self.db.fetch_all.return_value = [
+            {'id': e['enrollment_id'], 'version': 1, 'student_no': e['student_no'],
+             'ordinary_score': e['ordinary_score'], 'final_score': e['final_score']}
+            for e in self.enrollments
+        ]
+        self.db.execute_values.side_effect = lambda sql, values, template=None: [{'id': v[0], 'student_id': v[0]} for v in values]
+
+    def _filled(self, edits):
+        from openpyxl import load_workbook
+        workbook = load_workbook(BytesIO(self.exported))
+        sheet = workbook['成绩名单']
+        header = [cell.value for cell in sheet[1]]
+        for row_number, column, value in edits:
+            sheet.cell(row=row_number + 1, column=header.index(column) + 1).value = value
+        out = BytesIO()
+        workbook.save(out)
+        out.seek(0)
+        return out
+
+    def test_only_edited_rows_written(self):
+        upload = self._filled([(1, '期末成绩', 90), (2, '平时成绩', None), (3, '平时成绩', 80)])
+        summary = TeacherService.import_course_grades(7, 5, upload)
+
+        assert summary['updated'] == 2 and not summary['errors']
+        assert summary['unchanged'] == self.SIZE - 2
+        # An emptied cell clears the score
+        assert self.db.execute_values.call_args[0][1] == [(1, 80.0, 90.0, 1), (2, None, None, 1)]
+
+    def test_changed_since_export_is_conflict(self):
+        self.db.fetch_all.return_value[0]['final_score'] = Decimal('55.0')
+        upload = self._filled([(1, '期末成绩', 90), (4, '期末成绩', 70)])
+        summary = TeacherService.import_course_grades(7, 5, upload)
+
+        assert summary['updated'] == 1
+        conflict, = summary['errors']
+        assert conflict['conflict'] and conflict['student_no'] == 'S0001'
+        assert conflict['current'] == {'ordinary_score': 80.0, 'final_score': 55.0}
+
+    def test_full_class_round_trip_is_fast(self):
+        upload = self._filled([(i, '期末成绩', 60 + i % 40) for i in range(1, self.SIZE + 1)])
+        started = time.perf_counter()
+        summary = TeacherService.import_course_grades(7, 5, upload)
+        assert summary['updated'] == self.SIZE
+        assert time.perf_counter() - started < 0.5
+        self.db.execute_values.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Tests for conditional GET on list endpoints.
+"""
+import datetime
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from flask import Flask, jsonify, session
+
+from app_core import conditional
+from app_core.conditional import conditional_get
+
+
+class TestConditionalGet(unittest.TestCase):
+    """ETag / Last-Modified handling around a view."""
+
+    def setUp(self):
+        self.versions = {
+            'courses': (3, datetime.datetime(2024, 9, 1, 8, 0, 0)),
+            'teachers': (1, datetime.datetime(2024, 9, 1, 7, 0, 0)),
+        }
+        patcher = patch.object(conditional, 'current_versions', side_effect=lambda tables: dict(self.versions))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.calls = 0
+        app = Flask(__name__)
+        app.secret_key = 'test'
+
+        @app.route('/login/<int:user_id>')
+        def login(user_id):
+            session['user_id'] = user_id
+            return 'ok'
+
+        @app.route('/enroll', methods=['POST'])
+        def enroll():
+            return 'ok'
+
+        @app.route('/courses')
+        @conditional_get('courses', 'teachers')
+        def courses():
+            self.calls += 1
+            return jsonify([{'id': 1}])
+
+        self.generation = 1
+
+        @app.route('/distribution')
+        @conditional_get('courses', 'teachers', extra=lambda: self.generation)
+        def distribution():
+            self.calls += 1
+            return jsonify({'generation': self.generation})
+
+        self.app = app
+
+    def test_matching_etag_skips_view(self):
+        client = self.app.test_client()
+        first = client.get('/courses')
+        assert first.status_code == 200
+        assert first.headers['Cache-Control'] == 'private, no-cache'
+
+        second = client.get('/courses', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 304
+        assert second.data == b''
+        assert self.calls == 1
+
+    def test_version_bump_changes_etag(self):
+        client = self.app.test_client()
+        etag = client.get('/courses').headers['ETag']
+        self.versions['teachers'] = (2, datetime.datetime(2024, 9, 2))
+
+        response = client.get('/courses', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert self.calls == 2
+
+    def test_extra_part_changes_etag(self):
+        # Versions already moved, but this worker's snapshot only catches up later
+        client = self.app.test_client()
+        etag = client.get('/distribution').headers['ETag']
+        assert client.get('/distribution', headers={'If-None-Match': etag}).status_code == 304
+
+        self.generation = 2
+        response = client.get('/distribution', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.get_json() == {'generation': 2}
+
+    def test_etag_is_per_user_and_query(self):
+        alice, bob = self.app.test_client(), self.app.test_client()
+        alice.get('/login/1')
+        bob.get('/login/2')
+        etag = alice.get('/courses').headers['ETag']
+
+        assert bob.get('/courses', headers={'If-None-Match': etag}).status_code == 200
+        assert alice.get('/courses?semester=2', headers={'If-None-Match': etag}).status_code == 200
+
+    def test_own_write_changes_etag(self):
+        with patch.object(conditional, 'init_version_schema', return_value=True):
+            conditional.init_conditional(self.app)
+        alice, bob = self.app.test_client(), self.app.test_client()
+        alice.get('/login/1')
+        bob.get('/login/2')
+        alice_etag = alice.get('/courses').headers['ETag']
+        bob_etag = bob.get('/courses').headers['ETag']
+
+        alice.post('/enroll')
+        assert alice.get('/courses', headers={'If-None-Match': alice_etag}).status_code == 200
+        assert bob.get('/courses', headers={'If-None-Match': bob_etag}).status_code == 304
+
+    def test_if_modified_since(self):
+        client = self.app.test_client()
+        response = client.get('/courses')
+        assert response.headers['Last-Modified'] == 'Sun, 01 Sep 2024 08:00:00 GMT'
+
+        again = client.get('/courses', headers={'If-Modified-Since': response.headers['Last-Modified']})
+        assert again.status_code == 304
+
+    def test_version_lookup_failure_serves_full_response(self):
+        conditional.current_versions.side_effect = RuntimeError('db down')
+        response = self.app.test_client().get('/courses')
+        assert response.status_code == 200
+        assert 'ETag' not in response.headers
+
+
+class TestVersionLookup(unittest.TestCase):
+    """Versions are sums over the append-only change rows."""
+
+    def setUp(self):
+        patcher = patch('app_core.db.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_versions_are_change_sums(self):
+        at = datetime.datetime(2024, 9, 1)
+        self.db.fetch_all.return_value = [
+            {'resource': 'courses', 'version': Decimal('12'), 'updated_at': at, 'change_rows': 5}]
+        assert conditional._load_versions(('courses',)) == {'courses': (12, at)}
+        sql, params = self.db.fetch_all.call_args[0]
+        assert 'SUM(changes)' in sql and 'FROM resource_changes' in sql and params == [['courses']]
+        self.db.execute.assert_not_called()
+
+    def test_long_histories_are_folded(self):
+        self.db.fetch_all.return_value = [
+            {'resource': 'enrollments', 'version': 5000, 'updated_at': datetime.datetime(2024, 9, 1),
+             'change_rows': conditional.COMPACT_AFTER + 1}]
+        conditional._load_versions(('enrollments',))
+        sql, params = self.db.execute.call_args[0]
+        assert 'DELETE FROM resource_changes WHERE resource = %s' in sql
+        assert 'SUM(changes), MAX(changed_at)' in sql and params == ['enrollments', 'enrollments']
+
+    def test_trigger_only_inserts(self):
+        cursor = self.db.get_cursor.return_value.__enter__.return_value
+        assert conditional.init_version_schema()
+        statements = [c[0][0] for c in cursor.execute.call_args_list]
+        trigger = next(sql for sql in statements if 'FUNCTION bump_resource_version' in sql)
+        assert 'INSERT INTO resource_changes' in trigger and 'UPDATE' not in trigger
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests for password hashing, verification and legacy rehash on login.
+"""
+import hashlib
+import threading
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from app_core.credentials import (
+    CredentialVerifier,
+    CredentialsBusy,
+    check_hash,
+    is_legacy,
+    make_hash,
+    needs_rehash,
+)
+
+
+class TestHashFormat(unittest.TestCase):
+    """Test the stored hash format."""
+
+    def test_roundtrip(self):
+        stored = make_hash('secret', 1000)
+        assert stored.startswith('pbkdf2_sha256$1000$')
+        assert check_hash(stored, 'secret')
+        assert not check_hash(stored, 'wrong')
+
+    def test_salted(self):
+        assert make_hash('secret', 1000) != make_hash('secret', 1000)
+
+    def test_rehash_rules(self):
+        legacy = hashlib.sha256(b'secret').hexdigest()
+        assert is_legacy(legacy) and needs_rehash(legacy, 1000)
+        assert needs_rehash(make_hash('secret', 500), 1000)
+        assert not needs_rehash(make_hash('secret', 1000), 1000)
+
+
+class TestCredentialVerifier(unittest.TestCase):
+    """Test verification paths and the bounded queue."""
+
+    def test_legacy_and_kdf_inline(self):
+        verifier = CredentialVerifier(workers=0, max_pending=4, iterations=1000)
+        assert verifier.verify(hashlib.sha256(b'pw').hexdigest(), 'pw')
+        assert verifier.verify(verifier.hash('pw'), 'pw')
+        assert not verifier.verify(None, 'pw')
+
+    def test_legacy_and_missing_hashes_pay_the_kdf(self):
+        verifier = CredentialVerifier(workers=0, max_pending=4, iterations=1000)
+        verifier.start()
+        legacy = hashlib.sha256(b'pw').hexdigest()
+        with patch.object(verifier, '_run', wraps=verifier._run) as run:
+            assert verifier.verify(legacy, 'pw')
+            assert not verifier.verify(legacy, 'wrong')
+            assert not verifier.verify(None, 'pw')
+        assert [c.args[:2] for c in run.call_args_list] == [(check_hash, verifier.dummy_hash())] * 3
+
+    def test_start_makes_the_dummy_hash(self):
+        verifier = CredentialVerifier(workers=0, max_pending=4, iterations=1000)
+        verifier.start()
+        assert verifier._dummy_hash.startswith('pbkdf2_sha256$1000$')
+
+    def test_process_pool(self):
+        verifier = CredentialVerifier(workers=1, max_pending=4, iterations=1000)
+        try:
+            assert verifier.verify(verifier.hash('pw'), 'pw')
+        finally:
+            verifier.shutdown()
+
+    def test_start_forks_workers_up_front(self):
+        verifier = CredentialVerifier(workers=2, max_pending=4, iterations=1000)
+        try:
+            verifier.start()
+            assert len(verifier._pool._processes) == 2
+            assert verifier._pool._mp_context.get_start_method() == 'fork'
+        finally:
+            verifier.shutdown()
+
+    def test_full_queue_fails_fast(self):
+        verifier = CredentialVerifier(workers=0, max_pending=1, iterations=1000, queue_timeout=0.01)
+        release = threading.Event()
+        holder = threading.Thread(target=lambda: verifier._run(release.wait, 2))
+        holder.start()
+        try:
+            with self.assertRaises(CredentialsBusy):
+                verifier.verify(make_hash('pw', 1000), 'pw')
+        finally:
+            release.set()
+            holder.join()
+
+
+class TestLoginRehash(unittest.TestCase):
+    """Test that a legacy hash is upgraded on successful login."""
+
+    def setUp(self):
+        from app_core.services import user_service
+        self.user_service = user_service
+        patches = [
+            patch.object(user_service, 'db'),
+            patch.object(user_service, 'verifier', CredentialVerifier(workers=0, max_pending=4, iterations=1000)),
+        ]
+        self.db = patches[0].start()
+        patches[1].start()
+        for p in patches:
+            self.addCleanup(p.stop)
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+
+    def _user(self, stored):
+        return {'id': 1, 'username': 'admin', 'password': stored, 'role': 'admin', 'ref_id': None}
+
+    def test_legacy_password_upgraded(self):
+        self.db.fetch_one.return_value = self._user(hashlib.sha256(b'admin@123').hexdigest())
+        with self.app.test_request_context():
+            user = self.user_service.UserService.authenticate('admin', 'admin@123')
+        assert user['username'] == 'admin'
+        sql, params = self.db.execute.call_args[0]
+        assert sql.startswith('UPDATE users SET password')
+        assert params[0].startswith('pbkdf2_sha256$1000$')
+
+    def test_current_hash_not_rewritten(self):
+        self.db.fetch_one.return_value = self._user(make_hash('admin@123', 1000))
+        with self.app.test_request_context():
+            assert self.user_service.UserService.authenticate('admin', 'admin@123')
+        self.db.execute.assert_not_called()
+
+    def test_unknown_user_pays_the_kdf(self):
+        self.db.fetch_one.return_value = None
+        verifier = self.user_service.verifier
+        with patch.object(verifier, 'verify', wraps=verifier.verify) as verify, self.app.test_request_context():
+            assert self.user_service.UserService.authenticate('ghost', 'pw') is None
+        stored, password = verify.call_args[0]
+        assert stored.startswith('pbkdf2_sha256$1000$') and password == 'pw'
+        assert verifier.dummy_hash() == stored
+
+    def test_new_accounts_store_pbkdf2(self):
+        self.user_service.UserService.create_user('s001', 'ss001', 'student', 1)
+        params = self.db.execute_returning.call_args[0][1]
+        assert params[1].startswith('pbkdf2_sha256$1000$')
+
+    def test_wrong_password(self):
+        self.db.fetch_one.return_value = self._user(make_hash('admin@123', 1000))
+        with self.app.test_request_context():
+            assert self.user_service.UserService.authenticate('admin', 'nope') is None
+
+
+if __name__ == '__main__':
+    unittest.main()
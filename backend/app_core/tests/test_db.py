@@ -0,0 +1,69 @@
+"""
+Tests for pooled connection handling in Database.get_cursor / stream.
+"""
+import unittest
+from unittest.mock import MagicMock
+
+import psycopg2
+
+from app_core.db import Database
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection, including the named cursor rule."""
+
+    def __init__(self):
+        self.autocommit = False
+        self.rows = [{'id': 1}, {'id': 2}]
+
+    def cursor(self, name=None, cursor_factory=None):
+        if name and self.autocommit:
+            raise psycopg2.ProgrammingError("can't use a named cursor outside of transactions")
+        cur = MagicMock()
+        cur.connection = self
+        cur.__enter__.return_value = cur
+        cur.__iter__.return_value = iter(self.rows)
+        return cur
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """A pool holding a single connection, so every caller reuses it."""
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+
+class TestPooledConnections(unittest.TestCase):
+    """Autocommit must not leak to the next user of a pooled connection."""
+
+    def setUp(self):
+        self.db = Database.__new__(Database)
+        self.db.pool = FakePool()
+
+    def test_stream_after_autocommit_statement(self):
+        with self.db.get_cursor(autocommit=True) as cur:
+            cur.execute('CREATE INDEX IF NOT EXISTS idx ON t(c)')
+        assert self.db.pool.conn.autocommit is False
+        assert list(self.db.stream('SELECT id FROM t')) == [{'id': 1}, {'id': 2}]
+
+    def test_reset_when_the_statement_fails(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.get_cursor(autocommit=True):
+                raise RuntimeError('boom')
+        assert self.db.pool.conn.autocommit is False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for request dedup stores and the deduplicate_request decorator.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, request, session
+
+from app_core.dedup import MemoryDedupStore, SQLiteDedupStore, request_key
+from app_core.middleware import deduplicate_request, init_dedup
+
+
+class TestRequestKey(unittest.TestCase):
+    """Test digest construction."""
+
+    def test_digest_not_raw_body(self):
+        key = request_key(1, '/api/x', 'POST', b'{"secret": 1}')
+        assert len(key) == 64 and 'secret' not in key
+
+    def test_idempotency_key_overrides_body(self):
+        first = request_key(1, '/api/x', 'POST', b'a', 'k-1')
+        second = request_key(1, '/api/x', 'POST', b'b', 'k-1')
+        assert first == second
+        assert first != request_key(1, '/api/x', 'POST', b'a')
+
+
+class TestMemoryDedupStore(unittest.TestCase):
+    """Test claim/expiry semantics of the in-process store."""
+
+    def test_duplicate_within_ttl_rejected(self):
+        store = MemoryDedupStore()
+        assert store.claim('k', 5)
+        assert not store.claim('k', 5)
+
+    def test_expired_key_can_be_claimed_again(self):
+        store = MemoryDedupStore()
+        with patch('app_core.dedup.time.monotonic', side_effect=[100.0, 106.0]):
+            assert store.claim('k', 5)
+            assert store.claim('k', 5)
+
+    def test_size_is_bounded(self):
+        store = MemoryDedupStore(max_entries=3)
+        for i in range(10):
+            store.claim(f'k{i}', 60)
+        assert len(store) == 3
+        # The most recent keys are kept
+        assert not store.claim('k9', 60)
+
+
+class TestSQLiteDedupStore(unittest.TestCase):
+    """Test that keys are shared between store instances on one file."""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_shared_between_instances(self):
+        worker_a = SQLiteDedupStore(self.path)
+        worker_b = SQLiteDedupStore(self.path)
+        assert worker_a.claim('k', 5)
+        assert not worker_b.claim('k', 5)
+
+    def test_saved_response_shared_and_released(self):
+        worker_a = SQLiteDedupStore(self.path)
+        worker_b = SQLiteDedupStore(self.path)
+        assert worker_a.claim('k', 5)
+        assert worker_b.get_response('k') is None
+        worker_a.save_response('k', (201, 'application/json', b'{"id": 1}'))
+        assert worker_b.get_response('k') == (201, 'application/json', b'{"id": 1}')
+        worker_b.release('k')
+        assert worker_a.claim('k', 5)
+
+    def test_expired_key_reclaimed(self):
+        store = SQLiteDedupStore(self.path)
+        with patch('app_core.dedup.time.time', side_effect=[100.0, 106.0]):
+            assert store.claim('k', 5)
+            assert store.claim('k', 5)
+
+
+class TestDeduplicateDecorator(unittest.TestCase):
+    """Test the decorator on a minimal Flask app."""
+
+    def setUp(self):
+        self.store = MemoryDedupStore()
+        patcher = patch('app_core.middleware.get_dedup_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        app = Flask(__name__)
+        app.secret_key = 'test'
+
+        self.calls = 0
+
+        @app.route('/submit', methods=['GET', 'POST'])
+        @deduplicate_request(timeout=5)
+        def submit():
+            self.calls += 1
+            if request.get_data() == b'bad':
+                return {'success': False}, 400
+            if request.get_data() == b'boom':
+                raise RuntimeError('boom')
+            return {'success': True, 'call': self.calls}
+
+        self.client = app.test_client()
+
+    def test_repeated_post_blocked(self):
+        assert self.client.post('/submit', data='x').status_code == 200
+        assert self.client.post('/submit', data='x').status_code == 429
+        assert self.client.post('/submit', data='y').status_code == 200
+
+    def test_get_not_deduplicated(self):
+        assert self.client.get('/submit').status_code == 200
+        assert self.client.get('/submit').status_code == 200
+
+    def test_idempotency_key_retry_gets_first_response(self):
+        headers = {'Idempotency-Key': 'abc'}
+        first = self.client.post('/submit', data='x', headers=headers)
+        retry = self.client.post('/submit', data='changed', headers=headers)
+        assert retry.status_code == 200 and retry.get_json() == first.get_json() == {'success': True, 'call': 1}
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert self.calls == 1
+
+    def test_failed_attempt_releases_key(self):
+        headers = {'Idempotency-Key': 'abc'}
+        assert self.client.post('/submit', data='bad', headers=headers).status_code == 400
+        assert self.client.post('/submit', data='bad', headers=headers).status_code == 400
+        assert self.client.post('/submit', data='boom').status_code == 500
+        assert self.client.post('/submit', data='boom').status_code == 500
+        assert len(self.store) == 0
+
+
+class TestInitDedup(unittest.TestCase):
+    """The app-wide hook covers signed-in writes without decorating each route."""
+
+    def setUp(self):
+        self.store = MemoryDedupStore()
+        patcher = patch('app_core.middleware.get_dedup_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        init_dedup(app)
+
+        @app.route('/login', methods=['POST'])
+        def login():
+            session['user_id'] = 1
+            return {'success': True}
+
+        @app.route('/grades', methods=['PUT'])
+        def grades():
+            return {'success': True}
+
+        @app.errorhandler(Exception)
+        def handle_error(error):
+            return {'error': str(error)}, 500
+
+        @app.route('/fail', methods=['POST'])
+        def fail():
+            raise RuntimeError('db down')
+
+        self.client = app.test_client()
+
+    def test_signed_in_writes_are_deduplicated(self):
+        assert self.client.post('/login').status_code == 200
+        assert self.client.post('/login').status_code == 200
+        assert self.client.put('/grades', data='x').status_code == 200
+        assert self.client.put('/grades', data='x').status_code == 429
+        headers = {'Idempotency-Key': 'k-1'}
+        assert self.client.put('/grades', data='y', headers=headers).status_code == 200
+        assert self.client.put('/grades', data='y', headers=headers).headers['Idempotent-Replayed'] == 'true'
+
+    def test_handled_exception_releases_key(self):
+        self.client.post('/login')
+        assert self.client.post('/fail', data='x').status_code == 500
+        assert self.client.post('/fail', data='x').status_code == 500
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Unit tests for the synthetic dataset generator (no database required).
+"""
+import unittest
+
+from app_core.scripts.generate_dataset import DatasetGenerator, Spec
+
+
+class TestDatasetGenerator(unittest.TestCase):
+    """Test reproducibility and integrity of generated rows."""
+
+    SPEC = Spec(majors=3, courses=40, teachers=10, students=200, enrollments=3000, seed=7)
+
+    def test_same_seed_same_rows(self):
+        first = list(DatasetGenerator(self.SPEC).enrollments())
+        second = list(DatasetGenerator(self.SPEC).enrollments())
+        assert first == second
+
+    def test_enrollment_total_and_uniqueness(self):
+        rows = list(DatasetGenerator(self.SPEC).enrollments())
+        pairs = {(r[1], r[2]) for r in rows}
+
+        assert len(rows) == self.SPEC.enrollments
+        assert len(pairs) == len(rows)
+
+    def test_total_is_exact_when_padding_or_trimming(self):
+        # Sparse (many zero rows to trim from) and dense (rows capped at the course count) specs
+        for spec in (Spec(3, 40, 10, 200, 100, seed=3), Spec(3, 40, 10, 200, 7900, seed=5),
+                     Spec(2, 5, 2, 30, 140, seed=1)):
+            assert len(list(DatasetGenerator(spec).enrollments())) == spec.enrollments, spec
+
+    def test_legacy_final_grade_not_written(self):
+        assert 'final_grade' not in DatasetGenerator.COLUMNS['enrollments']
+
+    def test_scores_within_constraints(self):
+        for row in DatasetGenerator(self.SPEC).enrollments():
+            for score in row[4:6]:
+                assert score is None or 0 <= score <= 100
+
+    def test_every_table_matches_its_columns(self):
+        for table, rows in DatasetGenerator(self.SPEC).tables():
+            first = next(rows)
+            assert len(first) == len(DatasetGenerator.COLUMNS[table]), table
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Tests for the shared final grade computation.
+"""
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from app_core.config import Config
+from app_core.grading import compute_final_grade, final_grade_sql, weighted_grade_sql
+from app_core.services.admin_service import AdminService
+from app_core.services.student_service import StudentService
+from app_core.services.teacher_service import TeacherService
+
+
+class TestComputeFinalGrade(unittest.TestCase):
+    """The Python rule matches the SQL one: weighted, one decimal, half-up."""
+
+    def test_weighted_and_rounded_half_up(self):
+        assert compute_final_grade(85, '70.1') == Decimal('77.6')
+        assert compute_final_grade(Decimal('90'), Decimal('80'), Decimal('0.3'), Decimal('0.7')) == Decimal('83.0')
+
+    def test_missing_component_falls_back_to_legacy_grade(self):
+        assert compute_final_grade(None, 80) is None
+        assert compute_final_grade(None, 80, grade=Decimal('66.5')) == Decimal('66.5')
+
+    def test_sql_aliases(self):
+        sql = final_grade_sql('x', 'k')
+        assert 'x.ordinary_score * COALESCE(k.ordinary_weight, 0.5)' in sql
+        assert sql.endswith(', x.grade)')
+        assert 'grade)' not in weighted_grade_sql()
+
+
+class TestReadPathsShareTheRule(unittest.TestCase):
+    """Lists, stats and exports all embed the same expression."""
+
+    def _sql(self, target, call, *args):
+        with patch(f'app_core.services.{target}.db') as db, \
+                patch.object(Config, 'ANALYTICS_REFRESH_SECONDS', -1):
+            db.fetch_one.return_value = {'id': 5, 'teacher_id': 7}
+            db.fetch_all.return_value = []
+            call(*args)
+        return ' '.join(c[0][0] for c in db.fetch_all.call_args_list + db.fetch_one.call_args_list)
+
+    def test_every_reader_uses_the_shared_expression(self):
+        readers = [
+            ('student_service', StudentService.get_enrollments, 1),
+            ('teacher_service', TeacherService.get_course_students, 7, 5),
+            ('teacher_service', TeacherService.get_course_stats, 7),
+            ('admin_service', AdminService.get_enrollments),
+            ('admin_service', AdminService._fetch_course_stats),
+        ]
+        for target, call, *args in readers:
+            sql = self._sql(target, call, *args)
+            assert weighted_grade_sql() in sql, call.__name__
+            assert 'e.final_grade' not in sql, call.__name__
+
+
+if __name__ == '__main__':
+    unittest.main()
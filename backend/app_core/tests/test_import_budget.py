@@ -0,0 +1,53 @@
+"""
+Import-time budget: the web app must not load the Excel stack at startup.
+
+pandas/openpyxl are only needed by the Excel import/export endpoints and are
+imported inside those functions. Each check runs in a fresh interpreter with
+the database module stubbed out.
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Generous wall-clock budget for importing the service and API layers
+IMPORT_BUDGET_SECONDS = 3.0
+DEFERRED_MODULES = ('pandas', 'openpyxl', 'numpy')
+
+PROBE = '''
+import json, sys, time, types
+from unittest.mock import MagicMock
+fake = types.ModuleType("app_core.db")
+fake.db = MagicMock()
+fake.query_stats = MagicMock()
+sys.modules["app_core.db"] = fake
+started = time.perf_counter()
+import app_core.services, app_core.api
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+''' % (DEFERRED_MODULES,)
+
+
+class TestImportBudget(unittest.TestCase):
+    """Test that startup stays free of the Excel dependencies."""
+
+    @classmethod
+    def setUpClass(cls):
+        out = subprocess.run(
+            [sys.executable, '-c', PROBE], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=60, check=True,
+        )
+        cls.result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    def test_excel_stack_not_imported(self):
+        assert self.result['loaded'] == [], self.result['loaded']
+
+    def test_import_within_budget(self):
+        assert self.result['elapsed'] < IMPORT_BUDGET_SECONDS, self.result['elapsed']
+
+
+if __name__ == '__main__':
+    unittest.main()
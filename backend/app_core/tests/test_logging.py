@@ -0,0 +1,83 @@
+"""
+Tests for the logging pipeline (async queue, JSON format, sampling, rotation).
+"""
+import json
+import logging
+import logging.handlers
+import os
+import shutil
+import tempfile
+import unittest
+
+from app_core.logger import JSONFormatter, SamplingFilter, setup_logging, shutdown_logging
+
+
+class TestSamplingFilter(unittest.TestCase):
+    """Test counter-based per-level sampling."""
+
+    def _record(self, level):
+        return logging.LogRecord('request', level, __file__, 1, 'REQUEST: GET /', None, None)
+
+    def test_keeps_exact_fraction(self):
+        f = SamplingFilter({logging.INFO: 0.25})
+        kept = sum(f.filter(self._record(logging.INFO)) for _ in range(100))
+        assert kept == 25
+
+    def test_unlisted_levels_always_kept(self):
+        f = SamplingFilter({logging.INFO: 0.0})
+        assert not f.filter(self._record(logging.INFO))
+        assert f.filter(self._record(logging.WARNING))
+
+
+class TestJSONFormatter(unittest.TestCase):
+    """Test structured output."""
+
+    def test_single_line_json(self):
+        record = logging.LogRecord('auth', logging.INFO, __file__, 1, 'AUTH: %s', ('login',), None)
+        line = JSONFormatter().format(record)
+        entry = json.loads(line)
+        assert '\n' not in line
+        assert entry['level'] == 'INFO' and entry['logger'] == 'auth' and entry['msg'] == 'AUTH: login'
+
+
+class TestSetupLogging(unittest.TestCase):
+    """Test handler wiring in async and rotating modes."""
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutdown_logging()
+        for handler in logging.getLogger().handlers[:]:
+            handler.close()
+            logging.getLogger().removeHandler(handler)
+        for name in ('request', 'response'):
+            logging.getLogger(name).filters.clear()
+        shutil.rmtree(self.log_dir, ignore_errors=True)
+
+    def test_async_mode_uses_queue_and_flushes_on_shutdown(self):
+        root = setup_logging(self.log_dir, console_level=logging.CRITICAL, async_mode=True, log_format='json')
+        assert all(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers)
+
+        logging.getLogger('auth').info('AUTH: queued')
+        shutdown_logging()
+
+        with open(os.path.join(self.log_dir, 'app.log'), encoding='utf-8') as fh:
+            entries = [json.loads(line) for line in fh]
+        assert entries[-1]['msg'] == 'AUTH: queued'
+
+    def test_size_rotation_handlers(self):
+        root = setup_logging(self.log_dir, rotation='size', max_bytes=1024, backup_count=2)
+        rotating = [h for h in root.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
+        assert len(rotating) == 2
+
+    def test_request_logger_sampled(self):
+        setup_logging(self.log_dir, sample_rates={logging.INFO: 0.5})
+        assert any(isinstance(f, SamplingFilter) for f in logging.getLogger('request').filters)
+        # Re-running setup replaces rather than stacks filters
+        setup_logging(self.log_dir)
+        assert not logging.getLogger('request').filters
+
+
+if __name__ == '__main__':
+    unittest.main()
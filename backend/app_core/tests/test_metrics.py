@@ -0,0 +1,84 @@
+"""
+Tests for the metrics registry and its text exposition.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app_core.metrics import Registry, clear_multiproc_dir
+
+
+class TestRegistry(unittest.TestCase):
+    """Test metric types and rendering in a single process."""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        requests = self.registry.counter('http_requests_total', 'Requests')
+        requests.inc(endpoint='auth.login', status=200)
+        requests.inc(endpoint='auth.login', status=200)
+        text = self.registry.render()
+        assert '# TYPE http_requests_total counter' in text
+        assert 'http_requests_total{endpoint="auth.login",status="200"} 2' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        latency = self.registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            latency.observe(value)
+        text = self.registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 2' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'latency_seconds_count 3' in text
+        assert 'latency_seconds_sum 5.55' in text
+
+    def test_gauge_function_read_at_scrape(self):
+        pool = {'used': 1}
+        gauge = self.registry.gauge('pool_connections', 'Pool')
+        gauge.set_function(lambda: pool['used'], state='in_use')
+        pool['used'] = 4
+        assert 'pool_connections{state="in_use"} 4' in self.registry.render()
+
+    def test_label_values_escaped(self):
+        self.registry.counter('c', 'C').inc(path='a"b')
+        assert 'c{path="a\\"b"} 1' in self.registry.render()
+
+
+class TestMultiprocess(unittest.TestCase):
+    """Test merging of per-worker snapshots."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _worker_snapshot(self, pid, count):
+        other = Registry()
+        other.counter('jobs_total', 'Jobs').inc(count)
+        other.gauge('in_use', 'In use').set(3)
+        with open(os.path.join(self.dir, f'metrics_{pid}.json'), 'w', encoding='utf-8') as fh:
+            json.dump(other.snapshot(), fh)
+
+    def test_counters_summed_gauges_per_pid(self):
+        self._worker_snapshot(999991, 5)
+        registry = Registry(self.dir)
+        registry.counter('jobs_total', 'Jobs').inc(2)
+        text = registry.render()
+        assert 'jobs_total 7' in text
+        assert 'in_use{pid="999991"} 3' in text
+
+    def test_flush_and_clear(self):
+        registry = Registry(self.dir)
+        registry.counter('jobs_total', 'Jobs').inc()
+        registry.flush()
+        assert os.listdir(self.dir) == [f'metrics_{os.getpid()}.json']
+        clear_multiproc_dir(self.dir)
+        assert os.listdir(self.dir) == []
+
+
+if __name__ == '__main__':
+    unittest.main()
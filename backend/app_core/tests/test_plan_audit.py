@@ -0,0 +1,98 @@
+"""
+Tests for the plan completion audit.
+"""
+import unittest
+from decimal import Decimal
+from unittest.mock import patch
+
+from app_core import grading
+from app_core.grading import weighted_grade_sql
+from app_core.services import audit_service
+from app_core.services.audit_service import PlanAuditService
+
+
+class TestPlanAuditRefresh(unittest.TestCase):
+    """One DELETE and one INSERT ... SELECT per refresh, scoped to the touched students."""
+
+    def _refresh(self, **scope):
+        with patch('app_core.services.audit_service.db') as db:
+            cursor = db.get_cursor.return_value.__enter__.return_value
+            cursor.rowcount = 2
+            assert PlanAuditService.refresh(**scope) == 2
+        return cursor.execute.call_args_list
+
+    def test_whole_university(self):
+        delete, insert = self._refresh()
+        assert delete[0] == ('DELETE FROM plan_audit WHERE TRUE', [])
+        sql, params = insert[0]
+        assert 'WHERE TRUE' in sql and params == []
+        assert 'GROUP BY a.student_id, a.plan_id' in sql
+        # Status follows the shared final grade rule and only required courses count
+        assert weighted_grade_sql() in sql and 'COALESCE(is_required, TRUE)' in sql
+
+    def test_scopes(self):
+        delete, insert = self._refresh(student_ids=[1, 2], course_ids=[7], plan_ids=[3])
+        assert delete[0][1] == insert[0][1] == [[1, 2], [7], [7], [3], [3]]
+        sql = delete[0][0]
+        assert sql.startswith('DELETE FROM plan_audit WHERE student_id = ANY(%s) OR student_id IN')
+        assert 'FROM plan_audit WHERE plan_id = ANY(%s)' in sql
+        assert 'WHERE s.id = ANY(%s) OR s.id IN (SELECT student_id FROM enrollments' in insert[0][0]
+
+    def test_empty_scope_matches_nobody(self):
+        delete, _ = self._refresh(student_ids=[])
+        assert delete[0] == ('DELETE FROM plan_audit WHERE FALSE', [])
+
+    def test_grade_changes_refresh_the_audit(self):
+        assert audit_service._refresh_audits in grading._listeners
+        with patch.object(PlanAuditService, 'refresh') as refresh:
+            audit_service._refresh_audits(student_ids=[], course_ids=[4])
+        refresh.assert_called_once_with(None, [4])
+
+
+class TestPlanAuditReads(unittest.TestCase):
+    """Summaries and course details are grouped back per student."""
+
+    SUMMARY = {'required_courses': 3, 'completed_courses': 1, 'in_progress_courses': 1, 'missing_courses': 1,
+               'required_credits': Decimal('9.0'), 'completed_credits': Decimal('3.0'),
+               'in_progress_credits': Decimal('3.0'), 'credit_shortfall': Decimal('6.0')}
+
+    def _course(self, student_id, course_id, status, grade=None):
+        return {'student_id': student_id, 'plan_id': 3, 'course_id': course_id, 'course_code': f'C{course_id}',
+                'course_name': f'课程{course_id}', 'credit': Decimal('3.0'), 'semester': 1,
+                'enrollment_id': None if status == 'missing' else course_id * 10, 'final_grade': grade,
+                'status': status}
+
+    def test_major_audit(self):
+        students = [
+            dict(self.SUMMARY, id=1, student_no='S1', name='张三', major='计算机', current_semester=2, plan_id=3),
+            dict(self.SUMMARY, id=2, student_no='S2', name='李四', major='计算机', current_semester=2, plan_id=3,
+                 completed_courses=3, in_progress_courses=0, missing_courses=0, credit_shortfall=Decimal('0')),
+        ]
+        courses = [self._course(1, 5, 'completed', Decimal('88.0')), self._course(1, 6, 'in_progress'),
+                   self._course(1, 7, 'missing', Decimal('41.0'))]
+        with patch('app_core.services.audit_service.db') as db:
+            db.fetch_all.side_effect = [students, courses]
+            audits = PlanAuditService.get_major_audit('计算机')
+
+        assert db.fetch_all.call_count == 2
+        assert all(c[0][1] == ['计算机'] for c in db.fetch_all.call_args_list)
+        assert 'WHERE s.major = %s' in db.fetch_all.call_args_list[1][0][0]
+        first, second = audits
+        assert first['summary']['credit_shortfall'] == Decimal('6.0') and not first['summary']['complete']
+        assert [c['course_id'] for c in first['courses']['completed']] == [5]
+        assert first['courses']['missing'][0]['final_grade'] == Decimal('41.0')
+        assert second['summary']['complete'] and second['courses']['missing'] == []
+
+    def test_counts_only_and_missing_plan(self):
+        student = {'id': 1, 'student_no': 'S1', 'name': '张三', 'major': '', 'current_semester': 1, 'plan_id': None,
+                   **{k: 0 for k in self.SUMMARY}}
+        with patch('app_core.services.audit_service.db') as db:
+            db.fetch_all.return_value = [student]
+            audits = PlanAuditService.get_major_audit('', details=False)
+        db.fetch_all.assert_called_once()
+        assert audits[0]['plan_id'] is None and audits[0]['summary']['complete'] is False
+        assert 'courses' not in audits[0]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the TTL cache and the cached principal lookup.
+"""
+import unittest
+from unittest.mock import patch
+
+from app_core.utils.cache import TTLCache
+from app_core.services.user_service import UserService, principal_cache
+
+
+class TestTTLCache(unittest.TestCase):
+    """Test expiry, size bound and invalidation."""
+
+    def test_entry_expires(self):
+        cache = TTLCache('t', ttl=10)
+        with patch('app_core.utils.cache.time.monotonic', side_effect=[0.0, 5.0, 11.0]):
+            cache.set('k', 1)
+            assert cache.get('k') == 1
+            assert cache.get('k') is None
+
+    def test_least_recently_used_evicted(self):
+        cache = TTLCache('t', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+
+    def test_none_not_cached(self):
+        cache = TTLCache('t')
+        calls = []
+        cache.get_or_load('k', lambda: calls.append(1))
+        cache.get_or_load('k', lambda: calls.append(1))
+        assert len(calls) == 2
+
+    def test_invalidate_if(self):
+        cache = TTLCache('t')
+        cache.set(1, {'ref': 5})
+        cache.set(2, {'ref': 6})
+        cache.invalidate_if(lambda _, v: v['ref'] == 5)
+        assert cache.get(1) is None and cache.get(2) == {'ref': 6}
+
+
+class TestPrincipalCache(unittest.TestCase):
+    """Test that principals are resolved once and invalidated on changes."""
+
+    USER = {'id': 3, 'username': 'S001', 'role': 'student', 'ref_id': 9}
+    STUDENT = {'name': '张三', 'student_no': 'S001'}
+
+    def setUp(self):
+        principal_cache.clear()
+        patcher = patch('app_core.services.user_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db.fetch_one.side_effect = lambda sql, params=None: (
+            dict(self.USER) if 'FROM users' in sql else dict(self.STUDENT)
+        )
+
+    def test_second_lookup_hits_cache(self):
+        first = UserService.get_principal(3)
+        second = UserService.get_principal(3)
+        assert first == second
+        assert first['info']['name'] == '张三'
+        assert self.db.fetch_one.call_count == 2  # users + students, once
+
+    def test_student_update_invalidates(self):
+        UserService.get_principal(3)
+        UserService.invalidate_principals_for('student', 9)
+        UserService.get_principal(3)
+        assert self.db.fetch_one.call_count == 4
+
+    def test_other_role_not_invalidated(self):
+        UserService.get_principal(3)
+        UserService.invalidate_principals_for('teacher', 9)
+        UserService.get_principal(3)
+        assert self.db.fetch_one.call_count == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests for per-request profiling and the stack sampler.
+"""
+import threading
+import time
+import unittest
+
+from flask import Flask, session
+
+from app_core.profiling import ProfileStore, StackSampler, init_profiling, profile_store
+
+
+class TestProfileStore(unittest.TestCase):
+    """Test report storage bounds."""
+
+    def test_oldest_reports_evicted(self):
+        import cProfile
+        store = ProfileStore(max_reports=2)
+        ids = []
+        for _ in range(3):
+            profiler = cProfile.Profile()
+            profiler.enable()
+            sum(range(100))
+            profiler.disable()
+            ids.append(store.add(profiler, 'GET', '/x', 1.0))
+        assert store.get(ids[0]) is None
+        assert [r['id'] for r in store.list()] == ids[:0:-1]
+        assert 'function calls' in store.get(ids[-1])['report']
+
+
+class TestStackSampler(unittest.TestCase):
+    """Test that only request threads are sampled."""
+
+    def test_samples_active_thread_only(self):
+        sampler = StackSampler()
+        entered, release = threading.Event(), threading.Event()
+
+        def busy_request():
+            sampler.enter('GET student.available')
+            entered.set()
+            release.wait(2)
+            sampler.exit()
+
+        worker = threading.Thread(target=busy_request)
+        worker.start()
+        entered.wait(2)
+        sampler.sample_once()
+        release.set()
+        worker.join()
+        sampler.sample_once()  # no active threads: ignored
+
+        folded = sampler.folded()
+        assert sampler.samples == 1
+        assert folded.startswith('GET student.available;')
+        assert 'busy_request' in folded
+
+    def test_background_thread_start_stop(self):
+        sampler = StackSampler()
+        sampler.start(0.001)
+        assert sampler.running
+        sampler.stop()
+        assert not sampler.running
+
+
+class TestRequestProfiling(unittest.TestCase):
+    """Test the ?__profile=1 gate."""
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        init_profiling(app)
+
+        @app.route('/login/<role>')
+        def login(role):
+            session['user_id'] = 1
+            session['role'] = role
+            return 'ok'
+
+        @app.route('/slow')
+        def slow():
+            time.sleep(0.001)
+            return 'done'
+
+        self.client = app.test_client()
+
+    def test_admin_request_profiled(self):
+        self.client.get('/login/admin')
+        response = self.client.get('/slow?__profile=1')
+        report = profile_store.get(int(response.headers['X-Profile-Id']))
+        assert response.data == b'done'
+        assert report['path'] == '/slow?__profile=1'
+
+    def test_non_admin_ignored(self):
+        self.client.get('/login/student')
+        response = self.client.get('/slow?__profile=1')
+        assert 'X-Profile-Id' not in response.headers
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests for precomputed cohort rankings.
+"""
+import unittest
+from unittest.mock import patch
+
+from app_core.services import ranking_service, transcript_service
+from app_core.services.ranking_service import RankingRefresher, RankingService
+from app_core.services.transcript_service import TranscriptService
+
+
+class TestRankingRefresh(unittest.TestCase):
+    """One windowed statement per refresh, limited to the touched cohorts."""
+
+    def setUp(self):
+        patcher = patch('app_core.services.ranking_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cursor = self.db.get_cursor.return_value.__enter__.return_value
+
+    def test_full_refresh(self):
+        self.cursor.rowcount = 40
+        assert RankingService.refresh() == 40
+        (delete, _), (insert, _) = self.cursor.execute.call_args_list
+        assert delete == ('DELETE FROM cohort_ranks', [])
+        sql, params = insert
+        assert 'RANK() OVER (PARTITION BY s.major, s.current_semester ORDER BY g.gpa DESC' in sql
+        assert 'PERCENT_RANK() OVER' in sql and 'COUNT(*) OVER (PARTITION BY s.major, s.current_semester)' in sql
+        assert 'JOIN student_gpa g' in sql and params == []
+
+    def test_only_affected_cohorts(self):
+        RankingService.refresh([('计算机', 3), ('软件工程', 1), ('计算机', 3)])
+        (delete, _), (insert, _) = self.cursor.execute.call_args_list
+        cohorts = ((('计算机', 3), ('软件工程', 1)),)
+        assert delete == ('DELETE FROM cohort_ranks WHERE (major, semester) IN %s', list(cohorts))
+        assert '(s.major, s.current_semester) IN %s' in insert[0] and insert[1] == list(cohorts)
+
+    def test_no_cohorts_is_a_no_op(self):
+        assert RankingService.refresh([]) == 0
+        self.cursor.execute.assert_not_called()
+
+    def test_cohorts_include_where_students_were_ranked(self):
+        self.db.fetch_all.return_value = [{'major': '计算机', 'semester': 3}, {'major': '计算机', 'semester': 2},
+                                          {'major': '', 'semester': 1}]
+        assert RankingService.cohorts_of(student_ids=[5], course_ids=[9]) == [('计算机', 3), ('计算机', 2)]
+        sql, params = self.db.fetch_all.call_args[0]
+        assert 'FROM students WHERE id = ANY(%s) OR id IN' in sql
+        assert 'FROM cohort_ranks WHERE student_id = ANY(%s) OR student_id IN' in sql
+        assert params == [[5], [9], [5], [9]]
+        assert RankingService.cohorts_of() == []
+
+    def test_runs_after_the_transcript_refresh(self):
+        assert ranking_service._refresh_rankings in transcript_service._gpa_listeners
+        calls = []
+        with patch.object(TranscriptService, 'refresh', side_effect=lambda *a: calls.append('gpa')), \
+                patch.object(ranking_service.refresher, 'submit', side_effect=lambda *a: calls.append('rank')) as submit:
+            transcript_service._refresh_transcripts(student_ids=[5], course_ids=[])
+        assert calls == ['gpa', 'rank']
+        submit.assert_called_once_with([5], [])
+
+
+class TestRankingRefresher(unittest.TestCase):
+    """Grade writes are merged into one re-rank off the request path."""
+
+    def test_inline_when_delay_is_zero(self):
+        with patch.object(RankingService, 'refresh_students', return_value=3) as refresh:
+            RankingRefresher(0).submit([5], [])
+        refresh.assert_called_once_with([5], None)
+
+    def test_pending_writes_are_merged(self):
+        refresher = RankingRefresher(60)
+        with patch('app_core.services.ranking_service.threading.Thread') as thread, \
+                patch.object(RankingService, 'refresh_students', return_value=7) as refresh:
+            refresher.submit([5], [])
+            refresher.submit([3, 5], [9])
+            refresh.assert_not_called()
+            assert refresher.flush() == 7
+            assert refresher.flush() == 0
+        thread.return_value.start.assert_called_once()
+        refresh.assert_called_once_with([3, 5], [9])
+
+    def test_refresh_drops_cached_versions(self):
+        # /rankings is tagged with the cohort_ranks version; this process must see its own re-rank
+        with patch.object(RankingService, 'refresh_students', return_value=3), \
+                patch('app_core.services.ranking_service.invalidate_versions') as invalidate:
+            RankingRefresher(0).submit([5], [])
+        invalidate.assert_called_once()
+
+
+class TestRankingReads(unittest.TestCase):
+    """Lookups hit the precomputed rows only."""
+
+    def test_student_lookup_is_by_primary_key(self):
+        with patch('app_core.services.ranking_service.db') as db:
+            db.fetch_one.return_value = {'student_id': 5, 'class_rank': 2, 'cohort_size': 30}
+            assert RankingService.get_student_rank(5)['class_rank'] == 2
+        sql, params = db.fetch_one.call_args[0]
+        assert 'FROM cohort_ranks' in sql and 'WHERE student_id = %s' in sql and params == [5]
+
+    def test_top_n(self):
+        with patch('app_core.services.ranking_service.db') as db:
+            db.fetch_all.return_value = []
+            RankingService.get_top('计算机', '3', '5')
+            sql, params = db.fetch_all.call_args[0]
+            assert 'ORDER BY r.class_rank' in sql and params == ['计算机', 3, 5]
+            for args in (('', 3), ('计算机', 'x'), ('计算机', 3, 0), ('计算机', 3, 1000)):
+                with self.assertRaises(ValueError):
+                    RankingService.get_top(*args)
+
+
+if __name__ == '__main__':
+    unittest.main()
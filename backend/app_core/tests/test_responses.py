@@ -0,0 +1,96 @@
+"""
+Tests for the response pipeline (JSON provider, compression, NDJSON).
+"""
+import datetime
+import decimal
+import gzip
+import json
+import unittest
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from app_core.responses import FastJSONProvider, compress_response, list_response
+
+ROWS = [
+    {'id': i, 'score': decimal.Decimal('87.5'), 'name': '张三',
+     'created_at': datetime.datetime(2024, 9, 1, 8, 30), 'day': datetime.date(2024, 9, 1)}
+    for i in range(200)
+]
+
+
+def _make_app(encoder='auto', min_size=1024):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app, encoder)
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, min_size, 6)
+
+    @app.route('/rows')
+    def rows():
+        return list_response(ROWS)
+
+    @app.route('/rows/stream')
+    def rows_stream():
+        return list_response(iter(ROWS))
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    return app
+
+
+class TestFastJSONProvider(unittest.TestCase):
+    """Both encoders must produce what Flask's default provider produces."""
+
+    def test_matches_default_provider(self):
+        expected = json.loads(DefaultJSONProvider(Flask(__name__)).dumps(ROWS[:3]))
+        for encoder in ('orjson', 'std'):
+            provider = FastJSONProvider(Flask(__name__), encoder)
+            assert json.loads(provider.dumps(ROWS[:3])) == expected, encoder
+
+    def test_non_string_keys(self):
+        provider = FastJSONProvider(Flask(__name__))
+        assert json.loads(provider.dumps({1: 'a'})) == {'1': 'a'}
+
+
+class TestCompression(unittest.TestCase):
+    """Negotiated gzip above the size threshold."""
+
+    def setUp(self):
+        self.client = _make_app().test_client()
+
+    def test_large_json_gzipped(self):
+        response = self.client.get('/rows', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        body = gzip.decompress(response.data)
+        assert len(json.loads(body)) == len(ROWS)
+        assert len(response.data) < len(body)
+
+    def test_small_or_unaccepted_left_alone(self):
+        assert 'Content-Encoding' not in self.client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+        assert 'Content-Encoding' not in self.client.get('/rows').headers
+
+    def test_ndjson_stream(self):
+        plain = self.client.get('/rows/stream?format=ndjson')
+        assert plain.mimetype == 'application/x-ndjson'
+        lines = plain.data.decode('utf-8').splitlines()
+        assert len(lines) == len(ROWS)
+        assert json.loads(lines[0])['score'] == '87.5'
+
+        encoded = self.client.get('/rows/stream', headers={
+            'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'})
+        assert encoded.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(encoded.data) == plain.data
+
+    def test_default_accept_gets_array(self):
+        response = self.client.get('/rows/stream', headers={'Accept': '*/*'})
+        assert response.mimetype == 'application/json'
+        assert len(response.get_json()) == len(ROWS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for compare-and-swap grade and weight updates.
+"""
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from app_core.grading import weighted_grade_sql
+from app_core.services.admin_service import AdminService, VersionConflict
+
+
+class TestGradeCompareAndSwap(unittest.TestCase):
+    """update_student_grades writes once, guarded by the row version."""
+
+    def setUp(self):
+        patcher = patch('app_core.services.admin_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_version_used_directly(self):
+        self.db.fetch_one.return_value = {'student_id': 3}
+        assert AdminService.update_student_grades(9, {'final_score': 88, 'version': 4}) is True
+        sql, params = self.db.fetch_one.call_args[0]
+        assert 'AND version=%s' in sql and 'version = version + 1' in sql
+        # Only the scores are written; the final grade is derived on read
+        assert 'final_grade' not in sql
+        assert params == [88.0, 9, 4]
+        assert self.db.fetch_one.call_count == 1
+
+    def test_stale_version_raises_with_current_row(self):
+        current = {'id': 9, 'version': 5, 'final_score': 70}
+        self.db.fetch_one.side_effect = [None, current]
+        with self.assertRaises(VersionConflict) as ctx:
+            AdminService.update_student_grades(9, {'final_score': 88, 'version': 4})
+        assert ctx.exception.current == current
+        # The current row carries the derived final grade, not the legacy column
+        sql = self.db.fetch_one.call_args[0][0]
+        assert weighted_grade_sql() in sql and 'SELECT *' not in sql and 'e.final_grade' not in sql
+
+    def test_without_version_writes_unconditionally(self):
+        self.db.fetch_one.return_value = {'student_id': 3}
+        assert AdminService.update_student_grades(9, {'ordinary_score': 75}) is True
+        sql, params = self.db.fetch_one.call_args[0]
+        assert 'AND version' not in sql and params == [75.0, 9]
+
+    def test_missing_enrollment(self):
+        self.db.fetch_one.return_value = None
+        assert AdminService.update_student_grades(9, {'final_score': 88}) is False
+
+    def test_invalid_version(self):
+        with self.assertRaises(ValueError):
+            AdminService.update_student_grades(9, {'final_score': 88, 'version': 'x'})
+
+
+class TestWeightCompareAndSwap(unittest.TestCase):
+    """A weight change is a single-row update of the course."""
+
+    def setUp(self):
+        patcher = patch('app_core.services.admin_service.db')
+        self.db = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_the_course_row_is_written(self):
+        self.db.fetch_one.return_value = {'id': 5}
+        assert AdminService.update_course_weights(5, 0.4, 0.6, expected_version=2) is True
+        sql, params = self.db.fetch_one.call_args[0]
+        assert sql.startswith('UPDATE courses') and 'AND version=%s' in sql and params[-1] == 2
+        assert self.db.fetch_one.call_count == 1
+        self.db.execute.assert_not_called()
+        self.db.get_cursor.assert_not_called()
+
+    def test_stale_course_version(self):
+        self.db.fetch_one.side_effect = [None, {'id': 5, 'version': 3}]
+        with self.assertRaises(VersionConflict):
+            AdminService.update_course_weights(5, 0.4, 0.6, expected_version=2)
+
+    def test_missing_course(self):
+        self.db.fetch_one.return_value = None
+        assert AdminService.update_course_weights(5, 0.4, 0.6) is False
+
+
+class TestConflictResponse(unittest.TestCase):
+    """The API answers a stale version with 409 and the stored row."""
+
+    def test_409_with_current_row(self):
+        from app_core.api import admin as admin_api
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.register_blueprint(admin_api.admin_bp)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+
+        principal = {'ref_id': None, 'info': {'role': 'admin'}}
+        current = {'id': 9, 'version': 5}
+        with patch('app_core.services.user_service.UserService.get_principal', return_value=principal), \
+                patch.object(admin_api.AdminService, 'update_student_grades', side_effect=VersionConflict(current)):
+            response = client.put('/api/enrollments/9/grades', json={'final_score': 80, 'version': 4})
+        assert response.status_code == 409
+        assert response.get_json()['current'] == current
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Unit tests for the indexed search service.
+Tests run without database by mocking the db object.
+"""
+import unittest
+from unittest.mock import patch
+
+from app_core.services.search_service import SearchService, _grams, _escape_like, MAX_LIMIT
+
+
+class TestGrams(unittest.TestCase):
+    """Test keyword gram splitting and escaping."""
+
+    def test_grams_are_lowercase_bigrams(self):
+        assert _grams('AbC') == {'ab', 'bc'}
+
+    def test_two_character_chinese_name(self):
+        assert _grams('张三') == {'张三'}
+
+    def test_short_keyword_has_no_grams(self):
+        assert _grams('张') == set()
+
+    def test_escape_like_wildcards(self):
+        assert _escape_like('50%_a') == '50\\%\\_a'
+
+
+class TestKeywordFilter(unittest.TestCase):
+    """Test WHERE fragments for each backend."""
+
+    def tearDown(self):
+        SearchService._backend = None
+
+    def test_trgm_uses_ilike_on_raw_columns(self):
+        SearchService._backend = 'trgm'
+        sql, params = SearchService.keyword_filter('students', 'S00', 's')
+
+        assert 's.student_no ILIKE %s' in sql
+        assert 's.name ILIKE %s' in sql
+        assert params == ['%s00%', '%s00%']
+
+    def test_ngram_uses_gram_table_then_verifies(self):
+        SearchService._backend = 'ngram'
+        sql, params = SearchService.keyword_filter('courses', 'DB1', 'c', ('course_code',))
+
+        assert 'course_search_grams' in sql
+        assert 'HAVING COUNT(DISTINCT gram) = %s' in sql
+        assert params == [['b1', 'db'], 2, '%db1%']
+
+    def test_ngram_short_keyword_falls_back_to_like(self):
+        SearchService._backend = 'ngram'
+        sql, params = SearchService.keyword_filter('students', '张', 's')
+
+        assert 'student_search_grams' not in sql
+        assert params == ['%张%', '%张%']
+
+
+class TestSearchStudents(unittest.TestCase):
+    """Test ranked student search."""
+
+    def tearDown(self):
+        SearchService._backend = None
+
+    @patch('app_core.services.search_service.db')
+    def test_empty_keyword_skips_query(self, mock_db):
+        assert SearchService.search_students('  ') == []
+        mock_db.fetch_all.assert_not_called()
+
+    @patch('app_core.services.search_service.db')
+    def test_limit_is_clamped(self, mock_db):
+        SearchService._backend = 'trgm'
+        mock_db.fetch_all.return_value = []
+
+        SearchService.search_students('张三', limit=10000)
+
+        sql, params = mock_db.fetch_all.call_args[0]
+        assert 'ORDER BY CASE' in sql
+        assert params[-1] == MAX_LIMIT
+
+
+if __name__ == '__main__':
+    unittest.main()
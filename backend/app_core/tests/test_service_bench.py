@@ -0,0 +1,42 @@
+"""
+Unit tests for the service benchmark budget checks (no database required).
+"""
+import unittest
+
+from app_core.benchmarks.service_bench import check_budget, load_budgets, _paths
+
+
+def _samples(**counts):
+    return {int(size[1:]): {"ms": 1.0, "statements": n} for size, n in counts.items()}
+
+
+class TestBudgetCheck(unittest.TestCase):
+    """Test that statement growth beyond the budget is reported."""
+
+    def test_constant_path_within_budget(self):
+        assert check_budget("p", _samples(s10=5, s100=5), {"base": 5, "per_item": 0}) == []
+
+    def test_constant_path_turning_linear_fails(self):
+        violations = check_budget("p", _samples(s10=5, s100=95), {"base": 5, "per_item": 0})
+        assert any("grew by 90" in v for v in violations)
+
+    def test_base_exceeded_at_smallest_size(self):
+        violations = check_budget("p", _samples(s10=7, s100=7), {"base": 5, "per_item": 0})
+        assert len(violations) == 2
+
+    def test_linear_budget_without_base(self):
+        budget = {"per_item": 1}
+        assert check_budget("p", _samples(s10=1200, s100=1290), budget) == []
+        assert check_budget("p", _samples(s10=1200, s100=1390), budget)
+
+    def test_missing_budget_is_a_violation(self):
+        assert check_budget("p", _samples(s10=1, s100=1), None)
+
+    def test_every_benchmarked_path_has_a_budget(self):
+        budgets = load_budgets()
+        for name in _paths():
+            assert name in budgets, name
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tests for the pluggable session backends.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flask import Flask, current_app, session
+
+from app_core.config import DEFAULT_SECRET_KEY
+
+from app_core.sessions import (
+    RevocableCookieSessionInterface,
+    RevocationList,
+    SQLiteSessionInterface,
+    evict_stale_session_files,
+    init_sessions,
+    regenerate_session,
+    revoke_current_session,
+    revoke_user_sessions,
+)
+
+
+class MemoryRevocationList(RevocationList):
+    """Revocation list without the database."""
+
+    def _refresh(self, force=False):
+        pass
+
+    def _store(self, key, ttl):
+        now = time.time()
+        kind, _, value = key.partition(':')
+        (self._users if kind == 'user' else self._sids)[value] = now
+        return now
+
+
+def _make_app(interface):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = interface
+
+    @app.route('/login/<int:user_id>')
+    def login(user_id):
+        session['user_id'] = user_id
+        session['role'] = 'student'
+        return 'ok'
+
+    @app.route('/signin/<int:user_id>')
+    def signin(user_id):
+        regenerate_session(current_app)
+        session['user_id'] = user_id
+        return 'ok'
+
+    @app.route('/sid')
+    def sid():
+        return str(session.get('sid', getattr(session, 'sid', None)))
+
+    @app.route('/whoami')
+    def whoami():
+        return str(session.get('user_id', 'anonymous'))
+
+    @app.route('/logout')
+    def logout():
+        revoke_current_session(current_app)
+        session.clear()
+        return 'bye'
+
+    @app.route('/change-password')
+    def change_password():
+        revoke_user_sessions(current_app, session['user_id'])
+        return 'changed'
+
+    return app
+
+
+class SessionBackendTests:
+    """Behaviour shared by the cookie and sqlite backends."""
+
+    def test_login_persists(self):
+        client = self.app.test_client()
+        client.get('/login/7')
+        assert client.get('/whoami').data == b'7'
+
+    def test_stolen_cookie_rejected_after_logout(self):
+        client = self.app.test_client()
+        client.get('/login/7')
+        stolen = client.get_cookie('session').value
+
+        client.get('/logout')
+        thief = self.app.test_client()
+        thief.set_cookie('session', stolen)
+        assert thief.get('/whoami').data == b'anonymous'
+
+    def test_password_change_logs_out_other_sessions(self):
+        laptop, phone = self.app.test_client(), self.app.test_client()
+        laptop.get('/login/7')
+        phone.get('/login/7')
+
+        laptop.get('/change-password')
+        assert laptop.get('/whoami').data == b'7'
+        assert phone.get('/whoami').data == b'anonymous'
+
+    def test_login_issues_a_fresh_session(self):
+        victim = self.app.test_client()
+        victim.get('/login/99')
+        planted = victim.get_cookie('session').value
+        old_sid = victim.get('/sid').data
+
+        victim.get('/signin/7')
+        assert victim.get('/whoami').data == b'7'
+        assert victim.get_cookie('session').value != planted
+        assert victim.get('/sid').data != old_sid
+
+        attacker = self.app.test_client()
+        attacker.set_cookie('session', planted)
+        assert attacker.get('/whoami').data == b'anonymous'
+
+    def test_tampered_cookie_ignored(self):
+        client = self.app.test_client()
+        client.get('/login/7')
+        client.set_cookie('session', client.get_cookie('session').value + 'x')
+        assert client.get('/whoami').data == b'anonymous'
+
+
+class TestCookieSessions(SessionBackendTests, unittest.TestCase):
+    """Signed stateless cookies with a revocation list."""
+
+    def setUp(self):
+        self.app = _make_app(RevocableCookieSessionInterface(MemoryRevocationList()))
+
+
+class TestSQLiteSessions(SessionBackendTests, unittest.TestCase):
+    """Server-side sessions in a SQLite file."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.interface = SQLiteSessionInterface(os.path.join(self.dir, 'sessions.sqlite3'))
+        self.app = _make_app(self.interface)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_shared_between_interfaces(self):
+        client = self.app.test_client()
+        client.get('/login/7')
+        other_worker = _make_app(SQLiteSessionInterface(self.interface.path))
+        peer = other_worker.test_client()
+        peer.set_cookie('session', client.get_cookie('session').value)
+        assert peer.get('/whoami').data == b'7'
+
+
+class TestSecretKeyRequired(unittest.TestCase):
+    """Signed backends must not start with the published default key."""
+
+    def test_default_key_refused(self):
+        for backend in ('cookie', 'sqlite'):
+            for key in (DEFAULT_SECRET_KEY, ''):
+                app = Flask(__name__)
+                app.secret_key = key
+                app.config['SESSION_BACKEND'] = backend
+                with self.assertRaises(RuntimeError):
+                    init_sessions(app)
+                assert not isinstance(app.session_interface, (RevocableCookieSessionInterface,
+                                                              SQLiteSessionInterface))
+
+
+class TestSessionFileEviction(unittest.TestCase):
+    """Test the filesystem janitor."""
+
+    def test_only_stale_files_removed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        for name in ('fresh', 'stale', '__wz_cache_count'):
+            open(os.path.join(directory, name), 'w').close()
+        old = time.time() - 7200
+        os.utime(os.path.join(directory, 'stale'), (old, old))
+        os.utime(os.path.join(directory, '__wz_cache_count'), (old, old))
+
+        assert evict_stale_session_files(directory, max_age=3600) == 1
+        assert sorted(os.listdir(directory)) == ['__wz_cache_count', 'fresh']
+
+
+if __name__ == '__main__':
+    unittest.main()
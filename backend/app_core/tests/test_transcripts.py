@@ -0,0 +1,154 @@
+"""
+Tests for transcripts, GPA aggregates and the grade change notification.
+"""
+import unittest
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+from app_core import grading
+from app_core.grading import grade_point, grade_point_sql, grades_changed
+from app_core.services import transcript_service
+from app_core.services.teacher_service import TeacherService
+from app_core.services.transcript_service import TranscriptService
+
+
+class TestGradePoints(unittest.TestCase):
+    """The 4.0 scale, in Python and SQL."""
+
+    def test_scale_boundaries(self):
+        assert grade_point(None) is None
+        assert grade_point(95) == Decimal('4.0')
+        assert grade_point('84.9') == Decimal('3.3')
+        assert grade_point(60) == Decimal('1.0')
+        assert grade_point(59.9) == Decimal('0')
+
+    def test_sql_checks_highest_band_first(self):
+        sql = grade_point_sql('x')
+        assert sql.startswith('(CASE WHEN x IS NULL THEN NULL WHEN x >= 90 THEN 4.0')
+        assert sql.endswith('ELSE 0 END)')
+
+
+class TestGradesChanged(unittest.TestCase):
+    """Listeners get deduplicated ids and cannot fail the write."""
+
+    def setUp(self):
+        patcher = patch.object(grading, '_listeners', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_listeners_receive_deduplicated_ids(self):
+        listener = grading.on_grades_changed(MagicMock())
+        grades_changed(student_ids=[3, 1, 3, None], course_ids=(7,))
+        listener.assert_called_once_with(student_ids=[1, 3], course_ids=[7])
+
+    def test_nothing_changed_calls_nobody(self):
+        listener = grading.on_grades_changed(MagicMock())
+        grades_changed(student_ids=[], course_ids=[None])
+        listener.assert_not_called()
+
+    def test_failing_listener_is_isolated(self):
+        grading.on_grades_changed(MagicMock(side_effect=RuntimeError('boom')))
+        second = grading.on_grades_changed(MagicMock())
+        with self.assertLogs('app_core.grading', level='WARNING'):
+            grades_changed(student_ids=[1])
+        second.assert_called_once()
+
+
+class TestTranscriptRefresh(unittest.TestCase):
+    """The aggregates are rebuilt set-based and only for the affected students."""
+
+    def _refresh(self, **scope):
+        with patch('app_core.services.transcript_service.db') as db:
+            cursor = db.get_cursor.return_value.__enter__.return_value
+            TranscriptService.refresh(**scope)
+        return cursor.execute.call_args_list
+
+    def test_full_refresh(self):
+        calls = self._refresh()
+        assert [c[0][0].split()[0] for c in calls] == ['DELETE', 'INSERT', 'DELETE', 'INSERT']
+        assert all(c[0][1] == [] for c in calls)
+        assert 'DELETE FROM student_gpa WHERE TRUE' in calls[2][0][0]
+        assert 'GROUP BY g.student_id, g.term' in calls[1][0][0]
+
+    def test_scoped_refresh_uses_the_same_filter_everywhere(self):
+        calls = self._refresh(student_ids=[4, 5], course_ids=[9])
+        assert 'WHERE student_id = ANY(%s) OR student_id IN' in calls[0][0][0]
+        assert 'WHERE e.student_id = ANY(%s) OR e.student_id IN' in calls[1][0][0]
+        assert all(c[0][1] == [[4, 5], [9]] for c in calls)
+
+    def test_listener_passes_scope_through(self):
+        assert transcript_service._refresh_transcripts in grading._listeners
+        with patch.object(TranscriptService, 'refresh') as refresh:
+            transcript_service._refresh_transcripts(student_ids=[2], course_ids=[])
+        refresh.assert_called_once_with([2], None)
+
+    def test_gpa_listeners_run_after_the_refresh(self):
+        calls = []
+        listener = MagicMock(side_effect=lambda **ids: calls.append(('listener', ids)))
+        with patch.object(transcript_service, '_gpa_listeners', [MagicMock(side_effect=RuntimeError('boom')), listener]), \
+                patch.object(TranscriptService, 'refresh', side_effect=lambda *a: calls.append(('refresh', a))):
+            with self.assertLogs('app_core.services.transcript_service', level='WARNING'):
+                transcript_service._refresh_transcripts(student_ids=[2], course_ids=[])
+        assert calls == [('refresh', ([2], None)), ('listener', {'student_ids': [2], 'course_ids': []})]
+
+
+class TestRosterImport(unittest.TestCase):
+    """A roster import that rewrites an existing course refreshes its students."""
+
+    def _workbook(self):
+        import pandas as pd
+        stream = BytesIO()
+        with pd.ExcelWriter(stream, engine='openpyxl') as writer:
+            pd.DataFrame([{'course_code': 'C1', 'name': '数据库', 'credit': 4, 'capacity': 60}]).to_excel(
+                writer, sheet_name='course', index=False)
+            pd.DataFrame([{'student_no': 'S001'}]).to_excel(writer, sheet_name='students', index=False)
+        stream.seek(0)
+        return stream
+
+    def test_existing_course_refreshes_by_course(self):
+        with patch('app_core.services.teacher_service.db') as db, \
+                patch('app_core.services.teacher_service.SearchService'), \
+                patch('app_core.services.teacher_service.grades_changed') as changed:
+            db.fetch_one.side_effect = [{'id': 5, 'teacher_id': 7}, {'id': 11}]
+            db.fetch_all.return_value = [{'id': 1, 'student_no': 'S001'}]
+            summary = TeacherService.import_course_roster(7, self._workbook())
+        assert summary['course_updated'] == 1 and summary['enrollments_skipped'] == 1
+        changed.assert_called_once_with(student_ids=[], course_ids=[5])
+
+
+class TestGetTranscripts(unittest.TestCase):
+    """Three queries for any number of students, grouped back per student."""
+
+    def test_grouping_and_order(self):
+        students = [
+            {'id': 2, 'student_no': 'S2', 'name': '李四', 'major': '计算机', 'current_semester': 3,
+             'graded_courses': 0, 'attempted_credits': 0, 'earned_credits': 0, 'gpa': None, 'weighted_average': None},
+            {'id': 1, 'student_no': 'S1', 'name': '张三', 'major': '计算机', 'current_semester': 3,
+             'graded_courses': 1, 'attempted_credits': Decimal('3'), 'earned_credits': Decimal('3'),
+             'gpa': Decimal('3.70'), 'weighted_average': Decimal('86.00')},
+        ]
+        terms = [{'student_id': 1, 'term': '2025秋', 'graded_courses': 1, 'attempted_credits': Decimal('3'),
+                  'earned_credits': Decimal('3'), 'gpa': Decimal('3.70'), 'weighted_average': Decimal('86.00')}]
+        courses = [{'student_id': 1, 'enrollment_id': 10, 'term': '2025秋', 'course_id': 5,
+                    'final_grade': Decimal('86.0'), 'grade_point': Decimal('3.7')}]
+        with patch('app_core.services.transcript_service.db') as db:
+            db.fetch_all.side_effect = [students, terms, courses]
+            result = TranscriptService.get_transcripts([1, 2, 1, 99])
+
+        assert db.fetch_all.call_count == 3
+        assert db.fetch_all.call_args_list[0][0][1] == [[1, 2, 99]]
+        assert [t['student']['id'] for t in result] == [1, 2]
+        assert result[0]['summary']['gpa'] == Decimal('3.70')
+        assert result[0]['terms'][0]['term'] == '2025秋' and 'student_id' not in result[0]['terms'][0]
+        assert result[0]['courses'][0]['enrollment_id'] == 10
+        assert result[1]['terms'] == [] and result[1]['courses'] == []
+
+    def test_empty_input_skips_the_database(self):
+        with patch('app_core.services.transcript_service.db') as db:
+            assert TranscriptService.get_transcripts([]) == []
+        db.fetch_all.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ from .helpers import (
     hash_password,
     json_response,
     error_response,
+    conflict_response,
     validate_fields,
     require_auth,
 )
@@ -18,6 +19,7 @@ __all__ = [
     'hash_password',
     'json_response',
     'error_response',
+    'conflict_response',
     'validate_fields',
     'require_auth',
     'validate_major_plan',
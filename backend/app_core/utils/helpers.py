@@ -30,6 +30,11 @@ def error_response(message: str, status: int = 400):
     return json_response(success=False, message=message, status=status)
 
 
+def conflict_response(message: str, current: Dict[str, Any]):
+    """409 response carrying the stored row, so the client can merge and retry."""
+    return jsonify({'success': False, 'message': message, 'current': current}), 409
+
+
 def validate_fields(payload: Dict[str, Any], required_fields: List[str]):
     """Validate required fields in payload."""
     missing = [f for f in required_fields if not payload.get(f)]
@@ -49,7 +54,12 @@ def require_auth(roles=None):
         def wrapper(*args, **kwargs):
             if 'user_id' not in session:
                 return error_response('Authentication required', status=401)
-            if roles and session.get('role') not in roles:
+            # Role comes from the cached principal, so a deleted account loses access
+            from app_core.services.user_service import UserService
+            principal = UserService.get_principal(session['user_id'])
+            if not principal:
+                return error_response('Authentication required', status=401)
+            if roles and principal['info']['role'] not in roles:
                 return error_response('Permission denied', status=403)
             return f(*args, **kwargs)
         return wrapper
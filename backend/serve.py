@@ -0,0 +1,290 @@
+"""
+Production server: pre-fork workers with graceful drain and rolling reload.
+
+Usage:
+    cd backend
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5000
+
+The master binds the listening socket and forks the workers, but never
+imports the application. Each worker imports ``app`` after the fork, so it
+gets its own connection pool and SSH tunnel. It warms the pool and only then
+reports ready to the master. The pool must have at least one connection per
+request thread (``OG_POOL_MAX >= --threads``), otherwise the server refuses
+to start. Workers start one at a time so schema
+initialisation never runs concurrently.
+
+Signals (send them to the master):
+    SIGTERM / SIGINT  stop accepting, let in-flight requests finish, close pools
+    SIGHUP            rolling reload: start a fresh worker (new code), wait until
+                      it is ready, then drain one old worker; repeat
+Workers that die unexpectedly are replaced.
+
+GET /ready returns 200 once the worker's pool is warm; use it as the
+load-balancer readiness probe.
+"""
+import argparse
+import glob
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+# Same .env as app_core.config, so the master sees WEB_* and OG_POOL_MAX too
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env'))
+
+# Production defaults; must be set before app_core.config is imported by a worker
+os.environ.setdefault('FLASK_DEBUG', 'false')
+
+logger = logging.getLogger('serve')
+
+# Seconds a worker may take to import the app and warm its pool
+READY_TIMEOUT = 120
+
+
+# ========== Worker ========== #
+
+def _make_server(sock: socket.socket, app, threads: int):
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """WSGI server that handles connections on a bounded thread pool."""
+
+        multithread = True
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    host, port = sock.getsockname()[:2]
+    return PooledWSGIServer(host, port, app, fd=sock.fileno())
+
+
+def run_worker(sock: socket.socket, threads: int, ready_fd: int):
+    """Worker main: import the app, warm the pool, report ready, then serve."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    from app import app
+    from app_core import db as db_module
+    from app_core.credentials import verifier
+    from app_core.metrics import registry
+    from app_core.services.ranking_service import refresher as ranking_refresher
+
+    app.debug = False
+    db_module.db.warm(threads)
+    server = _make_server(sock, app, threads)
+
+    def drain(signum, frame):
+        # serve_forever must be stopped from another thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, drain)
+
+    os.write(ready_fd, b'1')
+    os.close(ready_fd)
+    logger.info(f"✅ Worker {os.getpid()} ready ({threads} threads)")
+
+    try:
+        server.serve_forever()
+    finally:
+        # Let in-flight requests finish before the pool goes away
+        server.executor.shutdown(wait=True)
+        # Re-rank what the last requests changed while the pool is still open
+        try:
+            ranking_refresher.flush()
+        except Exception as exc:
+            logger.warning(f"⚠️ Final ranking refresh failed: {exc}")
+        db_module.shutdown()
+        verifier.shutdown()
+        # os._exit skips atexit hooks, so write the final metrics snapshot here
+        registry.flush()
+        logger.info(f"🛑 Worker {os.getpid()} drained")
+
+
+# ========== Master ========== #
+
+class Master:
+    """Forks and supervises workers sharing one listening socket."""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int, graceful_timeout: float):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.children = set()
+        self.stopping = False
+        self.reload_requested = False
+
+    def spawn(self) -> int:
+        """Fork a worker and block until it reports ready."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 0
+            try:
+                run_worker(self.sock, self.threads, write_fd)
+            except Exception:
+                logger.exception("❌ Worker failed")
+                code = 1
+            finally:
+                os._exit(code)
+
+        os.close(write_fd)
+        self.children.add(pid)
+        try:
+            readable, _, _ = select.select([read_fd], [], [], READY_TIMEOUT)
+            ok = bool(readable) and os.read(read_fd, 1) == b'1'
+        finally:
+            os.close(read_fd)
+        if not ok:
+            logger.error(f"❌ Worker {pid} did not become ready")
+            self.kill(pid)
+            raise RuntimeError(f"worker {pid} failed to start")
+        return pid
+
+    def kill(self, pid: int):
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+        self.children.discard(pid)
+
+    def drain(self, pids):
+        """SIGTERM the given workers and wait for them, escalating to SIGKILL."""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        pending = set(pids)
+        while pending and time.monotonic() < deadline:
+            for pid in list(pending):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    pending.discard(pid)
+                    self.children.discard(pid)
+            time.sleep(0.05)
+        for pid in pending:
+            logger.warning(f"⚠️ Worker {pid} did not drain in {self.graceful_timeout}s; killing")
+            self.kill(pid)
+
+    def rolling_reload(self):
+        logger.info("🔄 Rolling reload")
+        for old in list(self.children):
+            try:
+                self.spawn()
+            except RuntimeError:
+                logger.error("❌ Reload aborted; keeping the remaining old workers")
+                return
+            self.drain([old])
+
+    def reap(self):
+        """Forget workers that exited on their own (run() starts replacements)."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.children:
+                self.children.discard(pid)
+                if not self.stopping:
+                    logger.warning(f"⚠️ Worker {pid} exited (status {status}); respawning")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info(f"🚀 Serving on {self.sock.getsockname()} with {self.workers} workers")
+
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_reload()
+            self.reap()
+            while not self.stopping and len(self.children) < self.workers:
+                try:
+                    self.spawn()
+                except RuntimeError:
+                    time.sleep(1)
+                    break
+            time.sleep(0.5)
+
+        logger.info("🛑 Draining workers")
+        self.drain(list(self.children))
+        self.sock.close()
+
+    def _on_stop(self, signum, frame):
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        self.reload_requested = True
+
+
+def bind(address: str, backlog: int = 2048) -> socket.socket:
+    host, _, port = address.rpartition(':')
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host or '0.0.0.0', int(port)))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-fork production server')
+    parser.add_argument('--bind', default=f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', '5000')}")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS') or os.cpu_count() or 1))
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS') or 8))
+    parser.add_argument('--graceful-timeout', type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    # Every request thread may hold a pooled connection; a smaller pool makes requests fail under load
+    pool_max = int(os.getenv('OG_POOL_MAX') or 10)
+    if pool_max < args.threads:
+        parser.error(f'OG_POOL_MAX ({pool_max}) must be >= --threads ({args.threads})')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
+    # Per-worker metric snapshots are merged at scrape time; start from a clean directory.
+    # (Same as app_core.metrics.clear_multiproc_dir, inlined so the master imports no app code.)
+    metrics_dir = os.getenv('METRICS_MULTIPROC_DIR')
+    if metrics_dir:
+        for snapshot in glob.glob(os.path.join(metrics_dir, 'metrics_*.json*')):
+            os.remove(snapshot)
+
+    Master(bind(args.bind), args.workers, args.threads, args.graceful_timeout).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())